@@ -0,0 +1,346 @@
+"""
+End-to-end benchmark: per-stage latency of a full LuminaFi request.
+
+Every request runs the same path as the app and the CLI: symbol extraction,
+then the stage graph (data fetch, benchmark, metrics, Plotly chart build,
+chart rasterization, prompt build, LLM analysis and news). All upstream calls
+go to a local stand-in server replaying a cassette, with simulated latency,
+so runs are deterministic and work offline. Without ``--cassette`` a synthetic
+cassette is recorded first from seeded fake upstreams.
+
+Upstream caches are set to expire immediately (the price cache still serves
+stored bars and only fetches the tail), and rate limits are off, so every
+request pays its upstream round trips and nothing else. The run reports
+p50/p95/p99 per stage and end to end, the tracemalloc peak per scenario and the
+payload bytes sent to and received from the upstreams, and fails (exit code 1)
+when a number regresses past the saved baseline. Run with
+
+    python -m benchmarks.bench_e2e
+    python -m benchmarks.bench_e2e --symbols 1 10 --periods 1mo 5y --iterations 10
+    python -m benchmarks.bench_e2e --update   # re-baseline
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from types import SimpleNamespace
+
+if __package__ in (None, ""):
+    # Run as ``python benchmarks/bench_e2e.py`` as well as ``python -m benchmarks.bench_e2e``
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "e2e_baseline.json")
+
+UNIVERSE = ["AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "TSLA", "JPM", "V", "XOM"]
+# Stage graph stages plus symbol extraction, news (all per-symbol searches) and the whole request
+STAGES = ["symbols", "fetch", "benchmark", "metrics", "figure", "chart", "prompt", "analysis", "news", "total"]
+WORDS = ("revenue margin growth valuation earnings momentum volatility dividend guidance "
+         "sector exposure risk outlook support resistance trend").split()
+
+# A regression must exceed the baseline by this fraction and, for latencies, by this many seconds
+DEFAULT_TOLERANCE = 0.25
+LATENCY_SLACK_SECONDS = 0.005
+# p99 is reported, but a few dozen samples are too few to gate on it
+GATED_KEYS = ("p50", "p95", "peak_mb", "sent_kb", "received_kb")
+
+
+def _seed(*parts) -> int:
+    return zlib.crc32("|".join(map(str, parts)).encode())
+
+
+class SyntheticMarket:
+    """Seeded fake of the Yahoo endpoints; one fixed random walk per symbol, sliced to the requested range."""
+
+    timeout = 10.0
+
+    def __init__(self):
+        self._series = {}
+
+    def _full(self, symbol):
+        import numpy as np
+        import pandas as pd
+
+        if symbol not in self._series:
+            index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=6 * 261, name="Date")
+            rng = np.random.default_rng(_seed(symbol))
+            close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(index))))
+            spread = close * rng.uniform(0.002, 0.02, len(index))
+            self._series[symbol] = pd.DataFrame({
+                'Open': close + rng.uniform(-1, 1, len(index)) * spread, 'High': close + spread,
+                'Low': close - spread, 'Close': close,
+                'Volume': rng.integers(1_000_000, 50_000_000, len(index)).astype(float),
+                'Dividends': 0.0, 'Stock Splits': 0.0,
+            }, index=index)
+        return self._series[symbol]
+
+    def history(self, symbol, period=None, interval="1d", start=None, **kwargs):
+        import pandas as pd
+
+        from luminafi.price_cache import period_start
+
+        frame = self._full(symbol)
+        begin = pd.Timestamp(start) if start else period_start(period or "1y")
+        return frame if begin is None else frame[frame.index >= begin]
+
+    def download(self, symbols, **kwargs):
+        import pandas as pd
+        return pd.concat({symbol: self.history(symbol, **kwargs) for symbol in symbols}, axis=1)
+
+    def info(self, symbol):
+        rng = random.Random(_seed(symbol, "info"))
+        close = float(self._full(symbol)['Close'].iloc[-1])
+        return {'marketCap': rng.uniform(5e10, 3e12), 'trailingPE': rng.uniform(8, 60),
+                'fiftyTwoWeekHigh': close * rng.uniform(1.0, 1.4), 'fiftyTwoWeekLow': close * rng.uniform(0.6, 1.0)}
+
+    def search(self, query, news_count=10, **kwargs):
+        articles = [{'title': f"{query} headline {i}", 'link': f"https://news.example/{query}/{i}",
+                     'publisher': "Example Wire", 'providerPublishTime': 1_700_000_000 + i * 3600}
+                    for i in range(news_count)]
+        research = [{'title': f"{query} research note", 'link': f"https://research.example/{query}"}]
+        return SimpleNamespace(news=articles, research=research)
+
+    def close(self):
+        pass
+
+
+class SyntheticTogether:
+    """Seeded fake of Together chat completions: ticker JSON for extraction, a markdown report otherwise."""
+
+    def __init__(self, answer_tokens: int):
+        self.answer_tokens = answer_tokens
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, stream=False, **kwargs):
+        from luminafi import prompts
+        from luminafi.llm_cache import make_chunk
+
+        text = json.dumps(messages[-1]['content'] if isinstance(messages[-1]['content'], str)
+                          else [part.get('text') for part in messages[-1]['content']])
+        usage = SimpleNamespace(prompt_tokens=prompts.count_tokens(text), completion_tokens=self.answer_tokens)
+        if messages[0]['content'] == prompts.SYSTEM_SYMBOL_EXTRACTOR:
+            query = text.rsplit("User query:", 1)[-1]
+            content = json.dumps([s for s in UNIVERSE if re.search(rf"\b{s}\b", query)])
+            deltas = [content]
+        else:
+            rng = random.Random(_seed(text))
+            deltas = []
+            for i in range(self.answer_tokens):
+                deltas.append(f"\n\n## Section {i // 80 + 1}\n\n" if i % 80 == 0 else f"{rng.choice(WORDS)} ")
+            content = "".join(deltas)
+        if stream:
+            return iter([make_chunk(delta) for delta in deltas] + [SimpleNamespace(choices=[], usage=usage)])
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def query_for(symbols) -> str:
+    return "Compare " + " vs ".join(symbols)
+
+
+def run_request(workflow, query, period, chart_type):
+    """Run one request; return the seconds spent per stage (news as one span) and in total."""
+    from luminafi.pipeline import build_graph, resolve_symbols
+
+    started = time.perf_counter()
+    symbols = resolve_symbols(workflow, query)
+    extracted = time.perf_counter()
+    run = build_graph(workflow, symbols, query, period, chart_type, figure=True, chart=True).run_sync()
+    seconds = {'symbols': extracted - started, 'total': time.perf_counter() - started}
+    news = [t for name, t in run.timings.items() if name.startswith("news:")]
+    if news:
+        seconds['news'] = max(t.end for t in news) - min(t.start for t in news)
+    for name, timing in run.timings.items():
+        if name in STAGES:
+            seconds[name] = timing.seconds
+    return seconds, run
+
+
+def percentile(values, q: float) -> float:
+    """Linearly interpolated percentile, ``q`` in [0, 100]."""
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def record_cassette(path, scenarios, answer_tokens):
+    """Run every scenario once against the synthetic upstreams, recording their responses."""
+    from luminafi.finance_workflow import FinanceWorkflow
+    from luminafi.replay import Cassette, RecordingMarketClient, RecordingTogether
+
+    cassette = Cassette(path)
+    workflow = FinanceWorkflow(together_client=RecordingTogether(SyntheticTogether(answer_tokens), cassette),
+                               market=RecordingMarketClient(SyntheticMarket(), cassette))
+    for count, period, chart_type in scenarios:
+        run_request(workflow, query_for(UNIVERSE[:count]), period, chart_type)
+    cassette.save()
+    return cassette
+
+
+def configure(cache_dir):
+    """Point caches at ``cache_dir``, expire them immediately and lift the rate limits."""
+    from luminafi import config
+
+    config.CACHE_DIR = cache_dir
+    config.PRICE_CACHE_REFRESH_SECONDS = 0
+    config.FUNDAMENTALS_TTL_SECONDS = 0
+    config.FUNDAMENTALS_MAX_STALE_SECONDS = 0
+    config.LLM_CACHE_TTL_SECONDS = 0
+    config.NEWS_TTL_SECONDS = 0
+    config.YAHOO_RATE_PER_SECOND = 0
+    config.TOGETHER_RATE_PER_SECOND = 0
+
+
+def _rounded(value, digits=4):
+    if isinstance(value, dict):
+        return {key: _rounded(item, digits) for key, item in value.items()}
+    return round(value, digits) if isinstance(value, float) else value
+
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of ``results`` against ``baseline``."""
+    failures = []
+    for section in ("stages", "scenarios"):
+        for name, measured in results[section].items():
+            base = baseline.get(section, {}).get(name)
+            if not base:
+                continue
+            for key, value in measured.items():
+                if key not in GATED_KEYS or key not in base or value is None:
+                    continue
+                slack = LATENCY_SLACK_SECONDS if key.startswith("p") else 0
+                if value > base[key] * (1 + tolerance) + slack:
+                    failures.append(f"{section}/{name} {key}: {value:,.4g} > baseline {base[key]:,.4g}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--symbols", type=int, nargs="+", default=[1, 5, 10], help="symbol counts (1-10)")
+    parser.add_argument("--periods", nargs="+", default=["1mo", "1y", "5y"])
+    parser.add_argument("--chart-types", nargs="+", default=["line", "candlestick"])
+    parser.add_argument("--iterations", type=int, default=3, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.02, help="stand-in latency per request (s)")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--token-delay", type=float, default=0.001, help="delay between streamed chunks (s)")
+    parser.add_argument("--answer-tokens", type=int, default=400, help="length of synthetic analyses")
+    parser.add_argument("--cassette", help="replay this cassette instead of recording a synthetic one")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--output", help="also write the raw per-request timings to this JSON file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="luminafi-bench-")
+    configure(os.path.join(workdir, "cache"))
+
+    from luminafi import resilience
+    from luminafi.finance_workflow import FinanceWorkflow
+    from luminafi.replay import Cassette
+    from luminafi.resources import _make_together_client
+    from luminafi.standin import StandInMarketClient, StandInServer
+
+    scenarios = [(count, period, chart_type) for count in args.symbols for period in args.periods
+                 for chart_type in args.chart_types]
+    if args.cassette:
+        cassette = Cassette(args.cassette)
+    else:
+        cassette = record_cassette(os.path.join(workdir, "cassette.json.gz"), scenarios, args.answer_tokens)
+
+    server = StandInServer(cassette, latency=args.latency, jitter=args.jitter, token_delay=args.token_delay)
+    url = server.start()
+    workflow = FinanceWorkflow(together_client=_make_together_client(base_url=f"{url}/v1"),
+                               market=StandInMarketClient(url))
+
+    samples = {stage: [] for stage in STAGES}
+    scenario_results, raw = {}, []
+    try:
+        for count, period, chart_type in scenarios:
+            name = f"{count}x{period}-{chart_type}"
+            query = query_for(UNIVERSE[:count])
+            for _ in range(args.warmup):
+                run_request(workflow, query, period, chart_type)
+            totals, sent, received = [], [], []
+            for _ in range(args.iterations):
+                before = server.stats()
+                seconds, run = run_request(workflow, query, period, chart_type)
+                after = server.stats()
+                if run.errors:
+                    print(f"{name}: failed stages {', '.join(run.errors)}")
+                for stage, value in seconds.items():
+                    samples[stage].append(value)
+                totals.append(seconds['total'])
+                sent.append(after['bytes_in'] - before['bytes_in'])
+                received.append(after['bytes_out'] - before['bytes_out'])
+                raw.append({'scenario': name, **seconds})
+            # Peak memory from a separate traced request, since tracing slows everything down
+            tracemalloc.start()
+            run_request(workflow, query, period, chart_type)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            scenario_results[name] = {
+                'p50': percentile(totals, 50), 'p95': percentile(totals, 95),
+                'peak_mb': peak / 2 ** 20, 'sent_kb': max(sent) / 1024, 'received_kb': max(received) / 1024,
+            }
+            result = scenario_results[name]
+            print(f"{name:<20} p50 {result['p50'] * 1000:8.1f} ms  p95 {result['p95'] * 1000:8.1f} ms  "
+                  f"peak {result['peak_mb']:7.1f} MB  sent {result['sent_kb']:8.1f} KB  "
+                  f"received {result['received_kb']:8.1f} KB")
+    finally:
+        server.stop()
+        workflow.close()
+
+    stage_results = {stage: {'p50': percentile(values, 50), 'p95': percentile(values, 95),
+                             'p99': percentile(values, 99)}
+                     for stage, values in samples.items() if values}
+    print(f"\n{'stage':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'n':>6}")
+    for stage, result in stage_results.items():
+        print(f"{stage:<12}{result['p50'] * 1000:>10.1f}{result['p95'] * 1000:>10.1f}"
+              f"{result['p99'] * 1000:>10.1f}{len(samples[stage]):>6}")
+    errors = {name: stats['errors'] + stats['failures'] for name, stats in resilience.snapshot().items()
+              if stats['errors'] or stats['failures']}
+    if errors:
+        print(f"Upstream errors (cassette misses or failures): {errors}")
+
+    results = {
+        'settings': {'latency': args.latency, 'jitter': args.jitter, 'token_delay': args.token_delay,
+                     'answer_tokens': args.answer_tokens, 'iterations': args.iterations},
+        'stages': stage_results,
+        'scenarios': scenario_results,
+    }
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump({'results': results, 'requests': raw}, handle, indent=2)
+
+    if args.update:
+        with open(BASELINE_PATH, "w") as handle:
+            json.dump(_rounded(results), handle, indent=2)
+            handle.write("\n")
+        print(f"Baseline updated in {BASELINE_PATH}")
+        return 0
+    if not os.path.exists(BASELINE_PATH):
+        print("No baseline yet; run with --update to save one")
+        return 0
+    with open(BASELINE_PATH) as handle:
+        baseline = json.load(handle)
+    if baseline.get('settings') != results['settings']:
+        print("Note: baseline was recorded with different settings")
+    failures = compare(results, baseline, args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    print("ok" if not failures else f"{len(failures)} regressions (tolerance {args.tolerance:.0%})")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
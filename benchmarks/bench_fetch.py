@@ -0,0 +1,76 @@
+"""
+Benchmark: serial yfinance loop vs. the bulk/parallel fetch engine.
+
+Hits Yahoo Finance live, so numbers vary with network conditions. Run with
+
+    python -m benchmarks.bench_fetch --period 5y --repeat 3
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+if __package__ in (None, ""):
+    # Run as ``python benchmarks/bench_fetch.py`` as well as ``python -m benchmarks.bench_fetch``
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yfinance as yf
+
+from luminafi.market_data import MarketDataClient, fetch_market_data, summarize_history
+
+DEFAULT_SYMBOLS = ["AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "TSLA", "JPM", "V", "XOM"]
+
+
+def fetch_serial(symbols, period):
+    """The original one-symbol-at-a-time loop from FinanceWorkflow.fetch_financial_data."""
+    data = {}
+    for symbol in symbols:
+        try:
+            ticker = yf.Ticker(symbol)
+            hist = ticker.history(period=period)
+            info = ticker.info
+            data[symbol] = summarize_history(hist, info)
+        except Exception as e:
+            print(f"Error fetching data for {symbol}: {str(e)}")
+            data[symbol] = None
+    return data
+
+
+def _time(fn, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--symbols", nargs="+", default=DEFAULT_SYMBOLS)
+    parser.add_argument("--period", default="5y")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    args = parser.parse_args()
+
+    client = MarketDataClient(timeout=args.timeout)
+    serial, serial_data = _time(lambda: fetch_serial(args.symbols, args.period), args.repeat)
+    engine, engine_data = _time(
+        lambda: fetch_market_data(client, args.symbols, args.period, args.workers, args.timeout),
+        args.repeat,
+    )
+
+    print(f"{len(args.symbols)} symbols, period={args.period}, repeat={args.repeat}")
+    print(f"{'mode':<10}{'median s':>10}{'min s':>10}{'ok':>6}")
+    for name, timings, data in (("serial", serial, serial_data), ("engine", engine, engine_data)):
+        ok = sum(1 for record in data.values() if record and record['current_price'] is not None)
+        print(f"{name:<10}{statistics.median(timings):>10.2f}{min(timings):>10.2f}{ok:>6}")
+    print(f"speedup: {statistics.median(serial) / statistics.median(engine):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
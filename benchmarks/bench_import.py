@@ -0,0 +1,97 @@
+"""
+Cold-start benchmark: import time of the LuminaFi modules a worker loads first.
+
+Each module is imported in a fresh interpreter under ``python -X importtime``.
+The run fails (exit code 1) when the median cumulative import time exceeds the
+budget in ``import_budget.json`` or when a heavy dependency (pandas, plotly,
+yfinance, ...) is loaded at import time. Run with
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --update   # re-baseline the budget
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_budget.json")
+
+# Libraries that must only be imported by the code paths that use them
+HEAVY_MODULES = {
+    "pandas", "numpy", "yfinance", "plotly", "matplotlib", "seaborn", "pyarrow",
+    "streamlit", "together", "requests", "curl_cffi", "httpx", "PIL",
+}
+
+_LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)")
+
+# Headroom applied to the measured time when re-baselining
+UPDATE_HEADROOM = 2.0
+
+
+def measure(module: str):
+    """Import ``module`` in a fresh interpreter; return (cumulative ms, set of top-level packages imported)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    cumulative = None
+    packages = set()
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if not match:
+            continue
+        name = match.group(3)
+        packages.add(name.split(".")[0])
+        if name == module:
+            cumulative = int(match.group(2)) / 1000
+    if cumulative is None:
+        raise RuntimeError(f"{module} not found in -X importtime output")
+    return cumulative, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LuminaFi import-time budget check")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--update", action="store_true", help="write the measured times as the new budget")
+    args = parser.parse_args()
+
+    with open(BUDGET_PATH) as handle:
+        budget = json.load(handle)
+
+    failed = False
+    measured = {}
+    print(f"{'module':<30}{'median ms':>12}{'budget ms':>12}")
+    for module, budget_ms in budget.items():
+        timings = []
+        heavy = set()
+        for _ in range(args.repeat):
+            ms, packages = measure(module)
+            timings.append(ms)
+            heavy |= packages & HEAVY_MODULES
+        median = statistics.median(timings)
+        measured[module] = median
+        status = "ok"
+        if heavy:
+            status = f"FAIL heavy imports: {', '.join(sorted(heavy))}"
+            failed = True
+        elif median > budget_ms and not args.update:
+            status = "FAIL over budget"
+            failed = True
+        print(f"{module:<30}{median:>12.1f}{budget_ms:>12.1f}  {status}")
+
+    if args.update:
+        with open(BUDGET_PATH, "w") as handle:
+            json.dump({m: round(ms * UPDATE_HEADROOM, 1) for m, ms in measured.items()}, handle, indent=2)
+            handle.write("\n")
+        print(f"Budget updated in {BUDGET_PATH}")
+        return
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
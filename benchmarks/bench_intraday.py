@@ -0,0 +1,108 @@
+"""
+Benchmark: chunked intraday history downloads.
+
+Serves synthetic 1m/5m bars from an in-process client that takes
+``--latency`` seconds per request plus ``--per-day`` seconds per day of bars
+requested, like Yahoo. Reports when the first window reached the chart,
+when all bars were in, compared with one request for the whole span (which
+Yahoo refuses for 1m bars beyond 8 days), and
+the bytes the stitched history takes in the price store against a float64
+DataFrame. No network access is needed. Run with
+
+    python -m benchmarks.bench_intraday --symbols 5 --interval 1m --period 1mo
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+if __package__ in (None, ""):
+    # Run as ``python benchmarks/bench_intraday.py`` as well as ``python -m benchmarks.bench_intraday``
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SYMBOLS = ["AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "TSLA", "JPM", "V", "XOM"]
+MINUTES = {"1m": 1, "5m": 5, "15m": 15, "30m": 30, "1h": 60}
+
+
+class SyntheticIntradayClient:
+    """Regular-session bars for any symbol, with a per-request and per-day delay."""
+
+    timeout = 30.0
+
+    def __init__(self, latency: float, per_day: float, seed: int = 0):
+        self.latency = latency
+        self.per_day = per_day
+        self.seed = seed
+        self.requests = 0
+
+    def download(self, symbols, **kwargs):
+        import numpy as np
+        import pandas as pd
+
+        self.requests += 1
+        start, end = pd.Timestamp(kwargs['start']), pd.Timestamp(kwargs.get('end') or pd.Timestamp.now())
+        time.sleep(self.latency + self.per_day * (end - start).days)
+        step = MINUTES[kwargs['interval']]
+        index = pd.date_range(start, end, freq=f"{step}min", inclusive="left", tz="America/New_York")
+        minutes = index.hour * 60 + index.minute
+        index = index[(index.dayofweek < 5) & (minutes >= 570) & (minutes < 960)]
+        frames = {}
+        for i, symbol in enumerate(symbols):
+            rng = np.random.default_rng(self.seed + i)
+            close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, len(index))))
+            frames[symbol] = pd.DataFrame({'Open': close, 'High': close * 1.001, 'Low': close * 0.999,
+                                           'Close': close, 'Volume': rng.integers(1_000, 50_000, len(index))},
+                                          index=index)
+        return pd.concat(frames, axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=5)
+    parser.add_argument("--interval", choices=sorted(MINUTES), default="1m")
+    parser.add_argument("--period", default="1mo")
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per request")
+    parser.add_argument("--per-day", type=float, default=0.02, help="seconds per day of bars in a request")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="luminafi-bench-intraday-")
+    os.environ["LUMINAFI_CACHE_DIR"] = directory
+    try:
+        from luminafi.market_data import download_histories
+        from luminafi.price_cache import PriceCache, fetch_start, windows
+
+        symbols = SYMBOLS[:args.symbols]
+        start = fetch_start(args.period, args.interval)
+        client = SyntheticIntradayClient(args.latency, args.per_day)
+        cache = PriceCache(directory=os.path.join(directory, "prices"))
+
+        chunks = []
+        started = time.perf_counter()
+        histories = cache.fetch(client, symbols, args.period, args.interval, max_workers=args.workers,
+                                on_chunk=lambda partial: chunks.append(
+                                    (time.perf_counter() - started, sum(len(h) for h in partial.values()))))
+        chunked = time.perf_counter() - started
+        bars = sum(len(h) for h in histories.values())
+
+        started = time.perf_counter()
+        single = download_histories(client, symbols, args.workers, start=start.strftime('%Y-%m-%d'),
+                                    interval=args.interval)
+        one_request = time.perf_counter() - started
+
+        stored = cache.store.report()['bytes']
+        frames = sum(int(h.memory_usage(index=True).sum()) for h in single.values())
+        print(f"{len(symbols)} symbols, {args.interval} bars since {start.date()}: {bars:,} bars in "
+              f"{len(windows(start, args.interval))} windows")
+        print(f"first chunk {chunks[0][0] * 1000:7.0f} ms ({chunks[0][1]:,} bars)  all chunks {chunked * 1000:7.0f} ms  "
+              f"one request {one_request * 1000:7.0f} ms")
+        print(f"price store {stored / 2**20:.1f} MB vs float64 frames {frames / 2**20:.1f} MB")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
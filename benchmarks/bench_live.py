@@ -0,0 +1,129 @@
+"""
+Benchmark: live quote fan-out and incremental chart updates.
+
+Starts the stand-in quote feed on localhost and subscribes ``--sessions``
+sessions to overlapping symbols through one ``LiveHub``. Reports the feed
+connections and quotes the hub needed, the quotes delivered to sessions and
+the delay from a quote's trade time to its delivery. It then compares adding
+the quotes to an existing chart with rebuilding the chart from the extended
+history. No network access is needed. Run with
+
+    python -m benchmarks.bench_live --sessions 50 --symbols 5 --seconds 5
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+if __package__ in (None, ""):
+    # Run as ``python benchmarks/bench_live.py`` as well as ``python -m benchmarks.bench_live``
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from luminafi.finance_workflow import FinanceWorkflow
+from luminafi.live import LiveHub
+from luminafi.standin import StandInQuoteFeed
+
+UNIVERSE = ["AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "TSLA", "JPM", "V", "XOM"]
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))] if ordered else float("nan")
+
+
+def synthetic_history(bars: int, seed: int):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    index = pd.bdate_range(end=pd.Timestamp.now().normalize() - pd.Timedelta(days=1), periods=bars)
+    return pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+                         'Volume': 1_000_000}, index=index)
+
+
+def bench_fanout(args):
+    delays = []
+    lock = threading.Lock()
+
+    def on_quote(quote):
+        with lock:
+            delays.append(time.time() - quote.time)
+
+    rng = random.Random(args.seed)
+    universe = UNIVERSE[:args.universe]
+    with StandInQuoteFeed(interval=args.quote_interval, seed=args.seed) as feed:
+        hub = LiveHub(url=feed.url)
+        subscriptions = [hub.subscribe(rng.sample(universe, args.symbols), on_quote) for _ in range(args.sessions)]
+        time.sleep(args.seconds)
+        metrics = hub.metrics()
+        drained = sum(len(subscription.drain()) for subscription in subscriptions)
+        for subscription in subscriptions:
+            subscription.close()
+        hub.close()
+        server = {'connections': feed.connections, 'subscribe messages': feed.subscriptions, 'quotes sent': feed.quotes}
+
+    print(f"{args.sessions} sessions x {args.symbols} of {len(universe)} symbols for {args.seconds}s, "
+          f"a quote per symbol every {args.quote_interval}s")
+    print(f"feed: {server['connections']} connection(s), {server['subscribe messages']} subscribe messages, "
+          f"{metrics['quotes']} quotes received for {metrics['symbols']} symbols")
+    print(f"sessions: {metrics['delivered']} quotes delivered ({drained} drained), "
+          f"{metrics['delivered'] / max(metrics['quotes'], 1):.1f} sessions per quote")
+    print(f"delivery delay ms: p50 {percentile(delays, 50) * 1000:.2f}  p95 {percentile(delays, 95) * 1000:.2f}  "
+          f"p99 {percentile(delays, 99) * 1000:.2f}")
+
+
+def bench_chart(args):
+    import pandas as pd
+
+    from luminafi.live import Quote
+
+    data = {symbol: {'history': synthetic_history(args.bars, seed)} for seed, symbol in enumerate(UNIVERSE[:args.symbols])}
+    quotes = [Quote(symbol, time.time() + i, 100.0 + i * 0.01) for i in range(args.updates) for symbol in data]
+    batch = len(data)
+
+    for chart_type in ("line", "candlestick"):
+        figure = FinanceWorkflow.create_comparison_chart(None, data, chart_type)
+        start = time.process_time()
+        for i in range(0, len(quotes), batch):
+            FinanceWorkflow.extend_comparison_chart(figure, quotes[i:i + batch])
+        extend = (time.process_time() - start) / args.updates
+
+        histories = {symbol: record['history'] for symbol, record in data.items()}
+        rebuild_times = []
+        for i in range(0, min(len(quotes), batch * 20), batch):
+            for quote in quotes[i:i + batch]:
+                bar = pd.DataFrame({'Open': quote.price, 'High': quote.price, 'Low': quote.price,
+                                    'Close': quote.price, 'Volume': 0}, index=[quote.market_time()])
+                histories[quote.symbol] = pd.concat([histories[quote.symbol], bar])
+            start = time.process_time()
+            FinanceWorkflow.create_comparison_chart(None, {s: {'history': h} for s, h in histories.items()},
+                                                    chart_type)
+            rebuild_times.append(time.process_time() - start)
+        rebuild = statistics.median(rebuild_times)
+        print(f"{chart_type:<12} extend {extend * 1000:7.2f} ms  rebuild {rebuild * 1000:7.2f} ms per update  "
+              f"({rebuild / max(extend, 1e-9):.0f}x less CPU)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--symbols", type=int, default=5, help="symbols per session")
+    parser.add_argument("--universe", type=int, default=10, help="distinct symbols sessions choose from")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--quote-interval", type=float, default=0.2, help="seconds between quotes per symbol")
+    parser.add_argument("--bars", type=int, default=1260, help="history length of the chart benchmark")
+    parser.add_argument("--updates", type=int, default=200, help="chart updates of the chart benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    bench_fanout(args)
+    bench_chart(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: screening a large universe.
+
+Serves synthetic daily bars from an in-process client that takes
+``--latency`` seconds per request plus ``--per-symbol`` seconds per symbol
+requested, like Yahoo's bulk download. Reports the time to fetch the universe
+in parallel chunks against one chunk at a time, the time of a repeated
+screen served from the price cache, and the ranking pass against the
+per-symbol metric table of the comparison workflow. No network access is
+needed. Run with
+
+    python -m benchmarks.bench_screen --symbols 500 --chunk-size 100 --workers 4
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+if __package__ in (None, ""):
+    # Run as ``python benchmarks/bench_screen.py`` as well as ``python -m benchmarks.bench_screen``
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class SyntheticDailyClient:
+    """Business-day bars for any symbol, with a per-request and per-symbol delay."""
+
+    timeout = 30.0
+
+    def __init__(self, latency: float, per_symbol: float, seed: int = 0):
+        self.latency = latency
+        self.per_symbol = per_symbol
+        self.seed = seed
+        self.requests = 0
+
+    def download(self, symbols, **kwargs):
+        import numpy as np
+        import pandas as pd
+
+        self.requests += 1
+        time.sleep(self.latency + self.per_symbol * len(symbols))
+        start = pd.Timestamp(kwargs['start']) if kwargs.get('start') else pd.Timestamp.now() - pd.DateOffset(years=1)
+        index = pd.bdate_range(start, pd.Timestamp.now().normalize(), inclusive="left")
+        frames = {}
+        for symbol in symbols:
+            rng = np.random.default_rng(self.seed + sum(map(ord, symbol)))
+            close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(index))))
+            frames[symbol] = pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99,
+                                           'Close': close, 'Volume': rng.integers(10**5, 10**7, len(index))},
+                                          index=index)
+        return pd.concat(frames, axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--period", default="1y")
+    parser.add_argument("--chunk-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per request")
+    parser.add_argument("--per-symbol", type=float, default=0.005, help="seconds per symbol in a request")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="luminafi-bench-screen-")
+    os.environ["LUMINAFI_CACHE_DIR"] = directory
+    try:
+        from luminafi.metrics import compute_metrics
+        from luminafi.price_cache import PriceCache
+        from luminafi.screener import fetch_universe, rank
+
+        universe = [f"S{i:04d}" for i in range(args.symbols)]
+        client = SyntheticDailyClient(args.latency, args.per_symbol)
+
+        timings = {}
+        for label, workers in (("one chunk at a time", 1), (f"{args.workers} chunks in parallel", args.workers)):
+            cache = PriceCache(directory=os.path.join(directory, f"prices-{workers}"))
+            started = time.perf_counter()
+            histories = fetch_universe(cache, client, universe, args.period, args.chunk_size, workers)
+            timings[label] = time.perf_counter() - started
+        started = time.perf_counter()
+        fetch_universe(cache, client, universe, args.period, args.chunk_size, args.workers)
+        timings["repeated screen (cached)"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        table = rank(histories)
+        ranked = time.perf_counter() - started
+        started = time.perf_counter()
+        compute_metrics({symbol: {'history': history} for symbol, history in histories.items()})
+        per_symbol = time.perf_counter() - started
+
+        print(f"{args.symbols} symbols over {args.period} in chunks of {args.chunk_size}: "
+              f"{len(table)} ranked, {client.requests} requests")
+        for label, seconds in timings.items():
+            print(f"fetch {label:<26} {seconds * 1000:8.0f} ms")
+        print(f"rank {ranked * 1000:8.1f} ms  vs comparison metric table {per_symbol * 1000:8.1f} ms "
+              f"({per_symbol / max(ranked, 1e-9):.0f}x)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
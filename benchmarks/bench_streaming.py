@@ -0,0 +1,128 @@
+"""
+Benchmark: per-token re-rendering vs. the throttled StreamRenderer.
+
+Replays a synthetic ~3000-token analysis as a chat completion stream. Every
+markdown update is serialized as the Streamlit protobuf message sent to the
+browser (plain UTF-8 if Streamlit is not installed), so the numbers show the
+CPU spent and bytes pushed per analysis. Token arrival is simulated with a
+fake clock, so no real time passes. Run with
+
+    python -m benchmarks.bench_streaming --tokens 3000 --token-ms 15
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+if __package__ in (None, ""):
+    # Run as ``python benchmarks/bench_streaming.py`` as well as ``python -m benchmarks.bench_streaming``
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from luminafi.llm_cache import make_chunk
+from luminafi.streaming import StreamRenderer, chunk_text
+from luminafi.utils import sanitize_markdown
+
+try:
+    from streamlit.proto.Markdown_pb2 import Markdown
+
+    def serialize(body: str) -> bytes:
+        return Markdown(body=body).SerializeToString()
+except ImportError:
+    def serialize(body: str) -> bytes:
+        return body.encode("utf-8")
+
+
+WORDS = ("revenue margin growth valuation earnings momentum volatility dividend guidance "
+         "sector exposure risk outlook support resistance trend").split()
+
+
+def synthetic_analysis(tokens: int, seed: int = 7) -> list:
+    """Markdown in the shape of a generated report, split into word-sized deltas."""
+    rng = random.Random(seed)
+    deltas = []
+    section = 0
+    while len(deltas) < tokens:
+        section += 1
+        deltas += [f"## {section}. Section", "\n\n"]
+        for _ in range(rng.randint(2, 4)):
+            deltas += [f"{rng.choice(WORDS)} " for _ in range(rng.randint(30, 70))] + ["\n\n"]
+        for _ in range(rng.randint(3, 6)):
+            deltas += ["- **", rng.choice(WORDS), "**: "] + [f"{rng.choice(WORDS)} " for _ in range(12)] + ["\n"]
+        deltas.append("\n")
+    return [make_chunk(delta) for delta in deltas[:tokens]]
+
+
+class Sink:
+    """Stand-in for a Streamlit container that records what would be sent to the browser."""
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+
+    def empty(self):
+        return self
+
+    def markdown(self, body: str):
+        self.messages += 1
+        self.bytes += len(serialize(body))
+
+
+def render_per_token(chunks, sink: Sink) -> str:
+    """The original app loop: re-render the whole document for every delta."""
+    placeholder = sink.empty()
+    streamed_text = ""
+    for chunk in chunks:
+        delta = chunk_text(chunk)
+        if delta:
+            streamed_text += delta
+            placeholder.markdown(streamed_text)
+    return sanitize_markdown(streamed_text)
+
+
+def render_throttled(chunks, sink: Sink, token_ms: float, interval: float) -> str:
+    now = [0.0]
+
+    def stream():
+        for chunk in chunks:
+            now[0] += token_ms / 1000
+            yield chunk
+
+    return StreamRenderer(sink, interval=interval, clock=lambda: now[0]).render(stream())
+
+
+def _measure(fn, repeat):
+    timings, sink = [], None
+    for _ in range(repeat):
+        sink = Sink()
+        start = time.process_time()
+        fn(sink)
+        timings.append(time.process_time() - start)
+    return statistics.median(timings), sink
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=3000)
+    parser.add_argument("--token-ms", type=float, default=15.0, help="simulated time between tokens")
+    parser.add_argument("--interval", type=float, default=0.1, help="StreamRenderer flush interval (s)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    chunks = synthetic_analysis(args.tokens)
+    text_len = sum(len(chunk_text(c)) for c in chunks)
+    before_cpu, before = _measure(lambda sink: render_per_token(chunks, sink), args.repeat)
+    after_cpu, after = _measure(lambda sink: render_throttled(chunks, sink, args.token_ms, args.interval),
+                                args.repeat)
+
+    print(f"{len(chunks)} deltas, {text_len} chars, token every {args.token_ms} ms, flush every {args.interval}s")
+    print(f"{'mode':<12}{'cpu ms':>10}{'updates':>10}{'bytes':>14}")
+    print(f"{'per-token':<12}{before_cpu * 1000:>10.1f}{before.messages:>10}{before.bytes:>14,}")
+    print(f"{'throttled':<12}{after_cpu * 1000:>10.1f}{after.messages:>10}{after.bytes:>14,}")
+    print(f"cpu: {before_cpu / max(after_cpu, 1e-9):.1f}x less, bytes: {before.bytes / max(after.bytes, 1):.1f}x less")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
 import streamlit as st
-import threading
-from luminafi.finance_workflow import FinanceWorkflow
+from datetime import datetime as dt
+from luminafi import config, resilience, screener, telemetry
+from luminafi.live import get_live_hub
+from luminafi.pipeline import build_graph, merge_news, summarize
+from luminafi.price_cache import INTRADAY_WINDOWS
+from luminafi.price_store import get_price_store
+from luminafi.resources import get_workflow
+from luminafi.stages import StageMemo
+from luminafi.streaming import StreamRenderer
 from luminafi.utils import sanitize_markdown
 import pandas as pd
 
@@ -57,6 +64,201 @@ if 'messages' not in st.session_state:
     st.session_state.messages = []
 if 'workflow_data' not in st.session_state:
     st.session_state.workflow_data = {}
+# Stage results of this session keyed by their inputs, reused by later runs
+if 'stage_memo' not in st.session_state:
+    st.session_state.stage_memo = StageMemo(ttl=config.STAGE_MEMO_TTL_SECONDS)
+
+STAGE_LABELS = {
+    'fetch': "Financial data fetched from yfinance",
+    'figure': "Comparison visualization created",
+    'chart': "Chart converted for AI vision",
+    'benchmark': "Benchmark history fetched",
+    'metrics': "Risk and return metrics computed",
+    'prompt': "Analysis prompt built",
+    'analysis': "AI analysis started",
+}
+
+METRIC_FORMATS = {
+    'total_return': "{:.1%}",
+    'ann_return': "{:.1%}",
+    'ann_volatility': "{:.1%}",
+    'sharpe': "{:.2f}",
+    'max_drawdown': "{:.1%}",
+    'beta': "{:.2f}",
+    'avg_volume': "{:,.0f}",
+    'volume_trend': "{:.2f}x",
+    'avg_dollar_volume': "${:,.0f}",
+}
+
+SCREEN_FORMATS = {
+    'last_price': "${:,.2f}",
+    'momentum': "{:+.1%}",
+    'return_1m': "{:+.1%}",
+    'return_3m': "{:+.1%}",
+    'total_return': "{:+.1%}",
+    'sharpe': "{:.2f}",
+    'ann_volatility': "{:.1%}",
+    'max_drawdown': "{:.1%}",
+}
+
+def render_news(news_list):
+    """Show the news ticker and the first five articles."""
+    ticker_headlines = news_list[:5]
+    news_text = " | ".join([f"{article['title']}" for article in ticker_headlines])
+    ticker_content = f"📈 <strong>BREAKING NEWS:</strong> {news_text}"
+    st.markdown(f"""
+    <div class="news-ticker">
+        <div class="news-ticker-content" style='animation: ticker 25s linear infinite;'>
+            {ticker_content}
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+    if not news_list:
+        st.info("No news available.")
+    st.markdown("<h4 style='margin-top:2rem; color:#333;'>Learn more about the latest articles:</h4>", unsafe_allow_html=True)
+    for idx, article in enumerate(news_list[:5], 1):
+        pub_date = article.get('publishedAt', '')
+        try:
+            pub_date_fmt = dt.fromtimestamp(int(pub_date)).strftime('%Y-%m-%d %H:%M')
+        except Exception:
+            try:
+                pub_date_fmt = dt.fromisoformat(pub_date).strftime('%Y-%m-%d %H:%M')
+            except Exception:
+                pub_date_fmt = str(pub_date)
+        expander_label = f'📰 {idx}. {article["title"]}'
+        with st.expander(expander_label, expanded=False):
+            if article.get('description'):
+                st.markdown(f"<span style='color:#555;'>{article['description']}</span>", unsafe_allow_html=True)
+            if article.get('url'):
+                st.markdown(f'<a href="{article["url"]}" target="_blank" style="color:#2196f3; font-weight:600; text-decoration:none;">🔗 Read Full Article</a>', unsafe_allow_html=True)
+            st.markdown(f'<span style="color:#888; font-size:0.95rem;">📅 Published: {pub_date_fmt}</span>', unsafe_allow_html=True)
+
+def render_spans(container, spans):
+    """Debug panel: the spans of the last request in start order, nested by depth, relative to the first."""
+    origin = min(span['start'] for span in spans)
+    rows = [{
+        'span': "· " * span['depth'] + span['name'],
+        'start (ms)': round((span['start'] - origin) * 1000, 1),
+        'duration (ms)': round(span['seconds'] * 1000, 1),
+        'details': ", ".join(f"{key}={value}" for key, value in span['attributes'].items()),
+    } for span in sorted(spans, key=lambda span: span['start'])]
+    with container.container():
+        st.caption(f"{len(spans)} spans of the last request")
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+def screener_page(workflow, time_period, chart_type):
+    """Screening mode: rank a whole universe in one table and send only its top symbols to the AI analysis."""
+    st.subheader("🔭 Universe Screen")
+    source = st.radio("Universe", ["Bundled tickers", "Upload CSV", "Paste tickers"], horizontal=True,
+                      key="screen_source")
+    if source == "Upload CSV":
+        upload = st.file_uploader("CSV with a Symbol or Ticker column, e.g. an index constituent list",
+                                  type=["csv", "txt"], key="screen_upload")
+        universe = screener.parse_universe(upload.getvalue().decode("utf-8", errors="replace")) if upload else []
+    elif source == "Paste tickers":
+        universe = screener.parse_universe(st.text_area("Tickers", key="screen_text",
+                                                        placeholder="AAPL, MSFT, NVDA, ..."))
+    else:
+        universe = screener.known_universe()
+    col1, col2 = st.columns(2)
+    sort_by = col1.selectbox("Rank by", list(screener.RANK_COLUMNS), key="screen_sort",
+                             format_func=lambda column: screener.RANK_COLUMNS[column][0])
+    top_n = col2.number_input("AI analysis of the top", min_value=0, max_value=10, value=config.SCREENER_TOP_N,
+                              key="screen_top")
+    st.caption(f"{len(universe)} tickers · {time_period} of daily closes")
+
+    analyze = False
+    if st.button("🔭 Run screen", key="run_screen", disabled=not universe):
+        progress = st.progress(0.0, text="Fetching histories...")
+
+        def on_chunk(done, total):
+            progress.progress(done / total, text=f"Fetched {done} of {total} tickers")
+
+        result = screener.screen(workflow, universe, time_period, sort_by, on_chunk=on_chunk)
+        progress.empty()
+        st.session_state.screen = {'result': result, 'analysis': None}
+        analyze = bool(top_n) and not result.table.empty
+    screen = st.session_state.get('screen')
+    if not screen:
+        return
+
+    result = screen['result']
+    missing = f" · no data for {len(result.missing)}" if result.missing else ""
+    st.caption(f"Ranked {len(result.table)} of {len(result.universe)} tickers over {result.period} "
+               f"in {result.seconds:.1f}s{missing}")
+    # Re-ranking only reorders the table; click a column header to sort by it instead
+    table = screener.order(result.table, sort_by)
+    st.dataframe(table.style.format(SCREEN_FORMATS, na_rep="N/A"), use_container_width=True, height=420)
+    st.download_button("⬇️ Download CSV", table.to_csv(), file_name=f"screen_{result.period}_{sort_by}.csv",
+                       mime="text/csv", key="screen_download")
+
+    if analyze:
+        symbols = result.top(int(top_n))
+        query = screener.screen_query(result, len(symbols))
+        st.subheader(f"📊 AI Analysis of the top {len(symbols)}")
+        with st.spinner(f"Analyzing {', '.join(symbols)}..."):
+            graph = build_graph(workflow, symbols, query, time_period, chart_type, news=False, stream=True)
+            run = graph.run_sync(memo=st.session_state.stage_memo)
+        response = run.results.get('analysis')
+        analysis = None
+        if response is not None and not isinstance(response, str):
+            analysis = StreamRenderer(st.container()).render(response)
+        elif response:
+            analysis = response
+            st.markdown(sanitize_markdown(analysis))
+        if not analysis:
+            analysis = workflow.call_together_ai_text_only(run.results.get('fetch') or {}, query,
+                                                           analysis_prompt=run.results.get('prompt'),
+                                                           metrics=run.results.get('metrics'))
+            st.markdown(sanitize_markdown(analysis))
+        screen['analysis'] = sanitize_markdown(analysis)
+    elif screen['analysis']:
+        st.subheader("📊 AI Analysis of the top symbols")
+        st.markdown(screen['analysis'])
+
+@st.fragment
+def news_panel():
+    """News section of the last query; refreshing it reruns only this fragment, not the whole script."""
+    workflow_data = st.session_state.workflow_data
+    if st.button("🔄 Refresh news", key="refresh_news"):
+        workflow = get_workflow()
+        workflow_data['news'] = workflow.news.fetch_all(workflow.market, workflow_data.get('symbols', []))
+    render_news(workflow_data.get('news', []))
+
+def chart_figure(workflow, chart):
+    """Rebuild the chart of a session's ``chart`` handle from the histories in the shared price store."""
+    histories = workflow.price_cache.cached(chart['symbols'], chart['period'], chart['interval'])
+    data = {symbol: {'history': histories[symbol]} if symbol in histories else None for symbol in chart['symbols']}
+    return workflow.create_comparison_chart(data, chart['chart_type'])
+
+@st.fragment(run_every=config.LIVE_REFRESH_SECONDS)
+def live_chart():
+    """Chart of the last query with live quotes, rebuilt from the price store with the quotes received so far."""
+    workflow_data = st.session_state.workflow_data
+    symbols = workflow_data.get('symbols', [])
+    workflow = get_workflow()
+    subscription = st.session_state.get('live_subscription')
+    if subscription is None or subscription.symbols != symbols:
+        if subscription is not None:
+            subscription.close()
+        subscription = st.session_state.live_subscription = get_live_hub(workflow.price_cache).subscribe(symbols)
+    # The session keeps the quotes rather than a figure; the histories are the store's shared arrays
+    quotes = workflow_data.setdefault('quotes', [])
+    quotes.extend(subscription.drain())
+    chart = workflow_data.get('chart')
+    if chart is not None:
+        figure = chart_figure(workflow, chart)
+        if quotes:
+            workflow.extend_comparison_chart(figure, quotes)
+        st.plotly_chart(figure, use_container_width=True, key="live_chart")
+    latest = [quote for quote in map(subscription.hub.latest, symbols) if quote is not None]
+    if latest:
+        st.caption("📡 " + " · ".join(
+            f"**{quote.symbol}** ${quote.price:,.2f}"
+            + (f" ({quote.change_percent:+.2f}%)" if quote.change_percent is not None else "")
+            for quote in latest))
+    else:
+        st.caption("📡 Waiting for live quotes...")
 
 def main():
     st.markdown("""
@@ -83,7 +285,7 @@ def main():
             
             Use the **Analysis Parameters** section in the sidebar to adjust the time period and chart type for your analysis. This lets you customize the data range and visualization style to fit your needs.
             
-            This app is designed for investors, analysts, and anyone interested in deep, AI-driven insights into stocks and markets. It does not provide live streaming prices, but focuses on robust, explainable, and up-to-date analysis.
+            This app is designed for investors, analysts, and anyone interested in deep, AI-driven insights into stocks and markets. Tick **📡 Live quotes** in the sidebar to keep the chart of your last query updating with streaming prices while you read the robust, explainable, and up-to-date analysis.
             """
         )
 
@@ -109,7 +311,8 @@ def main():
         </div>
         """, unsafe_allow_html=True)
 
-    workflow = FinanceWorkflow()
+    # One workflow per process, shared by all sessions
+    workflow = get_workflow()
 
     with st.sidebar:
         st.header("⚙️ Configuration")
@@ -123,11 +326,21 @@ def main():
             </div>
             """, unsafe_allow_html=True)
         st.subheader("Analysis Parameters")
+        mode = st.radio("Mode", ["Compare", "Screen"], horizontal=True, key="mode",
+                        help="Compare a few symbols in depth, or rank a whole universe and analyze its leaders")
         time_period = st.selectbox(
             "Time Period",
-            ["1mo", "3mo", "6mo", "1y", "2y", "5y"],
-            index=3
+            ["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y"],
+            index=5
+        )
+        interval = st.selectbox(
+            "Interval",
+            ["1d", "1h", "30m", "15m", "5m", "1m"],
+            index=0,
+            help="Bar size; intraday bars stream into the chart as they download"
         )
+        if interval in INTRADAY_WINDOWS:
+            st.caption(f"{interval} bars reach back {INTRADAY_WINDOWS[interval][0]} days; longer periods are cut there.")
         chart_type = st.selectbox(
             "Chart Type",
             ["line", "candlestick"],
@@ -140,6 +353,31 @@ def main():
                 st.success("✅ Analysis complete")
             if 'news' in st.session_state.workflow_data:
                 st.success("✅ News fetched")
+        upstreams = resilience.snapshot()
+        if upstreams:
+            st.subheader("Upstream Status")
+            for name, stats in upstreams.items():
+                icon = {"closed": "🟢", "half_open": "🟡"}.get(stats['state'], "🔴")
+                st.caption(f"{icon} **{name}**: {stats['state'].replace('_', '-')} · {stats['calls']} calls · "
+                           f"{stats['retries']} retries · {stats['rejected']} rejected")
+        store = get_price_store().report()
+        if store['series']:
+            rss = f" · worker RSS {store['rss_bytes'] / 2**20:.0f} MB" if store['rss_bytes'] else ""
+            st.caption(f"🗄️ **Price store**: {store['series']} series · {store['bytes'] / 2**20:.1f} of "
+                       f"{store['max_bytes'] / 2**20:.0f} MB{rss}")
+        live_quotes = st.checkbox("📡 Live quotes", key="live_quotes",
+                                  help="Stream the prices of the current symbols into the chart")
+        if not live_quotes and 'live_subscription' in st.session_state:
+            st.session_state.pop('live_subscription').close()
+        debug_timings = st.checkbox("🔬 Debug timings", key="debug_timings",
+                                    help="Record the spans of the next request and show them here")
+        debug_panel = st.empty()
+        if debug_timings and st.session_state.workflow_data.get('spans'):
+            render_spans(debug_panel, st.session_state.workflow_data['spans'])
+
+    if mode == "Screen":
+        screener_page(workflow, time_period, chart_type)
+        return
 
     st.subheader("💬 Financial Analysis Chat")
     for message in st.session_state.messages:
@@ -158,15 +396,21 @@ def main():
                 """, unsafe_allow_html=True)
     user_input = st.chat_input("Enter your financial comparison query (e.g., 'Compare AAPL vs GOOGL vs MSFT')")
     if user_input:
-        user_input_to_keep = user_input
-        st.session_state.clear()
-        st.session_state['user_input'] = user_input_to_keep
+        st.session_state['user_input'] = user_input
         st.rerun()
+    last_run = st.session_state.workflow_data
+    if ('user_input' not in st.session_state and last_run.get('query')
+            and (last_run.get('period'), last_run.get('interval'), last_run.get('chart_type'))
+            != (time_period, interval, chart_type)):
+        # A changed time period, interval or chart type re-runs the last query; only the stages it affects recompute
+        st.session_state['user_input'] = last_run['query']
     if 'user_input' in st.session_state:
         user_input = st.session_state.pop('user_input')
         st.session_state.messages = []
         st.session_state.workflow_data = {}
-        symbols = workflow.extract_symbols_llm(user_input)
+        # Spans of this request for the debug panel (collected even while telemetry export is off)
+        spans = telemetry.start_collecting(debug_timings)
+        symbols = workflow.extract_symbols(user_input)
         if symbols is None:
             st.error("LLM symbol extraction failed. Please try again or use a different query.")
             st.stop()
@@ -181,125 +425,128 @@ def main():
         if len(symbols) > 10:
             st.warning(f"Too many symbols ({len(symbols)}). Limiting to first 10 symbols.")
             symbols = symbols[:10]
-        st.session_state.workflow_data['news'] = []
-        if symbols:
-            with st.spinner("Fetching news for first symbol..."):
-                first_symbol_news = workflow.fetch_financial_news(symbols[0])
-                st.session_state.workflow_data['news'] = first_symbol_news
+        st.session_state.workflow_data.update(symbols=symbols, news=[], query=user_input, period=time_period,
+                                              interval=interval, chart_type=chart_type)
         st.subheader("📰 Latest Financial News")
-        news_list = st.session_state.workflow_data.get('news', [])
-        ticker_headlines = news_list[:5]
-        news_text = " | ".join([f"{article['title']}" for article in ticker_headlines])
-        ticker_content = f"📈 <strong>BREAKING NEWS:</strong> {news_text}"
-        st.markdown(f"""
-        <div class="news-ticker">
-            <div class="news-ticker-content" style='animation: ticker 25s linear infinite;'>
-                {ticker_content}
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-        if not news_list:
-            st.info("No news available.")
-        st.markdown("<h4 style='margin-top:2rem; color:#333;'>Learn more about the latest articles:</h4>", unsafe_allow_html=True)
-        from datetime import datetime as dt
-        for idx, article in enumerate(news_list[:5], 1):
-            pub_date = article.get('publishedAt', '')
-            try:
-                pub_date_fmt = dt.fromtimestamp(int(pub_date)).strftime('%Y-%m-%d %H:%M')
-            except Exception:
-                try:
-                    pub_date_fmt = dt.fromisoformat(pub_date).strftime('%Y-%m-%d %H:%M')
-                except Exception:
-                    pub_date_fmt = str(pub_date)
-            expander_label = f'📰 {idx}. {article["title"]}'
-            with st.expander(expander_label, expanded=False):
-                if article.get('description'):
-                    st.markdown(f"<span style='color:#555;'>{article['description']}</span>", unsafe_allow_html=True)
-                if article.get('url'):
-                    st.markdown(f'<a href="{article["url"]}" target="_blank" style="color:#2196f3; font-weight:600; text-decoration:none;">🔗 Read Full Article</a>', unsafe_allow_html=True)
-                st.markdown(f'<span style="color:#888; font-size:0.95rem;">📅 Published: {pub_date_fmt}</span>', unsafe_allow_html=True)
-        def fetch_remaining_news(symbols, initial_news):
-            all_news = list(initial_news)
-            for symbol in symbols[1:]:
-                try:
-                    news = workflow.fetch_financial_news(symbol)
-                    all_news.extend(news)
-                    st.session_state.workflow_data['news'] = all_news
-                    st.rerun()
-                except Exception as e:
-                    print(f"Error fetching news for {symbol}: {e}")
-            st.session_state.workflow_data['news'] = all_news
-        if len(symbols) > 1:
-            threading.Thread(target=fetch_remaining_news, args=(symbols, first_symbol_news), daemon=True).start()
+        news_placeholder = st.empty()
+        with news_placeholder:
+            st.info("Fetching news...")
         col1, col2 = st.columns([2, 1])
         with col2:
             st.subheader("🔄 Workflow Progress")
             progress_bar = st.progress(0)
             status_container = st.empty()
         with col1:
+            chart_placeholder = st.empty()
+        def on_history_chunk(histories):
+            # Intraday windows arrive one by one; draw what is there so far until the full chart is ready
+            chart_placeholder.plotly_chart(
+                workflow.create_comparison_chart({symbol: {'history': hist} for symbol, hist in histories.items()},
+                                                 chart_type), use_container_width=True)
+            closes = {symbol: hist['Close'] for symbol, hist in histories.items() if len(hist)}
+            moves = " · ".join(f"{symbol} {close.iloc[-1]:.2f} ({close.iloc[-1] / close.iloc[0] - 1:+.2%})"
+                               for symbol, close in closes.items())
             with status_container:
-                st.markdown("""
+                st.markdown(f"""
                 <div class="workflow-step">
-                    <strong>Step 1:</strong> Fetching financial data from yfinance...
+                    <strong>Loading {interval} bars:</strong> {sum(len(hist) for hist in histories.values()):,} so far<br>{moves}
                 </div>
                 """, unsafe_allow_html=True)
-            progress_bar.progress(20)
-            financial_data = workflow.fetch_financial_data(symbols, time_period)
-            st.session_state.workflow_data['financial_data'] = financial_data
+
+        # News, prices, chart, prompt and LLM call run as a stage DAG; independent stages overlap
+        graph = build_graph(workflow, symbols, user_input, time_period, chart_type, figure=True, stream=True,
+                            interval=interval, on_chunk=on_history_chunk if interval in INTRADAY_WINDOWS else None)
+        total_steps = len(graph) + 1  # plus streaming the analysis
+
+        def on_stage_complete(name, run):
+            progress_bar.progress(int(100 * len(run.timings) / total_steps))
+            timing = run.timings[name]
+            label = STAGE_LABELS.get(name) or f"News fetched for {name.split(':', 1)[-1]}"
             with status_container:
-                st.markdown("""
+                st.markdown(f"""
                 <div class="workflow-step">
-                    <strong>Step 2:</strong> Creating comparison visualization...
+                    <strong>{label}</strong> ({timing.seconds:.1f}s{', ' + timing.status if timing.status != 'ok' else ''})
                 </div>
                 """, unsafe_allow_html=True)
-            progress_bar.progress(40)
-            chart = None
-            chart_base64 = None
-            if any(data for data in financial_data.values() if data):
-                chart = workflow.create_comparison_chart(financial_data, chart_type)
-                st.plotly_chart(chart, use_container_width=True)
-                st.session_state.workflow_data['chart'] = chart
-                chart_base64 = workflow.chart_to_base64(chart)
-                if chart_base64:
-                    st.success("✅ Chart converted for AI vision analysis")
+            if name.startswith('news:'):
+                st.session_state.workflow_data['news'] = merge_news(run, symbols)
+                with news_placeholder.container():
+                    render_news(st.session_state.workflow_data['news'])
+            elif name == 'figure' and run.results.get('figure') is not None:
+                # A handle to the chart's inputs, not the figure; the live chart rebuilds it from the price store
+                st.session_state.workflow_data['chart'] = dict(symbols=symbols, period=time_period,
+                                                               interval=interval, chart_type=chart_type)
+                if live_quotes:
+                    with chart_placeholder.container():
+                        live_chart()
+                else:
+                    chart_placeholder.plotly_chart(run.results['figure'], use_container_width=True)
+
+        memo = st.session_state.stage_memo
+        run = graph.run_sync(on_stage_complete, memo=memo)
+        financial_data = run.results.get('fetch') or {symbol: None for symbol in symbols}
+        # Only the figures of the summary table are kept in the session, not the histories
+        st.session_state.workflow_data['summary'] = summarize(financial_data)
+        st.session_state.workflow_data['metrics'] = run.results.get('metrics')
+        # Hand the finished news over to the fragment, which can refresh it on its own
+        with news_placeholder.container():
+            news_panel()
+        with col1:
+            if (run.results.get('chart') or (None,))[0]:
+                st.success("✅ Chart converted for AI vision analysis")
             with status_container:
                 st.markdown("""
                 <div class="workflow-step">
-                    <strong>Step 3:</strong> Generating AI analysis with chart vision...
+                    <strong>Streaming AI analysis...</strong>
                 </div>
                 """, unsafe_allow_html=True)
-            progress_bar.progress(60)
-            if 'analysis' not in st.session_state.workflow_data:
-                # Use vision LLM with chart image if available, otherwise fallback to text-only analysis
-                if chart_base64:
-                    response_stream = workflow.call_together_ai_with_vision(financial_data, user_input, chart_base64)
-                    output_placeholder = st.empty()
-                    streamed_text = ""
-                    if response_stream:
-                        for chunk in response_stream:
-                            if hasattr(chunk, 'choices') and chunk.choices and hasattr(chunk.choices[0], 'delta'):
-                                delta = getattr(chunk.choices[0].delta, "content", None)
-                                if delta:
-                                    streamed_text += delta
-                                    output_placeholder.markdown(streamed_text)
-                    analysis = sanitize_markdown(streamed_text)
-                else:
-                    analysis = workflow.call_together_ai_text_only(financial_data, user_input)
-                    analysis = sanitize_markdown(analysis)
-                st.session_state.workflow_data['analysis'] = analysis
-            else:
-                analysis = st.session_state.workflow_data['analysis']
-            progress_bar.progress(100)
+            response = run.results.get('analysis')
             st.subheader("📊 AI Analysis")
-            st.markdown(analysis)
+            analysis = None
+            if response is not None and not isinstance(response, str):
+                # Finished blocks are appended once; only the unfinished tail is re-rendered, at most every 100 ms
+                analysis = StreamRenderer(st.container()).render(response)
+            elif response:
+                analysis = response
+                st.markdown(sanitize_markdown(analysis))
+            if not analysis:
+                analysis = workflow.call_together_ai_text_only(financial_data, user_input,
+                                                               analysis_prompt=run.results.get('prompt'),
+                                                               metrics=run.results.get('metrics'))
+                st.markdown(sanitize_markdown(analysis))
+            analysis = sanitize_markdown(analysis)
+            st.session_state.workflow_data['analysis'] = analysis
+            if not workflow.is_fallback_analysis(analysis):
+                # The streamed answer is memoized as text, replayed as is while its inputs stay the same
+                memo.put('analysis', graph.stages['analysis'].key, analysis)
+            progress_bar.progress(100)
             with status_container:
-                st.success("✅ Workflow completed successfully!")
-    if st.session_state.workflow_data and 'financial_data' in st.session_state.workflow_data:
+                st.success(f"✅ Workflow completed in {run.elapsed:.1f}s")
+            with st.expander("⏱️ Stage timings", expanded=False):
+                st.caption("Critical path: " + " → ".join(run.critical_path()))
+                prompt = run.results.get('prompt')
+                if prompt is not None:
+                    dropped = f", dropped: {', '.join(prompt.dropped)}" if prompt.dropped else ""
+                    st.caption(f"Analysis prompt: {prompt.tokens} tokens (budget {prompt.budget}{dropped})")
+                st.dataframe(pd.DataFrame(run.timing_table()), use_container_width=True)
+        telemetry.stop_collecting()
+        if spans:
+            st.session_state.workflow_data['spans'] = spans
+            render_spans(debug_panel, spans)
+    else:
+        if st.session_state.workflow_data.get('news'):
+            # Later reruns keep showing the news of the last query
+            st.subheader("📰 Latest Financial News")
+            news_panel()
+        if live_quotes and st.session_state.workflow_data.get('chart') is not None:
+            st.subheader("📡 Live Chart")
+            live_chart()
+    if st.session_state.workflow_data and 'summary' in st.session_state.workflow_data:
         st.subheader("📋 Data Summary")
         summary_data = []
-        for symbol, data in st.session_state.workflow_data['financial_data'].items():
+        for symbol, data in st.session_state.workflow_data['summary'].items():
             if data and data['current_price'] is not None:
-                market_cap = data['info'].get('marketCap', 'N/A')
+                market_cap = data['market_cap'] if data['market_cap'] is not None else 'N/A'
                 if isinstance(market_cap, (int, float)):
                     if market_cap >= 1e12:
                         market_cap_str = f"${market_cap/1e12:.2f}T"
@@ -337,6 +584,10 @@ def main():
         if summary_data:
             df = pd.DataFrame(summary_data)
             st.dataframe(df, use_container_width=True)
+        metrics = st.session_state.workflow_data.get('metrics')
+        if metrics is not None:
+            st.subheader("📐 Risk & Return")
+            st.dataframe(metrics.table.style.format(METRIC_FORMATS, na_rep="N/A"), use_container_width=True)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
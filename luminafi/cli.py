@@ -0,0 +1,125 @@
+"""
+``luminafi`` command line interface.
+
+    luminafi analyze watchlist.txt -o results.jsonl --concurrency 8
+    luminafi analyze -q "Compare AAPL vs MSFT" -o results.parquet --no-news
+    luminafi screen constituents.csv -o ranked.csv --rank-by momentum --top 5
+
+Each line of a watchlist is a ticker or a free-text query. A screen universe
+is a CSV with a Symbol or Ticker column, or any list of tickers.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from . import resilience, screener
+from .pipeline import build_graph, open_writer, read_watchlist, run_batch
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="luminafi", description="LuminaFi headless financial analysis")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    analyze = commands.add_parser("analyze", help="analyze a watchlist of symbols or queries")
+    analyze.add_argument("watchlist", nargs="?", help="file with one symbol or query per line")
+    analyze.add_argument("-q", "--query", action="append", default=[], help="symbol or query to analyze (repeatable)")
+    analyze.add_argument("-o", "--output", required=True, help="output file (.jsonl or .parquet)")
+    analyze.add_argument("--format", choices=["jsonl", "parquet"], help="output format (default: from extension)")
+    analyze.add_argument("--concurrency", type=int, default=4, help="watchlist items processed in parallel")
+    analyze.add_argument("--period", default="1y", help="history period, e.g. 1mo, 6mo, 1y, 5y")
+    analyze.add_argument("--interval", choices=["1d", "1h", "30m", "15m", "5m", "1m"], default="1d",
+                         help="bar size; intraday periods are limited to what Yahoo serves (1m: 30 days)")
+    analyze.add_argument("--chart-type", choices=["line", "candlestick"], default="line")
+    analyze.add_argument("--charts-dir", help="also save each chart image in this directory")
+    analyze.add_argument("--no-analysis", action="store_true", help="skip the AI analysis")
+    analyze.add_argument("--no-news", action="store_true", help="skip news lookups")
+
+    screen = commands.add_parser("screen", help="rank a universe of tickers by return, momentum and risk")
+    screen.add_argument("universe", nargs="?", help="CSV or list of tickers (default: the bundled ticker list)")
+    screen.add_argument("-o", "--output", required=True, help="ranked table (.csv, .jsonl or .parquet)")
+    screen.add_argument("--period", default="1y", help="history period, e.g. 6mo, 1y, 2y")
+    screen.add_argument("--rank-by", choices=list(screener.RANK_COLUMNS), default="momentum")
+    screen.add_argument("--top", type=int, default=0, help="print an AI analysis of the top N symbols")
+    return parser
+
+
+def analyze(args) -> int:
+    from .resources import get_workflow
+
+    items = list(args.query)
+    if args.watchlist:
+        items.extend(read_watchlist(args.watchlist))
+    if not items:
+        print("Nothing to analyze: give a watchlist file or --query", file=sys.stderr)
+        return 2
+    if args.charts_dir:
+        os.makedirs(args.charts_dir, exist_ok=True)
+
+    workflow = get_workflow()
+    writer = open_writer(args.output, args.format)
+    started = time.perf_counter()
+    completed = failed = 0
+    try:
+        for record in run_batch(workflow, items, concurrency=max(1, args.concurrency), period=args.period,
+                                interval=args.interval, chart_type=args.chart_type, analysis=not args.no_analysis,
+                                news=not args.no_news, charts_dir=args.charts_dir):
+            writer.write(record)
+            completed += 1
+            failed += record['status'] == 'error'
+            print(f"[{completed}/{len(items)}] {record['item']}: {record['status']} "
+                  f"({record['elapsed_seconds']:.1f}s)", file=sys.stderr)
+    finally:
+        writer.close()
+    print(f"Wrote {completed} results ({failed} failed) to {args.output} "
+          f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    for name, stats in resilience.snapshot().items():
+        print(f"{name}: {stats['calls']} calls, {stats['retries']} retries, {stats['rejected']} rejected, "
+              f"circuit {stats['state']}", file=sys.stderr)
+    return 1 if failed == len(items) else 0
+
+
+def screen(args) -> int:
+    from .resources import get_workflow
+
+    if args.universe:
+        with open(args.universe, encoding="utf-8") as handle:
+            universe = screener.parse_universe(handle.read())
+    else:
+        universe = screener.known_universe()
+    if not universe:
+        print(f"No tickers found in {args.universe}", file=sys.stderr)
+        return 2
+
+    workflow = get_workflow()
+    result = screener.screen(workflow, universe, args.period, args.rank_by,
+                             on_chunk=lambda done, total: print(f"[{done}/{total}] fetched", file=sys.stderr))
+    table = result.table
+    if args.output.endswith((".parquet", ".pq")):
+        table.to_parquet(args.output)
+    elif args.output.endswith(".jsonl"):
+        table.reset_index().to_json(args.output, orient="records", lines=True)
+    else:
+        table.to_csv(args.output)
+    print(f"Ranked {len(table)} of {len(universe)} tickers ({len(result.missing)} without data) by {args.rank_by} "
+          f"in {result.seconds:.1f}s, wrote {args.output}", file=sys.stderr)
+    if args.top > 0 and not table.empty:
+        symbols = result.top(args.top)
+        run = build_graph(workflow, symbols, screener.screen_query(result, len(symbols)), args.period,
+                          news=False).run_sync()
+        print(run.results.get('analysis') or "Analysis unavailable")
+    return 0 if len(table) else 1
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "analyze":
+        return analyze(args)
+    if args.command == "screen":
+        return screen(args)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
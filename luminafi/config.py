@@ -0,0 +1,117 @@
+"""
+Runtime configuration for LuminaFi.
+
+Every setting can be overridden from the environment or the ``.env`` file.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Root directory for all on-disk caches
+CACHE_DIR = os.getenv("LUMINAFI_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "luminafi"))
+
+# Price history cache: total size before least recently used files are evicted
+PRICE_CACHE_MAX_BYTES = int(float(os.getenv("LUMINAFI_PRICE_CACHE_MAX_MB", "512")) * 1024 * 1024)
+# Cached bars younger than this are served without asking Yahoo for new ones
+PRICE_CACHE_REFRESH_SECONDS = float(os.getenv("LUMINAFI_PRICE_CACHE_REFRESH_SECONDS", "900"))
+# In-memory price store shared by the sessions of a worker: memory budget, and whether to map it from shared files
+PRICE_STORE_MAX_BYTES = int(float(os.getenv("LUMINAFI_PRICE_STORE_MAX_MB", "256")) * 1024 * 1024)
+PRICE_STORE_MMAP = os.getenv("LUMINAFI_PRICE_STORE_MMAP", "1").lower() not in ("0", "false", "no")
+
+# Fundamentals (ticker.info) cache: served as-is for ttl, served stale while refreshing until max_stale
+FUNDAMENTALS_TTL_SECONDS = float(os.getenv("LUMINAFI_FUNDAMENTALS_TTL_SECONDS", "3600"))
+FUNDAMENTALS_MAX_STALE_SECONDS = float(os.getenv("LUMINAFI_FUNDAMENTALS_MAX_STALE_SECONDS", "86400"))
+# A record without any field is usually a transient Yahoo error, so it is only trusted this long
+FUNDAMENTALS_EMPTY_TTL_SECONDS = float(os.getenv("LUMINAFI_FUNDAMENTALS_EMPTY_TTL_SECONDS", "60"))
+
+# LLM analysis cache: answers older than the TTL are regenerated, least recently used beyond the cap are dropped
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LUMINAFI_LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LUMINAFI_LLM_CACHE_MAX_ENTRIES", "2000"))
+
+# Chart image sent to the vision model: png, jpeg or webp, its size and lossy quality
+CHART_IMAGE_FORMAT = os.getenv("LUMINAFI_CHART_IMAGE_FORMAT", "png")
+CHART_IMAGE_WIDTH = int(os.getenv("LUMINAFI_CHART_IMAGE_WIDTH", "1200"))
+CHART_IMAGE_HEIGHT = int(os.getenv("LUMINAFI_CHART_IMAGE_HEIGHT", "600"))
+CHART_IMAGE_QUALITY = int(os.getenv("LUMINAFI_CHART_IMAGE_QUALITY", "80"))
+# Warm worker processes kept around for chart rendering
+CHART_RENDER_WORKERS = int(os.getenv("LUMINAFI_CHART_RENDER_WORKERS", "2"))
+
+# Quantitative metrics in the prompt: benchmark for beta, annual risk-free rate for Sharpe
+BENCHMARK_SYMBOL = os.getenv("LUMINAFI_BENCHMARK_SYMBOL", "SPY")
+RISK_FREE_RATE = float(os.getenv("LUMINAFI_RISK_FREE_RATE", "0.0"))
+# Send the chart image to the vision model; when off, the metrics-rich text-only analysis is used
+VISION_ANALYSIS = os.getenv("LUMINAFI_VISION_ANALYSIS", "1").lower() not in ("0", "false", "no")
+
+# Live quote mode: streamer URL, timezone of the bars it updates, how often sessions redraw, how often
+# quotes are merged into the price cache, and quotes buffered per session between redraws
+LIVE_FEED_URL = os.getenv("LUMINAFI_LIVE_FEED_URL", "wss://streamer.finance.yahoo.com/?version=2")
+LIVE_MARKET_TZ = os.getenv("LUMINAFI_LIVE_MARKET_TZ", "America/New_York")
+LIVE_REFRESH_SECONDS = float(os.getenv("LUMINAFI_LIVE_REFRESH_SECONDS", "2"))
+LIVE_FLUSH_SECONDS = float(os.getenv("LUMINAFI_LIVE_FLUSH_SECONDS", "60"))
+LIVE_BUFFER = int(os.getenv("LUMINAFI_LIVE_BUFFER", "1000"))
+
+# Universe screens: symbols per bulk history download, downloads in parallel, and symbols sent to the analysis
+SCREENER_CHUNK_SIZE = int(os.getenv("LUMINAFI_SCREENER_CHUNK_SIZE", "100"))
+SCREENER_WORKERS = int(os.getenv("LUMINAFI_SCREENER_WORKERS", "4"))
+SCREENER_TOP_N = int(os.getenv("LUMINAFI_SCREENER_TOP_N", "5"))
+
+# How long a session reuses the results of workflow stages whose inputs did not change
+STAGE_MEMO_TTL_SECONDS = float(os.getenv("LUMINAFI_STAGE_MEMO_TTL_SECONDS", "900"))
+
+# Token budget of the analysis prompt; lower-priority table columns are dropped to fit
+PROMPT_TOKEN_BUDGET = int(os.getenv("LUMINAFI_PROMPT_TOKEN_BUDGET", "1200"))
+
+# News headlines: per-symbol cache TTL, concurrent searches, articles per search, URL index retention
+NEWS_TTL_SECONDS = float(os.getenv("LUMINAFI_NEWS_TTL_SECONDS", "300"))
+NEWS_MAX_WORKERS = int(os.getenv("LUMINAFI_NEWS_MAX_WORKERS", "4"))
+NEWS_COUNT = int(os.getenv("LUMINAFI_NEWS_COUNT", "10"))
+NEWS_INDEX_MAX_AGE_SECONDS = float(os.getenv("LUMINAFI_NEWS_INDEX_MAX_AGE_SECONDS", str(7 * 86400)))
+
+# Upstream rate limits (requests per second and burst; 0 disables the limit)
+YAHOO_RATE_PER_SECOND = float(os.getenv("LUMINAFI_YAHOO_RATE_PER_SECOND", "5"))
+YAHOO_BURST = int(os.getenv("LUMINAFI_YAHOO_BURST", "10"))
+TOGETHER_RATE_PER_SECOND = float(os.getenv("LUMINAFI_TOGETHER_RATE_PER_SECOND", "1"))
+TOGETHER_BURST = int(os.getenv("LUMINAFI_TOGETHER_BURST", "3"))
+# Longest a call waits for a rate limit token before giving up
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("LUMINAFI_RATE_LIMIT_MAX_WAIT_SECONDS", "10"))
+# Retries of transient upstream errors with jittered exponential backoff
+RETRY_ATTEMPTS = int(os.getenv("LUMINAFI_RETRY_ATTEMPTS", "2"))
+RETRY_BASE_DELAY_SECONDS = float(os.getenv("LUMINAFI_RETRY_BASE_DELAY_SECONDS", "0.5"))
+RETRY_MAX_DELAY_SECONDS = float(os.getenv("LUMINAFI_RETRY_MAX_DELAY_SECONDS", "4"))
+# Circuit breaker: consecutive failures before an upstream is failed fast, and the cool-down before a trial call
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("LUMINAFI_BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("LUMINAFI_BREAKER_RESET_SECONDS", "30"))
+# Race a second ticker.info request when the first is slower than this (0 disables hedging)
+HEDGE_INFO_AFTER_SECONDS = float(os.getenv("LUMINAFI_HEDGE_INFO_AFTER_SECONDS", "0"))
+
+# Offline runs: record live responses to a cassette file or replay them from it ("record" or "replay"),
+# or send all upstream requests to a stand-in server (python -m luminafi.standin) at this URL
+CASSETTE = os.getenv("LUMINAFI_CASSETTE", "")
+CASSETTE_MODE = os.getenv("LUMINAFI_CASSETTE_MODE", "replay").lower()
+STANDIN_URL = os.getenv("LUMINAFI_STANDIN_URL", "")
+
+# Concurrent identical requests share one upstream call; across worker processes too (through per-key file
+# locks in the cache directory), waiting at most this long for another process before going ahead alone
+SINGLE_FLIGHT_CROSS_PROCESS = os.getenv("LUMINAFI_SINGLE_FLIGHT_CROSS_PROCESS", "1").lower() not in ("0", "false", "no")
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv("LUMINAFI_SINGLE_FLIGHT_WAIT_SECONDS", "30"))
+
+# Telemetry: spans and metrics (off by default), exported in the Prometheus text format on a port and/or
+# to a file, and mirrored to the configured OpenTelemetry tracer and meter when LUMINAFI_OTEL is set
+TELEMETRY = os.getenv("LUMINAFI_TELEMETRY", "0").lower() in ("1", "true", "yes")
+METRICS_PORT = int(os.getenv("LUMINAFI_METRICS_PORT", "0"))
+METRICS_FILE = os.getenv("LUMINAFI_METRICS_FILE", "")
+# Seconds between rewrites of the metrics file (0 writes it on exit only)
+METRICS_FILE_INTERVAL_SECONDS = float(os.getenv("LUMINAFI_METRICS_FILE_INTERVAL_SECONDS", "15"))
+OTEL = os.getenv("LUMINAFI_OTEL", "0").lower() in ("1", "true", "yes")
+# Print a line per LLM request with its token counts
+DEBUG = os.getenv("LUMINAFI_DEBUG", "0").lower() in ("1", "true", "yes")
+
+# Keep-alive HTTP connections per upstream (Together, Yahoo) in the shared workflow
+HTTP_POOL_SIZE = int(os.getenv("LUMINAFI_HTTP_POOL_SIZE", "16"))
+# Rebuild the shared workflow after this many consecutive upstream failures, at most this often
+WORKFLOW_MAX_FAILURES = int(os.getenv("LUMINAFI_WORKFLOW_MAX_FAILURES", "5"))
+WORKFLOW_MIN_REBUILD_SECONDS = float(os.getenv("LUMINAFI_WORKFLOW_MIN_REBUILD_SECONDS", "30"))
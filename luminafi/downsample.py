@@ -0,0 +1,104 @@
+"""
+Shape-preserving downsampling for the comparison chart.
+
+A chart cannot show more points than it has pixels, so long histories are
+reduced before they reach Plotly or the image renderer:
+
+- line charts use Largest-Triangle-Three-Buckets (LTTB), which keeps the points
+  that carry the visible shape (peaks, troughs, turns) of the series;
+- candlestick charts aggregate bars into coarser OHLC bars (intraday bars
+  into 5-minute to daily ones, daily bars into weekly to yearly ones), so
+  highs and lows are never lost.
+
+Target sizes come from the chart's pixel width.
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# A candle needs a few pixels to show its body and wicks
+CANDLE_PIXELS = 4
+
+# Periods tried, finest first, when aggregating OHLC bars; the fixed-width ones bucket intraday bars
+OHLC_PERIODS = ["5min", "15min", "30min", "h", "D", "W", "M", "Q", "Y"]
+CALENDAR_PERIODS = {"W", "M", "Q", "Y"}
+
+
+def line_points(width: int) -> int:
+    """Target number of points for a line trace drawn ``width`` pixels wide."""
+    return max(3, int(width))
+
+
+def candle_bars(width: int) -> int:
+    """Target number of candles for a chart ``width`` pixels wide."""
+    return max(1, int(width) // CANDLE_PIXELS)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Return the indices of the ``n_out`` points LTTB keeps from the series ``(x, y)``."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Interior points 1..n-2 go into n_out-2 buckets; first and last points are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    bucket_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    bucket_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    # Each bucket is scored against the average of the next one (the last point for the final bucket)
+    next_x = np.append(bucket_x[1:], x[-1])
+    next_y = np.append(bucket_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_line(hist: pd.DataFrame, width: int, column: str = 'Close') -> pd.Series:
+    """Reduce one history column to what a ``width``-pixel line chart can show."""
+    series = hist[column].dropna()
+    n_out = line_points(width)
+    if len(series) <= n_out:
+        return series
+    x = series.index.asi8 if isinstance(series.index, pd.DatetimeIndex) else np.arange(len(series))
+    return series.iloc[lttb_indices(x, series.to_numpy(), n_out)]
+
+
+def aggregate_ohlc(hist: pd.DataFrame, max_bars: int, periods=OHLC_PERIODS) -> pd.DataFrame:
+    """Aggregate OHLC(V) bars into the finest calendar period that yields at most ``max_bars`` bars."""
+    if len(hist) <= max_bars or not isinstance(hist.index, pd.DatetimeIndex):
+        return hist
+    index = hist.index.tz_localize(None) if hist.index.tz is not None else hist.index
+
+    starts: Optional[np.ndarray] = None
+    for period in periods:
+        codes = index.to_period(period).asi8 if period in CALENDAR_PERIODS else index.floor(period).asi8
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        if len(starts) <= max_bars:
+            break
+    ends = np.r_[starts[1:], len(hist)] - 1
+
+    out = {
+        'Open': hist['Open'].to_numpy()[starts],
+        'High': np.fmax.reduceat(hist['High'].to_numpy(), starts),
+        'Low': np.fmin.reduceat(hist['Low'].to_numpy(), starts),
+        'Close': hist['Close'].to_numpy()[ends],
+    }
+    if 'Volume' in hist.columns:
+        out['Volume'] = np.add.reduceat(hist['Volume'].fillna(0).to_numpy(), starts)
+    return pd.DataFrame(out, index=hist.index[starts])
+
+
+def downsample_ohlc(hist: pd.DataFrame, width: int) -> pd.DataFrame:
+    """Reduce OHLC bars to what a ``width``-pixel candlestick chart can show."""
+    return aggregate_ohlc(hist, candle_bars(width))
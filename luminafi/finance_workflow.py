@@ -1,107 +1,293 @@
-import yfinance as yf
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from datetime import datetime, timedelta
-import requests
+from __future__ import annotations
+
 import json
+import threading
 import time
-import streamlit as st
 
 import base64
-from typing import Dict, List, Any, Optional, Union, Iterator
-import io
-import matplotlib.pyplot as plt
-import seaborn as sns
-from together import Together
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Tuple, Union, Iterator
 import os
 from dotenv import load_dotenv
-from . import prompts
+from . import config, prompts, telemetry
+from .market_data import MarketDataClient, fetch_market_data
+from .price_cache import PriceCache
+from .fundamentals import FundamentalsCache
+from .symbols import SymbolExtractor
+from .llm_cache import LLMResponseCache, data_fingerprint, make_chunk
+from .metrics import MarketMetrics, compute_metrics
+from .news import NewsService
+from .resilience import get_upstream
+from .singleflight import get_flight
+from .streaming import chunk_text
+from .rasterize import ChartRasterizer
+
+# Heavy libraries (plotly, pandas, yfinance, together) are imported
+# inside the methods that use them to keep worker cold starts fast.
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+    from .live import Quote
 
 # Load environment variables from .env file
 load_dotenv()
 
+VISION_MODEL = "meta-llama/Llama-Vision-Free"
+TEXT_MODEL = "meta-llama/Llama-3.2-3B-Instruct-Turbo"
+# Completion size caps; max_tokens is also limited by the context left after the prompt
+VISION_MAX_TOKENS = 3000
+TEXT_MAX_TOKENS = 2000
+
 class FinanceWorkflow:
-    def __init__(self):
-        # Load Together API key from environment
-        together_api_key = os.getenv("TOGETHER_API_KEY")
-        if not together_api_key:
-            raise ValueError("TOGETHER_API_KEY not found in environment. Please set it in your .env file.")
-        # Initialize Together AI client
-        self.together_client = Together(api_key=together_api_key)
-        
-    def fetch_financial_data(self, symbols: List[str], period: str = "1y") -> Dict:
-        """Fetch financial data using yfinance"""
-        data = {}
+    def __init__(self, together_client=None, market: Optional[MarketDataClient] = None):
+        if together_client is None:
+            from together import Together
+
+            # Load Together API key from environment
+            together_api_key = os.getenv("TOGETHER_API_KEY")
+            if not together_api_key:
+                raise ValueError("TOGETHER_API_KEY not found in environment. Please set it in your .env file.")
+            # Initialize Together AI client
+            together_client = Together(api_key=together_api_key)
+        self.together_client = together_client
+        # Rate limit, retries and circuit breaker shared by every Together request in the process
+        self.llm = get_upstream("together")
+        # Market data client shared by all yfinance calls of this workflow
+        self.market = market or MarketDataClient()
+        # Consecutive failures per upstream; the shared instance is rebuilt when one grows too large
+        self.failures = {'llm': 0, 'market': 0}
+        self._health_lock = threading.Lock()
+        self.created_at = time.time()
+        # On-disk OHLCV cache so repeat queries only download new bars
+        self.price_cache = PriceCache()
+        # TTL cache of the few ticker.info fields we use, shared across sessions
+        self.fundamentals = FundamentalsCache()
+        # Local ticker/company-name index in front of the LLM symbol extractor
+        self.symbol_extractor = SymbolExtractor()
+        # Persistent cache of generated analyses, keyed by model, prompt and price data
+        self.llm_cache = LLMResponseCache()
+        # Sessions asking for the same analysis at the same time share one LLM request
+        self.analysis_flight = get_flight("analysis")
+        # Matplotlib renderer pool for the vision image, replacing Kaleido
+        self.rasterizer = ChartRasterizer()
+        # Bounded, cached news searches shared across sessions
+        self.news = NewsService()
+        # Tokens spent on analysis requests (cache replays are free)
+        self.token_usage = {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+        self._usage_lock = threading.Lock()
         
-        with st.spinner("🔍 Fetching financial data..."):
-            for symbol in symbols:
-                try:
-                    ticker = yf.Ticker(symbol)
-                    hist = ticker.history(period=period)
-                    info = ticker.info
-                    
-                    current_price = hist['Close'].iloc[-1] if not hist.empty else None
-                    price_change = 0
-                    price_change_pct = 0
-                    
-                    if len(hist) > 1 and current_price is not None:
-                        first_price = hist['Close'].iloc[0]
-                        if first_price and first_price != 0:
-                            price_change = current_price - first_price
-                            price_change_pct = (price_change / first_price) * 100
-                    
-                    data[symbol] = {
-                        'history': hist,
-                        'info': info,
-                        'current_price': current_price,
-                        'price_change': price_change,
-                        'price_change_pct': price_change_pct
-                    }
-                except Exception as e:
-                    print(f"Error fetching data for {symbol}: {str(e)}")
-                    data[symbol] = None
-                    
-        return data
+    def fetch_financial_data(self, symbols: List[str], period: str = "1y", interval: str = "1d",
+                             on_chunk=None) -> Dict:
+        """Fetch financial data using yfinance; intraday histories reach ``on_chunk`` as they download"""
+        with telemetry.span("fetch_financial_data", symbols=symbols, period=period, interval=interval) as span:
+            # Histories are bulk-downloaded; info lookups run on a bounded pool
+            data = fetch_market_data(self.market, symbols, period, cache=self.price_cache,
+                                     fundamentals=self.fundamentals, interval=interval, on_chunk=on_chunk)
+            if any(data.values()):
+                self._record_success('market')
+            elif data:
+                self._record_failure('market')
+            if span.recording:
+                histories = [d['history'] for d in data.values() if d]
+                span.set(bars=sum(len(h) for h in histories),
+                         bytes=int(sum(h.memory_usage(index=True).sum() for h in histories)))
+            return data
     
-    def create_comparison_chart(self, data: Dict, chart_type: str = "line") -> go.Figure:
-        """Create comparison chart using Plotly"""
-        fig = go.Figure()
-        
-        colors = ['#667eea', '#764ba2', '#f093fb', '#f5576c', '#4facfe', '#00f2fe']
+    def fetch_benchmark(self, period: str = "1y"):
+        """Close history of the benchmark used for beta, served from the price cache. None if unavailable."""
+        symbol = config.BENCHMARK_SYMBOL
+        try:
+            with telemetry.span("fetch_benchmark", symbols=[symbol], period=period) as span:
+                hist = self.price_cache.fetch(self.market, [symbol], period).get(symbol)
+                span.set(bars=0 if hist is None else len(hist))
+            return hist['Close'] if hist is not None and not hist.empty else None
+        except Exception as e:
+            print(f"Error fetching benchmark {symbol}: {str(e)}")
+            return None
+
+    def compute_metrics(self, data: Dict, benchmark=None) -> Optional[MarketMetrics]:
+        """Vectorized return, risk, correlation and volume metrics for the prompt. None if they cannot be computed."""
+        try:
+            with telemetry.span("compute_metrics", symbols=list(data), benchmark=benchmark is not None):
+                return compute_metrics(data, benchmark)
+        except Exception as e:
+            print(f"Error computing metrics: {str(e)}")
+            return None
+
+    def create_comparison_chart(self, data: Dict, chart_type: str = "line", width: int = 1200) -> go.Figure:
+        """Create comparison chart using Plotly, downsampled to what ``width`` pixels can show"""
+        import plotly.graph_objects as go
+
+        from .downsample import downsample_line, downsample_ohlc
+
+        with telemetry.span("create_comparison_chart", symbols=list(data), chart_type=chart_type,
+                            width=width) as span:
+            fig = go.Figure()
         
-        for i, (symbol, symbol_data) in enumerate(data.items()):
-            if symbol_data and not symbol_data['history'].empty:
-                if chart_type == "line":
-                    fig.add_trace(go.Scatter(
-                        x=symbol_data['history'].index,
-                        y=symbol_data['history']['Close'],
-                        mode='lines',
-                        name=symbol,
-                        line=dict(color=colors[i % len(colors)], width=2),
-                        hovertemplate=f'<b>{symbol}</b><br>Date: %{{x}}<br>Price: $%{{y:.2f}}<extra></extra>'
-                    ))
-                elif chart_type == "candlestick":
-                    fig.add_trace(go.Candlestick(
-                        x=symbol_data['history'].index,
-                        open=symbol_data['history']['Open'],
-                        high=symbol_data['history']['High'],
-                        low=symbol_data['history']['Low'],
-                        close=symbol_data['history']['Close'],
-                        name=symbol
-                    ))
+            colors = ['#667eea', '#764ba2', '#f093fb', '#f5576c', '#4facfe', '#00f2fe']
         
-        fig.update_layout(
-            title="Financial Data Comparison",
-            xaxis_title="Date",
-            yaxis_title="Price ($)",
-            template="plotly_white",
-            hovermode='x unified',
-            height=500
-        )
+            for i, (symbol, symbol_data) in enumerate(data.items()):
+                if symbol_data and not symbol_data['history'].empty:
+                    if chart_type == "line":
+                        closes = downsample_line(symbol_data['history'], width)
+                        fig.add_trace(go.Scatter(
+                            x=closes.index,
+                            y=closes,
+                            mode='lines',
+                            name=symbol,
+                            line=dict(color=colors[i % len(colors)], width=2),
+                            hovertemplate=f'<b>{symbol}</b><br>Date: %{{x}}<br>Price: $%{{y:.2f}}<extra></extra>'
+                        ))
+                    elif chart_type == "candlestick":
+                        bars = downsample_ohlc(symbol_data['history'], width)
+                        fig.add_trace(go.Candlestick(
+                            x=bars.index,
+                            open=bars['Open'],
+                            high=bars['High'],
+                            low=bars['Low'],
+                            close=bars['Close'],
+                            name=symbol
+                        ))
         
-        return fig
+            fig.update_layout(
+                title="Financial Data Comparison",
+                xaxis_title="Date",
+                yaxis_title="Price ($)",
+                template="plotly_white",
+                hovermode='x unified',
+                height=500
+            )
+            span.set(points=sum(len(trace.x) for trace in fig.data if trace.x is not None) if span.recording else 0)
+            return fig
+
+    @staticmethod
+    def extend_comparison_chart(fig: go.Figure, quotes: List[Quote]) -> int:
+        """
+        Add live quotes to a chart from ``create_comparison_chart`` in place; returns the points added or updated.
+
+        Line traces get a point per quote newer than their last one. Candlestick
+        traces update the bar of the quote's trading day, or start the next one.
+        The points already drawn are left as they are.
+        """
+        import numpy as np
+        import pandas as pd
+
+        def extend(values, new):
+            if isinstance(values, np.ndarray):
+                return np.concatenate([values, np.asarray(new, dtype=values.dtype)])
+            return tuple(values) + tuple(new)
+
+        def replace_last(values, value):
+            values = np.array(values) if isinstance(values, np.ndarray) else list(values)
+            values[-1] = value
+            return values
+
+        by_symbol: Dict[str, List[Quote]] = {}
+        for quote in quotes:
+            by_symbol.setdefault(quote.symbol, []).append(quote)
+        added = 0
+        with fig.batch_update():
+            for trace in fig.data:
+                symbol_quotes = by_symbol.get(trace.name)
+                if not symbol_quotes or trace.x is None or not len(trace.x):
+                    continue
+                last = pd.Timestamp(trace.x[-1])
+                if trace.type == "scatter":
+                    points = [(quote.market_time(), quote.price) for quote in symbol_quotes]
+                    points = [(x, y) for x, y in points if x > last]
+                    if points:
+                        trace.x = extend(trace.x, [x for x, _ in points])
+                        trace.y = extend(trace.y, [y for _, y in points])
+                        added += len(points)
+                elif trace.type == "candlestick":
+                    for quote in symbol_quotes:
+                        day = quote.market_time().normalize()
+                        if day < last:
+                            continue
+                        if day == last:
+                            trace.high = replace_last(trace.high, max(trace.high[-1], quote.price))
+                            trace.low = replace_last(trace.low, min(trace.low[-1], quote.price))
+                            trace.close = replace_last(trace.close, quote.price)
+                        else:
+                            trace.x = extend(trace.x, [day])
+                            trace.open = extend(trace.open, [quote.open or quote.price])
+                            trace.high = extend(trace.high, [max(quote.high or quote.price, quote.price)])
+                            trace.low = extend(trace.low, [min(quote.low or quote.price, quote.price)])
+                            trace.close = extend(trace.close, [quote.price])
+                            last = day
+                        added += 1
+        return added
     
+    def _record_usage(self, model: str, prompt_tokens: int, completion_tokens: int):
+        with self._usage_lock:
+            self.token_usage['requests'] += 1
+            self.token_usage['prompt_tokens'] += prompt_tokens
+            self.token_usage['completion_tokens'] += completion_tokens
+        telemetry.LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+        telemetry.LLM_TOKENS.inc(completion_tokens, model=model, kind="completion")
+        if config.DEBUG:
+            print(f"LLM request to {model}: {prompt_tokens} prompt + {completion_tokens} completion tokens")
+
+    def _count_stream(self, model: str, prompt_tokens: int, stream, started: Optional[float] = None) -> Iterator:
+        """Pass a response stream through, recording its token usage, time to first token and speed when it completes."""
+        started = time.perf_counter() if started is None else started
+        first_token = None
+        parts = []
+        usage = None
+        for chunk in stream:
+            usage = getattr(chunk, 'usage', None) or usage
+            if hasattr(chunk, 'choices') and chunk.choices and hasattr(chunk.choices[0], 'delta'):
+                delta = getattr(chunk.choices[0].delta, "content", None)
+                if delta:
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    parts.append(delta)
+            yield chunk
+        finished = time.perf_counter()
+        # Prefer the server's count when the final chunk reports usage
+        prompt_tokens = getattr(usage, 'prompt_tokens', None) or prompt_tokens
+        completion_tokens = getattr(usage, 'completion_tokens', None) or prompts.count_tokens("".join(parts))
+        self._record_usage(model, prompt_tokens, completion_tokens)
+        attributes = dict(model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        if first_token is not None:
+            telemetry.LLM_TIME_TO_FIRST_TOKEN.observe(first_token - started, model=model)
+            attributes['ttft_ms'] = round((first_token - started) * 1000, 1)
+            if finished > first_token:
+                tokens_per_second = completion_tokens / (finished - first_token)
+                telemetry.LLM_TOKENS_PER_SECOND.observe(tokens_per_second, model=model)
+                attributes['tokens_per_second'] = round(tokens_per_second, 1)
+        telemetry.record("llm.stream", started, finished, **attributes)
+
+    def _cached_texts(self, cache_key: str) -> Optional[Iterator[str]]:
+        """Text pieces of an analysis cached (e.g. by another worker process) under ``cache_key``, or None."""
+        cached = self.llm_cache.get(cache_key)
+        return map(chunk_text, self.llm_cache.replay(cached)) if cached is not None else None
+
+    @property
+    def consecutive_failures(self) -> int:
+        """The longest current failure streak of any upstream."""
+        with self._health_lock:
+            return max(self.failures.values())
+
+    def _record_success(self, upstream: str = 'llm'):
+        with self._health_lock:
+            self.failures[upstream] = 0
+
+    def _record_failure(self, upstream: str = 'llm'):
+        with self._health_lock:
+            self.failures[upstream] += 1
+
+    @staticmethod
+    def close_clients(market: MarketDataClient, together_client):
+        """Release the pooled HTTP connections of a market and a Together client."""
+        market.close()
+        close = getattr(together_client, 'close', None)
+        if close:
+            close()
+
+    def close(self):
+        """Release pooled HTTP connections."""
+        self.close_clients(self.market, self.together_client)
+
     def chart_to_base64(self, fig) -> str:
         """Convert Plotly chart to base64 image for vision LLM"""
         try:
@@ -114,76 +300,48 @@ class FinanceWorkflow:
             print(f"Error converting chart to image: {str(e)}")
             return ""
     
-    def generate_analysis_prompt(self, data: Dict, user_query: str) -> str:
-        """Generate prompt for LLM analysis"""
-        prompt = f"""
-        Analyze the following financial data for the user query: "{user_query}"
-        
-        Financial Data Summary:
-        """
-        
-        for symbol, symbol_data in data.items():
-            if symbol_data and symbol_data['current_price'] is not None:
-                current_price = symbol_data['current_price']
-                price_change = symbol_data['price_change']
-                price_change_pct = symbol_data['price_change_pct']
-                market_cap = symbol_data['info'].get('marketCap', 'N/A')
-                pe_ratio = symbol_data['info'].get('trailingPE', 'N/A')
-                week_52_high = symbol_data['info'].get('fiftyTwoWeekHigh', 'N/A')
-                week_52_low = symbol_data['info'].get('fiftyTwoWeekLow', 'N/A')
-                
-                prompt += f"""
-                {symbol}:
-                - Current Price: ${current_price:.2f}
-                - Price Change: ${price_change:.2f} ({price_change_pct:.2f}%)
-                - Market Cap: {market_cap if market_cap != 'N/A' else 'N/A'}
-                - P/E Ratio: {pe_ratio if pe_ratio != 'N/A' else 'N/A'}
-                - 52 Week High: ${week_52_high if isinstance(week_52_high, (int, float)) else 'N/A'}
-                - 52 Week Low: ${week_52_low if isinstance(week_52_low, (int, float)) else 'N/A'}
-                """
-            elif symbol_data:
-                prompt += f"""
-                {symbol}:
-                - Status: Data available but current price unavailable
-                - Historical data points: {len(symbol_data['history']) if not symbol_data['history'].empty else 0}
-                """
-            else:
-                prompt += f"""
-                {symbol}:
-                - Status: Unable to fetch data for this symbol
-                """
-        
-        prompt += """
-        Please provide a detailed financial analysis including:
-        1. Performance comparison between the securities
-        2. Key financial metrics analysis
-        3. Investment recommendations
-        4. Risk assessment
-        5. Market outlook and trends
-        
-        Make the analysis comprehensive and actionable for investors.
-        """
-        
-        return prompt
-    
+    def render_chart_image(self, data: Dict, chart_type: str = "line") -> Tuple[str, str]:
+        """Render the vision-model chart straight from the price arrays. Returns (base64 image, mime type)."""
+        try:
+            with telemetry.span("render_chart_image", symbols=list(data), chart_type=chart_type) as span:
+                image = self.rasterizer.render_base64(data, chart_type)
+                span.set(bytes=len(image) * 3 // 4)
+            return image, self.rasterizer.mime_type
+        except Exception as e:
+            print(f"Fast chart rendering failed, falling back to Kaleido: {str(e)}")
+            return self.chart_to_base64(self.create_comparison_chart(data, chart_type)), "image/png"
+
+    def extract_symbols(self, user_query: str) -> List[str]:
+        """Resolve symbols from the bundled ticker index, falling back to the LLM when unsure."""
+        with telemetry.span("extract_symbols") as span:
+            symbols = self.symbol_extractor.extract(user_query, self.extract_symbols_llm)
+            span.set(symbols=symbols)
+            return symbols
+
     def extract_symbols_llm(self, user_query: str):
         """Use Together LLM to extract stock symbols from user query. Returns a list of symbols."""
         try:
-            response = self.together_client.chat.completions.create(
-                model="meta-llama/Llama-Vision-Free",
-                messages=[
-                    {"role": "system", "content": prompts.SYSTEM_SYMBOL_EXTRACTOR},
-                    {"role": "user", "content": prompts.SYMBOL_EXTRACTION_PROMPT.format(query=user_query)}
-                ],
-                max_tokens=100,
-                temperature=0.0,
-                stream=False
-            )
-            
+            with telemetry.span("llm.extract_symbols", model=VISION_MODEL):
+                response = self.llm.call(
+                    self.together_client.chat.completions.create,
+                    model=VISION_MODEL,
+                    messages=[
+                        {"role": "system", "content": prompts.SYSTEM_SYMBOL_EXTRACTOR},
+                        {"role": "user", "content": prompts.SYMBOL_EXTRACTION_PROMPT.format(query=user_query)}
+                    ],
+                    max_tokens=100,
+                    temperature=0.0,
+                    stream=False
+                )
+            self._record_success()
+
+            if not isinstance(response, str) and getattr(response, 'choices', None):
+                # Chat completion objects carry the text on the first choice
+                response = response.choices[0].message.content
             if not isinstance(response, str):
                 print("Unexpected response type from Together API")
                 return []
-                
+
             # Try to extract JSON from the response
             text = response.strip()
             # Find the first [ and last ] to extract the JSON array
@@ -200,16 +358,30 @@ class FinanceWorkflow:
                     return []
             return []
         except Exception as e:
+            self._record_failure()
             print(f"LLM symbol extraction failed, falling back to regex. Error: {e}")
             return []
 
-    def call_together_ai_with_vision(self, data: Dict, user_query: str, chart_base64: str):
+    def call_together_ai_with_vision(self, data: Dict, user_query: str, chart_base64: str,
+                                     image_mime: str = "image/png",
+                                     analysis_prompt: Optional[prompts.AnalysisPrompt] = None,
+                                     metrics: Optional[MarketMetrics] = None):
         """Call Together AI Vision API with both text data and chart image, streaming response to UI."""
+        started = time.perf_counter()
         try:
-            # Generate the analysis prompt
-            analysis_prompt = prompts.generate_analysis_prompt(data, user_query)
-            vision_prompt = prompts.generate_vision_prompt(analysis_prompt)
-            
+            # Build the token-budgeted analysis prompt unless it was built ahead of time
+            if analysis_prompt is None:
+                analysis_prompt = prompts.build_analysis_prompt(data, user_query, metrics)
+            vision_prompt = prompts.generate_vision_prompt(analysis_prompt.text)
+
+            # Replay a cached analysis of the same prompt and price data if we have one
+            model = VISION_MODEL
+            cache_key = self.llm_cache.key(model, vision_prompt, data_fingerprint(data))
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                telemetry.record("llm.vision_request", started, time.perf_counter(), model=model, cached=True)
+                return self.llm_cache.replay(cached)
+
             # Prepare messages for vision model
             messages = [
                 {
@@ -226,60 +398,108 @@ class FinanceWorkflow:
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/png;base64,{chart_base64}"
+                                "url": f"data:{image_mime};base64,{chart_base64}"
                             }
                         }
                     ]
                 }
             ]
             
-            # Stream response
-            response_stream = self.together_client.chat.completions.create(
-                model="meta-llama/Llama-Vision-Free",
-                messages=messages,
-                max_tokens=3000,
-                temperature=0.3,
-                stream=True
-            )
-            
-            return response_stream
+            prompt_tokens = (prompts.count_tokens(prompts.SYSTEM_FINANCIAL_ANALYST)
+                             + prompts.count_tokens(vision_prompt) + prompts.IMAGE_TOKENS)
+
+            def open_stream():
+                # Stream response
+                response_stream = self.llm.call(
+                    self.together_client.chat.completions.create,
+                    model=model,
+                    messages=messages,
+                    max_tokens=prompts.choose_max_tokens(model, prompt_tokens, VISION_MAX_TOKENS),
+                    temperature=0.3,
+                    stream=True
+                )
+                telemetry.record("llm.vision_request", started, time.perf_counter(), model=model, cached=False,
+                                 prompt_tokens=prompt_tokens, image_bytes=len(chart_base64) * 3 // 4)
+                counted = self._count_stream(model, prompt_tokens, self.llm_cache.record(cache_key, response_stream),
+                                             started)
+                # The shared stream buffers everything for late readers: keep just the text
+                return filter(None, map(chunk_text, counted))
+
+            # Concurrent requests for the same analysis read one shared stream as it arrives
+            texts = self.analysis_flight.stream(cache_key, open_stream,
+                                                recheck=lambda: self._cached_texts(cache_key))
+            self._record_success()
+            return (make_chunk(text) for text in texts)
             
         except Exception as e:
+            self._record_failure()
             print(f"Error in vision analysis: {str(e)}")
             return None
 
-    def call_together_ai_text_only(self, data: Dict, user_query: str):
+    def call_together_ai_text_only(self, data: Dict, user_query: str,
+                                   analysis_prompt: Optional[prompts.AnalysisPrompt] = None,
+                                   metrics: Optional[MarketMetrics] = None):
         """Fallback method for text-only analysis"""
         try:
-            # Generate the analysis prompt
-            analysis_prompt = prompts.generate_analysis_prompt(data, user_query)
-            
-            response = self.together_client.chat.completions.create(
-                model="meta-llama/Llama-3.2-3B-Instruct-Turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": prompts.SYSTEM_FINANCIAL_ANALYST
-                    },
-                    {
-                        "role": "user",
-                        "content": analysis_prompt
-                    }
-                ],
-                max_tokens=2000,
-                temperature=0.3,
-                stream=False
-            )
-            
-            if not isinstance(response, str):
+            # Build the token-budgeted analysis prompt unless it was built ahead of time
+            if analysis_prompt is None:
+                analysis_prompt = prompts.build_analysis_prompt(data, user_query, metrics)
+
+            model = TEXT_MODEL
+            cache_key = self.llm_cache.key(model, analysis_prompt.text, data_fingerprint(data))
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            prompt_tokens = prompts.count_tokens(prompts.SYSTEM_FINANCIAL_ANALYST) + analysis_prompt.tokens
+
+            def complete() -> Optional[str]:
+                with telemetry.span("llm.text_analysis", model=model, prompt_tokens=prompt_tokens):
+                    response = self.llm.call(
+                        self.together_client.chat.completions.create,
+                        model=model,
+                        messages=[
+                            {
+                                "role": "system",
+                                "content": prompts.SYSTEM_FINANCIAL_ANALYST
+                            },
+                            {
+                                "role": "user",
+                                "content": analysis_prompt.text
+                            }
+                        ],
+                        max_tokens=prompts.choose_max_tokens(model, prompt_tokens, TEXT_MAX_TOKENS),
+                        temperature=0.3,
+                        stream=False
+                    )
+
+                usage = getattr(response, 'usage', None)
+                if not isinstance(response, str) and getattr(response, 'choices', None):
+                    response = response.choices[0].message.content
+                if not isinstance(response, str) or not response:
+                    return None
+                self._record_usage(model, getattr(usage, 'prompt_tokens', None) or prompt_tokens,
+                                   getattr(usage, 'completion_tokens', None) or prompts.count_tokens(response))
+                # Only real answers are cached, never the fallback text
+                self.llm_cache.put(cache_key, response)
+                return response
+
+            # Concurrent requests for the same analysis share one completion
+            response = self.analysis_flight.do(cache_key, complete, recheck=lambda: self.llm_cache.get(cache_key))
+            if response is None:
                 return self._get_fallback_analysis()
-                
-            return response or self._get_fallback_analysis()
+            self._record_success()
+            return response
             
         except Exception as e:
+            self._record_failure()
             print(f"Error in fallback analysis: {str(e)}")
             return self._get_fallback_analysis()
 
+    def is_fallback_analysis(self, text: Optional[str]) -> bool:
+        """Whether ``text`` is the placeholder shown when no analysis could be generated."""
+        return "Analysis temporarily unavailable" in (text or "")
+
     def _get_fallback_analysis(self) -> str:
         """Return a fallback analysis when API calls fail."""
         return """
@@ -307,44 +527,21 @@ class FinanceWorkflow:
         *Note: This is general information only and not personalized financial advice.*
         """
     
-    def fetch_financial_news(self, query: str) -> List[Dict]:
-        """Fetch recent financial news and research using yfinance Search API for each symbol in the query."""
+    def fetch_financial_news(self, query: str, symbols: Optional[List[str]] = None) -> List[Dict]:
+        """Fetch recent financial news and research using yfinance Search API for each symbol in the query.
+
+        Pass the resolved ``symbols`` when known; otherwise ticker-shaped words of ``query`` are used,
+        keeping forms like BRK-B, BTC-USD or ^GSPC whole.
+        """
         from datetime import datetime
-        news_results = []
         import re
-        symbols = re.findall(r'\b[A-Z0-9]{1,6}\b', query.upper())
-        seen_urls = set()
-        for symbol in symbols:
-            try:
-                # Fetch news
-                s = yf.Search(symbol, news_count=10)
-                news_items = getattr(s, 'news', [])
-                for item in news_items:
-                    url = item.get('link') or item.get('url')
-                    if url and url not in seen_urls:
-                        seen_urls.add(url)
-                        news_results.append({
-                            'title': item.get('title', f"{symbol} News"),
-                            'description': item.get('publisher', '') + (': ' + item.get('summary', '') if item.get('summary') else ''),
-                            'url': url,
-                            'publishedAt': item.get('providerPublishTime') or item.get('published_at') or datetime.now().isoformat()
-                        })
-                # Fetch research (if available)
-                s_research = yf.Search(symbol, include_research=True)
-                research_items = getattr(s_research, 'research', [])
-                for item in research_items:
-                    url = item.get('link') or item.get('url')
-                    if url and url not in seen_urls:
-                        seen_urls.add(url)
-                        news_results.append({
-                            'title': item.get('title', f"{symbol} Research"),
-                            'description': item.get('publisher', '') + (': ' + item.get('summary', '') if item.get('summary') else ''),
-                            'url': url,
-                            'publishedAt': item.get('providerPublishTime') or item.get('published_at') or datetime.now().isoformat()
-                        })
-            except Exception as e:
-                print(f"Error fetching news/research for {symbol}: {e}")
-                continue
+        if symbols is None:
+            words = re.findall(r'(?<![\w^.=-])\^?[A-Z0-9]{1,6}(?:[-=.][A-Z0-9]{1,4})?(?![\w=-]|\.\w)', query.upper())
+            symbols = [word.replace('.', '-') for word in words]
+        with telemetry.span("fetch_financial_news", symbols=symbols) as span:
+            # One search per symbol, run concurrently on the news pool and cached per symbol
+            news_results = self.news.fetch_all(self.market, symbols, timeout=self.market.timeout * 2)
+            span.set(articles=len(news_results))
         if not news_results:
             news_results.append({
                 'title': f"No news found for {query}",
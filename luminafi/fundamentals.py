@@ -0,0 +1,165 @@
+"""
+Fundamentals layer on top of ``ticker.info``.
+
+Only the handful of fields LuminaFi reads are kept, in a small typed record
+instead of Yahoo's full ``info`` dict. Records are cached in memory and in the
+shared SQLite store with a TTL; once stale they keep being served while a
+background refresh fetches a new copy. A blank answer only gets a short TTL
+and never replaces a good record that can still be served. Concurrent fetches of the same symbol,
+from any session or worker process, share one ``ticker.info`` request.
+"""
+
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, Optional, Tuple
+
+from . import config, telemetry
+from .kvstore import KVStore
+from .market_data import MarketDataClient, get_executor
+from .singleflight import get_flight
+
+# Yahoo info field name -> Fundamentals attribute
+INFO_FIELDS = {
+    'marketCap': 'market_cap',
+    'trailingPE': 'trailing_pe',
+    'fiftyTwoWeekHigh': 'fifty_two_week_high',
+    'fiftyTwoWeekLow': 'fifty_two_week_low',
+}
+
+
+@dataclass(frozen=True)
+class Fundamentals:
+    """The fundamentals LuminaFi uses for one symbol; missing values are None."""
+    market_cap: Optional[float] = None
+    trailing_pe: Optional[float] = None
+    fifty_two_week_high: Optional[float] = None
+    fifty_two_week_low: Optional[float] = None
+
+    @classmethod
+    def from_info(cls, info: Optional[Dict]) -> "Fundamentals":
+        """Project a yfinance ``info`` dict down to the fields we use."""
+        values = {}
+        for info_key, attr in INFO_FIELDS.items():
+            value = (info or {}).get(info_key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                values[attr] = value
+        return cls(**values)
+
+    @classmethod
+    def from_dict(cls, values: Dict) -> "Fundamentals":
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in values.items() if k in names})
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @property
+    def empty(self) -> bool:
+        return all(getattr(self, f.name) is None for f in fields(self))
+
+    def get(self, key: str, default=None):
+        """Dict-style lookup by Yahoo field name, so ``info.get('marketCap', 'N/A')`` keeps working."""
+        value = getattr(self, INFO_FIELDS[key]) if key in INFO_FIELDS else None
+        return default if value is None else value
+
+
+class FundamentalsCache:
+    """TTL cache of Fundamentals records with stale-while-revalidate refresh."""
+
+    def __init__(self, ttl: Optional[float] = None, max_stale: Optional[float] = None,
+                 store: Optional[KVStore] = None):
+        self.ttl = config.FUNDAMENTALS_TTL_SECONDS if ttl is None else ttl
+        self.max_stale = config.FUNDAMENTALS_MAX_STALE_SECONDS if max_stale is None else max_stale
+        self.empty_ttl = min(config.FUNDAMENTALS_EMPTY_TTL_SECONDS, self.ttl)
+        self.store = store if store is not None else KVStore("fundamentals")
+        self._memory: Dict[str, Tuple[Fundamentals, float]] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.flight = get_flight("fundamentals")
+
+    def _ttl(self, record: Fundamentals) -> float:
+        return self.empty_ttl if record.empty else self.ttl
+
+    def _lookup(self, symbol: str) -> Optional[Tuple[Fundamentals, float]]:
+        with self._lock:
+            entry = self._memory.get(symbol)
+        if entry is not None:
+            return entry
+        try:
+            stored = self.store.get(symbol)
+        except Exception as e:
+            print(f"Error reading fundamentals cache for {symbol}: {str(e)}")
+            return None
+        if stored is None:
+            return None
+        entry = (Fundamentals.from_dict(stored[0]), stored[1])
+        with self._lock:
+            self._memory[symbol] = entry
+        return entry
+
+    def _stored(self, symbol: str) -> Optional[Fundamentals]:
+        """A record another process stored within the TTL, or None."""
+        try:
+            stored = self.store.get(symbol)
+        except Exception as e:
+            print(f"Error reading fundamentals cache for {symbol}: {str(e)}")
+            return None
+        if stored is None:
+            return None
+        record = Fundamentals.from_dict(stored[0])
+        if time.time() - stored[1] >= self._ttl(record):
+            return None
+        with self._lock:
+            self._memory[symbol] = (record, stored[1])
+        return record
+
+    def _fetch(self, client: MarketDataClient, symbol: str) -> Fundamentals:
+        return self.flight.do(symbol, self._download, client, symbol, recheck=lambda: self._stored(symbol))
+
+    def _download(self, client: MarketDataClient, symbol: str) -> Fundamentals:
+        record = Fundamentals.from_info(client.info(symbol))
+        fetched_at = time.time()
+        if record.empty:
+            previous = self._lookup(symbol)
+            if previous is not None and not previous[0].empty and fetched_at - previous[1] < self.max_stale:
+                return previous[0]
+        with self._lock:
+            self._memory[symbol] = (record, fetched_at)
+        try:
+            self.store.set(symbol, record.to_dict(), created_at=fetched_at)
+        except Exception as e:
+            print(f"Error writing fundamentals cache for {symbol}: {str(e)}")
+        return record
+
+    def _refresh(self, client: MarketDataClient, symbol: str):
+        try:
+            self._fetch(client, symbol)
+        except Exception as e:
+            print(f"Background fundamentals refresh failed for {symbol}: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(symbol)
+
+    def _refresh_in_background(self, client: MarketDataClient, symbol: str):
+        with self._lock:
+            if symbol in self._refreshing:
+                return
+            self._refreshing.add(symbol)
+        get_executor().submit(self._refresh, client, symbol)
+
+    def get(self, client: MarketDataClient, symbol: str) -> Fundamentals:
+        """Return fundamentals for ``symbol``, fetching synchronously only on a miss."""
+        entry = self._lookup(symbol)
+        if entry is not None:
+            record, fetched_at = entry
+            age = time.time() - fetched_at
+            if age < self._ttl(record):
+                telemetry.CACHE_REQUESTS.inc(cache="fundamentals", result="hit")
+                return record
+            if age < self.max_stale:
+                telemetry.CACHE_REQUESTS.inc(cache="fundamentals", result="stale")
+                self._refresh_in_background(client, symbol)
+                return record
+        telemetry.CACHE_REQUESTS.inc(cache="fundamentals", result="miss")
+        return self._fetch(client, symbol)
@@ -0,0 +1,83 @@
+"""
+Small SQLite-backed key/value store shared by all sessions and worker processes.
+
+Values are stored as JSON together with their creation and last access times,
+which is enough for the TTL and LRU policies of the caches built on top of it.
+SQLite's WAL mode lets several Streamlit worker processes read while one writes.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+from . import config
+
+
+def default_path() -> str:
+    """Return the database file shared by LuminaFi's caches."""
+    return os.path.join(config.CACHE_DIR, "cache.sqlite3")
+
+
+class KVStore:
+    """JSON key/value table with creation and access timestamps."""
+
+    def __init__(self, table: str, path: Optional[str] = None):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        self.table = table
+        self.path = path or default_path()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._connection().execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection; sqlite3 connections are not shared across threads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, touch: bool = False) -> Optional[Tuple[Any, float]]:
+        """Return ``(value, created_at)`` for ``key``, or None if it is not stored."""
+        conn = self._connection()
+        row = conn.execute(f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if touch:
+            conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, created_at: Optional[float] = None):
+        """Store ``value`` under ``key``, replacing any previous value."""
+        now = time.time()
+        self._connection().execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), created_at or now, now),
+        )
+
+    def delete(self, key: str):
+        self._connection().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def expire(self, max_age: float):
+        """Delete entries created more than ``max_age`` seconds ago."""
+        self._connection().execute(f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - max_age,))
+
+    def evict(self, max_entries: int):
+        """Delete the least recently accessed entries beyond ``max_entries``."""
+        self._connection().execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (max_entries,),
+        )
+
+    def __len__(self) -> int:
+        return self._connection().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
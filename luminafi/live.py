@@ -0,0 +1,341 @@
+"""
+Live quote mode: one streaming quote feed per process, fanned out to sessions.
+
+Yahoo's streamer is a websocket that pushes a pricing message for every trade
+of the symbols a client subscribed to. ``QuoteFeed`` keeps one connection per
+process, subscribed to the union of the symbols any session watches, and
+re-sends the subscription every ``heartbeat`` seconds as the streamer
+requires. ``LiveHub`` tracks which sessions watch which symbols and hands
+every quote to their ``Subscription``; sessions drain it on their own
+schedule (a Streamlit fragment rerun), so a slow session never holds up the
+feed. Subscriptions that are dropped without ``close()`` are released when
+garbage-collected.
+
+Quotes also keep the price cache current without polling: every
+``LUMINAFI_LIVE_FLUSH_SECONDS`` a background thread merges the latest quote of
+each symbol that ticked into its cached daily history as today's bar, one
+write per symbol however many quotes arrived. The history keeps the time it
+was downloaded, so ticks never make it look fresher than its bars before
+today; histories that are stale are left for the next download to complete.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import threading
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set
+
+from . import config, telemetry
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from .price_cache import PriceCache
+
+
+@dataclass(frozen=True)
+class Quote:
+    """One pricing update from the feed; prices are in the quote currency."""
+    symbol: str
+    time: float  # epoch seconds of the trade
+    price: float
+    open: Optional[float] = None
+    high: Optional[float] = None
+    low: Optional[float] = None
+    volume: Optional[int] = None  # day volume so far
+    previous_close: Optional[float] = None
+    change_percent: Optional[float] = None
+
+    def market_time(self) -> pd.Timestamp:
+        """Trade time as exchange wall-clock time, like the cached history index."""
+        import pandas as pd
+        return pd.Timestamp(self.time, unit="s", tz="UTC").tz_convert(config.LIVE_MARKET_TZ).tz_localize(None)
+
+
+def _pricing_data():
+    from yfinance.pricing_pb2 import PricingData
+    return PricingData
+
+
+def decode_quote(message) -> Optional[Quote]:
+    """Decode a streamer message (JSON with a base64 protobuf payload); None if it carries no price."""
+    try:
+        payload = json.loads(message).get("message")
+        data = _pricing_data()()
+        data.ParseFromString(base64.b64decode(payload))
+    except Exception as e:
+        print(f"Error decoding live quote: {str(e)}")
+        return None
+    if not data.id or not data.price:
+        return None
+    # Missing fields decode as 0
+    return Quote(symbol=data.id, time=data.time / 1000 if data.time else time.time(), price=data.price,
+                 open=data.open_price or None, high=data.day_high or None, low=data.day_low or None,
+                 volume=data.day_volume or None, previous_close=data.previous_close or None,
+                 change_percent=data.change_percent or None)
+
+
+def encode_quote(quote: Quote) -> str:
+    """Encode ``quote`` as the streamer does (used by the stand-in feed)."""
+    data = _pricing_data()(id=quote.symbol, price=quote.price, time=int(quote.time * 1000),
+                           open_price=quote.open or 0, day_high=quote.high or 0, day_low=quote.low or 0,
+                           day_volume=quote.volume or 0, previous_close=quote.previous_close or 0,
+                           change_percent=quote.change_percent or 0)
+    return json.dumps({"type": "pricing", "message": base64.b64encode(data.SerializeToString()).decode()})
+
+
+class QuoteFeed:
+    """One websocket connection subscribed to the wanted symbols, reconnecting with backoff."""
+
+    def __init__(self, url: str, on_quote: Callable[[Quote], None], heartbeat: float = 15.0,
+                 max_backoff: float = 30.0):
+        self.url = url
+        self.on_quote = on_quote
+        self.heartbeat = heartbeat
+        self.max_backoff = max_backoff
+        self.connected = False
+        self.connects = 0
+        self.failures = 0
+        self._wanted: Set[str] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def update(self, symbols: Set[str]):
+        """Set the symbols to stream; the connection is opened on first use and closed when none are left."""
+        with self._lock:
+            self._wanted = set(symbols)
+            if self._thread is None and self._wanted:
+                self._thread = threading.Thread(target=self._run, name="luminafi-live-feed", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _snapshot(self) -> Set[str]:
+        with self._lock:
+            return set(self._wanted)
+
+    def _run(self):
+        backoff = 1.0
+        while not self._closed.is_set():
+            if not self._snapshot():
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            try:
+                self._stream()
+                backoff = 1.0
+            except Exception as e:
+                self.failures += 1
+                print(f"Live quote feed error, reconnecting in {backoff:.0f}s: {str(e)}")
+                self._closed.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def _stream(self):
+        from websockets.sync.client import connect
+
+        with connect(self.url, open_timeout=10, close_timeout=2) as ws:
+            self.connected = True
+            self.connects += 1
+            subscribed: Set[str] = set()
+            last_subscribe = 0.0
+            try:
+                while not self._closed.is_set():
+                    wanted = self._snapshot()
+                    if not wanted:
+                        return
+                    if subscribed - wanted:
+                        ws.send(json.dumps({"unsubscribe": sorted(subscribed - wanted)}))
+                    if wanted - subscribed or time.monotonic() - last_subscribe >= self.heartbeat:
+                        ws.send(json.dumps({"subscribe": sorted(wanted)}))
+                        last_subscribe = time.monotonic()
+                    subscribed = wanted
+                    try:
+                        message = ws.recv(timeout=0.5)
+                    except TimeoutError:
+                        continue
+                    quote = decode_quote(message)
+                    if quote is not None and quote.symbol in subscribed:
+                        self.on_quote(quote)
+            finally:
+                self.connected = False
+
+    def close(self):
+        self._closed.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+class Subscription:
+    """A session's view of the live feed: the quotes of ``symbols`` received since the last ``drain()``."""
+
+    def __init__(self, hub: LiveHub, symbols: List[str], on_quote: Optional[Callable[[Quote], None]] = None,
+                 buffer: Optional[int] = None):
+        self.hub = hub
+        self.symbols = list(dict.fromkeys(symbols))
+        self.on_quote = on_quote
+        self.dropped = 0
+        self.closed = False
+        self._quotes = deque(maxlen=config.LIVE_BUFFER if buffer is None else buffer)
+        self._lock = threading.Lock()
+
+    def _push(self, quote: Quote):
+        with self._lock:
+            if len(self._quotes) == self._quotes.maxlen:
+                self.dropped += 1  # a session that stopped draining keeps only the latest quotes
+            self._quotes.append(quote)
+        if self.on_quote is not None:
+            self.on_quote(quote)
+
+    def drain(self) -> List[Quote]:
+        """Quotes received since the last call, oldest first."""
+        with self._lock:
+            quotes = list(self._quotes)
+            self._quotes.clear()
+        return quotes
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.hub._release(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LiveHub:
+    """Process-wide fan-out of one quote feed to every subscribed session."""
+
+    def __init__(self, url: Optional[str] = None, cache: Optional[PriceCache] = None,
+                 flush_seconds: Optional[float] = None, feed_factory: Callable[..., QuoteFeed] = QuoteFeed):
+        self.cache = cache
+        self.flush_seconds = config.LIVE_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self.feed = feed_factory(url or config.LIVE_FEED_URL, self._on_quote)
+        self.counters = {'quotes': 0, 'delivered': 0, 'flushes': 0}
+        self._subscribers: Dict[str, "weakref.WeakSet[Subscription]"] = {}
+        self._latest: Dict[str, Quote] = {}
+        self._pending: Dict[str, Quote] = {}
+        # Reentrant: a collected subscription's finalizer may run while the lock is held
+        self._lock = threading.RLock()
+        self._dirty = threading.Event()
+        self._closed = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def subscribe(self, symbols: List[str], on_quote: Optional[Callable[[Quote], None]] = None) -> Subscription:
+        """Start receiving quotes for ``symbols``; the latest known quote of each is delivered right away."""
+        subscription = Subscription(self, symbols, on_quote)
+        with self._lock:
+            for symbol in subscription.symbols:
+                self._subscribers.setdefault(symbol, weakref.WeakSet()).add(subscription)
+            latest = [self._latest[symbol] for symbol in subscription.symbols if symbol in self._latest]
+        # Sessions that are never closed explicitly give their symbols up when collected
+        weakref.finalize(subscription, self._update_feed)
+        self._update_feed()
+        for quote in latest:
+            subscription._push(quote)
+        return subscription
+
+    def _release(self, subscription: Subscription):
+        with self._lock:
+            for symbol in subscription.symbols:
+                self._subscribers.get(symbol, set()).discard(subscription)
+        self._update_feed()
+
+    def _update_feed(self):
+        with self._lock:
+            for symbol in [symbol for symbol, subscribers in self._subscribers.items() if not subscribers]:
+                del self._subscribers[symbol]
+            symbols = set(self._subscribers)
+        telemetry.LIVE_SYMBOLS.set(len(symbols))
+        self.feed.update(symbols)
+
+    def _on_quote(self, quote: Quote):
+        with self._lock:
+            self._latest[quote.symbol] = quote
+            subscribers = list(self._subscribers.get(quote.symbol, ()))
+            self.counters['quotes'] += 1
+            self.counters['delivered'] += len(subscribers)
+            if self.cache is not None:
+                self._pending[quote.symbol] = quote
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._run_flusher, name="luminafi-live-flush",
+                                                     daemon=True)
+                    self._flusher.start()
+        if self.cache is not None:
+            self._dirty.set()
+        telemetry.LIVE_QUOTES.inc()
+        for subscription in subscribers:
+            subscription._push(quote)
+
+    def _run_flusher(self):
+        # Off the feed thread, so Parquet writes never delay quotes to sessions
+        while not self._closed.is_set():
+            self._dirty.wait()
+            self._closed.wait(self.flush_seconds)
+            self._dirty.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Merge the latest pending quote of each symbol into its cached daily history; the number written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        written = 0
+        for quote in pending.values():
+            try:
+                if self.cache.append_quote(quote):
+                    written += 1
+            except Exception as e:
+                print(f"Error updating cached history of {quote.symbol} from the live feed: {str(e)}")
+        with self._lock:
+            self.counters['flushes'] += written
+        return written
+
+    def latest(self, symbol: str) -> Optional[Quote]:
+        with self._lock:
+            return self._latest.get(symbol)
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            metrics = dict(self.counters)
+            metrics.update(symbols=len(self._subscribers),
+                           subscriptions=len({id(s) for subscribers in self._subscribers.values() for s in subscribers}))
+        metrics.update(connected=self.feed.connected, connects=self.feed.connects, failures=self.feed.failures)
+        return metrics
+
+    def close(self):
+        self.feed.close()
+        self._closed.set()
+        self._dirty.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+        if self.cache is not None:
+            self.flush()
+
+
+_hub: Optional[LiveHub] = None
+_hub_lock = threading.Lock()
+
+
+def get_live_hub(cache: Optional[PriceCache] = None) -> LiveHub:
+    """Return the process-wide live hub, created on first use with the price cache it keeps current."""
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = LiveHub(cache=cache)
+        return _hub
+
+
+def snapshot() -> Optional[Dict]:
+    """Metrics of the live hub, or None while live mode has not been used in this process."""
+    with _hub_lock:
+        hub = _hub
+    return hub.metrics() if hub is not None else None
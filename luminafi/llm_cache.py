@@ -0,0 +1,92 @@
+"""
+Content-addressed cache for LLM analyses.
+
+An analysis is keyed by a hash of the model name, the fully rendered prompt and
+a fingerprint of the price data behind it, so the same question about the same
+data is only ever generated once per TTL. Cached answers are replayed as a
+stream of chunk objects shaped like Together's streaming responses, so callers
+iterate over a cache hit exactly like over a live stream.
+"""
+
+import hashlib
+import json
+import re
+import time
+from types import SimpleNamespace
+from typing import Dict, Iterator, Optional
+
+from . import config, telemetry
+from .kvstore import KVStore
+
+
+def data_fingerprint(data: Dict) -> str:
+    """Hash the price data an analysis is based on: every symbol's closes and their dates."""
+    import pandas as pd
+    digest = hashlib.sha256()
+    for symbol in sorted(data):
+        digest.update(symbol.encode())
+        symbol_data = data[symbol]
+        if not symbol_data or symbol_data['history'].empty:
+            digest.update(b"\0")
+            continue
+        closes = symbol_data['history']['Close']
+        digest.update(pd.util.hash_pandas_object(closes, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def make_chunk(content: str) -> SimpleNamespace:
+    """Build an object shaped like a streaming chat completion chunk."""
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class LLMResponseCache:
+    """Persistent TTL + LRU cache of generated analyses."""
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None,
+                 store: Optional[KVStore] = None):
+        self.ttl = config.LLM_CACHE_TTL_SECONDS if ttl is None else ttl
+        self.max_entries = config.LLM_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.store = store if store is not None else KVStore("llm_responses")
+
+    @staticmethod
+    def key(model: str, prompt: str, fingerprint: str) -> str:
+        return hashlib.sha256(json.dumps([model, prompt, fingerprint]).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached analysis for ``key`` if it is younger than the TTL."""
+        try:
+            entry = self.store.get(key, touch=True)
+        except Exception as e:
+            print(f"Error reading LLM cache: {str(e)}")
+            return None
+        if entry is None or time.time() - entry[1] >= self.ttl:
+            telemetry.CACHE_REQUESTS.inc(cache="llm", result="miss")
+            return None
+        telemetry.CACHE_REQUESTS.inc(cache="llm", result="hit")
+        return entry[0]
+
+    def put(self, key: str, text: str):
+        try:
+            self.store.set(key, text)
+            self.store.expire(self.ttl)
+            self.store.evict(self.max_entries)
+        except Exception as e:
+            print(f"Error writing LLM cache: {str(e)}")
+
+    @staticmethod
+    def replay(text: str) -> Iterator[SimpleNamespace]:
+        """Yield a cached analysis word by word as streaming chunks."""
+        for piece in re.findall(r'\s*\S+|\s+', text):
+            yield make_chunk(piece)
+
+    def record(self, key: str, stream) -> Iterator:
+        """Pass a live stream through unchanged, caching the full text once it completes."""
+        parts = []
+        for chunk in stream:
+            if hasattr(chunk, 'choices') and chunk.choices and hasattr(chunk.choices[0], 'delta'):
+                delta = getattr(chunk.choices[0].delta, "content", None)
+                if delta:
+                    parts.append(delta)
+            yield chunk
+        if parts:
+            self.put(key, "".join(parts))
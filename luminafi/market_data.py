@@ -0,0 +1,242 @@
+"""
+Market data fetch engine for LuminaFi.
+
+Price histories for all requested symbols are downloaded together in one bulk
+yfinance request, while the slow ``ticker.info`` lookups run in parallel on a
+bounded, process-wide worker pool. Every symbol has its own deadline so a slow
+ticker only costs its own slot in the result, never the whole request. All
+calls go through the shared ``yahoo`` upstream guard (rate limit, retries,
+circuit breaker, optional hedging of ``ticker.info``). The shared HTTP
+session caps every request at the fetch timeout: a future cannot be cancelled
+once it runs, so this is what frees the worker of a call that timed out.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from .resilience import Upstream, get_upstream
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import yfinance as yf
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT = 10.0
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(max_workers: int = DEFAULT_MAX_WORKERS) -> ThreadPoolExecutor:
+    """Return the shared worker pool used for per-symbol upstream calls."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="luminafi-fetch")
+        return _executor
+
+
+def _capped(timeout, cap: float):
+    """``timeout`` (seconds or a (connect, read) tuple) limited to ``cap``; unset means ``cap``."""
+    if isinstance(timeout, tuple):
+        return tuple(min(t, cap) if t else cap for t in timeout)
+    if isinstance(timeout, (int, float)) and timeout > 0:
+        return min(timeout, cap)
+    return cap
+
+
+def make_session(pool_size: int = DEFAULT_MAX_WORKERS * 2, timeout: float = DEFAULT_TIMEOUT):
+    """
+    Create a keep-alive HTTP session for yfinance that concurrent fetches can share.
+
+    Every request is capped at ``timeout`` seconds, whatever yfinance asks for,
+    so a slow response holds a fetch-pool worker for at most that long.
+    """
+    cap = timeout
+    try:
+        # Recent yfinance versions only accept curl_cffi sessions
+        from curl_cffi import requests as curl_requests
+
+        class CappedSession(curl_requests.Session):
+            def request(self, method, url, *args, timeout=None, **kwargs):
+                return super().request(method, url, *args, timeout=_capped(timeout, cap), **kwargs)
+
+        return CappedSession(impersonate="chrome")
+    except ImportError:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        class CappedAdapter(HTTPAdapter):
+            def send(self, request, timeout=None, **kwargs):
+                return super().send(request, timeout=_capped(timeout, cap), **kwargs)
+
+        session = requests.Session()
+        adapter = CappedAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+
+class MarketDataClient:
+    """Thin wrapper around yfinance so every upstream call goes through one place."""
+
+    def __init__(self, session=None, timeout: float = DEFAULT_TIMEOUT, upstream: Optional[Upstream] = None):
+        self.session = session
+        self.timeout = timeout
+        self.upstream = upstream or get_upstream("yahoo")
+
+    def download(self, symbols: List[str], **kwargs) -> pd.DataFrame:
+        """Bulk download price history for several symbols in one request."""
+        import yfinance as yf
+        kwargs.setdefault("progress", False)
+        # A bulk download fans out into one request per symbol
+        return self.upstream.call(yf.download, symbols, session=self.session, timeout=self.timeout,
+                                  cost=len(symbols), **kwargs)
+
+    def history(self, symbol: str, **kwargs) -> pd.DataFrame:
+        """Download price history for a single symbol."""
+        import yfinance as yf
+        return self.upstream.call(lambda: yf.Ticker(symbol, session=self.session).history(timeout=self.timeout,
+                                                                                          **kwargs))
+
+    def info(self, symbol: str) -> Dict:
+        """Fetch the fundamentals dict for a single symbol."""
+        import yfinance as yf
+        # The slowest call in the tail, so it may be hedged
+        return self.upstream.call(lambda: yf.Ticker(symbol, session=self.session).info, hedge=True)
+
+    def search(self, query: str, **kwargs) -> yf.Search:
+        """Run a Yahoo Finance search (news, research) for ``query``."""
+        import yfinance as yf
+        kwargs.setdefault("timeout", self.timeout)
+        return self.upstream.call(yf.Search, query, session=self.session, **kwargs)
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+
+
+def split_download(frame: Optional[pd.DataFrame], symbols: List[str]) -> Dict[str, pd.DataFrame]:
+    """Split a ``yf.download(group_by="ticker")`` frame into one history frame per symbol."""
+    import pandas as pd
+    if frame is None or frame.empty:
+        return {symbol: pd.DataFrame() for symbol in symbols}
+
+    histories = {}
+    if isinstance(frame.columns, pd.MultiIndex):
+        available = set(frame.columns.get_level_values(0))
+        for symbol in symbols:
+            histories[symbol] = _drop_missing_rows(frame[symbol]) if symbol in available else pd.DataFrame()
+    else:
+        # Older yfinance versions return flat columns for a single ticker
+        histories[symbols[0]] = _drop_missing_rows(frame)
+    return histories
+
+
+def _drop_missing_rows(hist: pd.DataFrame) -> pd.DataFrame:
+    """Drop the rows a bulk download pads in for days a symbol did not trade."""
+    hist = hist.copy()
+    hist.columns.name = None
+    if 'Close' in hist.columns:
+        return hist.dropna(subset=['Close'])
+    return hist.dropna(how='all')
+
+
+def summarize_history(hist: pd.DataFrame, info: Dict) -> Dict:
+    """Build the per-symbol record consumed by the prompts and the summary table."""
+    # Plain floats: stored prices are float32
+    current_price = float(hist['Close'].iloc[-1]) if not hist.empty else None
+    price_change = 0
+    price_change_pct = 0
+
+    if len(hist) > 1 and current_price is not None:
+        first_price = float(hist['Close'].iloc[0])
+        if first_price and first_price != 0:
+            price_change = current_price - first_price
+            price_change_pct = (price_change / first_price) * 100
+
+    return {
+        'history': hist,
+        'info': info,
+        'current_price': current_price,
+        'price_change': price_change,
+        'price_change_pct': price_change_pct
+    }
+
+
+def download_histories(client: MarketDataClient, symbols: List[str], max_workers: int = DEFAULT_MAX_WORKERS,
+                       **kwargs) -> Dict[str, pd.DataFrame]:
+    """Bulk download histories, returning an empty dict if the request failed as a whole."""
+    try:
+        frame = client.download(symbols, group_by='ticker', auto_adjust=True, actions=True,
+                                threads=min(len(symbols), max_workers), **kwargs)
+        return split_download(frame, symbols)
+    except Exception as e:
+        print(f"Bulk history download failed, falling back to per-symbol requests: {str(e)}")
+        return {}
+
+
+def _result(future: Future, deadline: float, symbol: str, what: str):
+    """Wait for a per-symbol future until its deadline, returning None on timeout or error."""
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeoutError:
+        # Only drops a call still queued; a running one ends at the session's request timeout
+        future.cancel()
+        print(f"Timed out fetching {what} for {symbol}")
+    except Exception as e:
+        print(f"Error fetching {what} for {symbol}: {str(e)}")
+    return None
+
+
+def fetch_market_data(client: MarketDataClient, symbols: List[str], period: str = "1y",
+                      max_workers: int = DEFAULT_MAX_WORKERS,
+                      timeout: float = DEFAULT_TIMEOUT, cache=None, fundamentals=None,
+                      interval: str = "1d", on_chunk=None) -> Dict:
+    """
+    Fetch history and fundamentals for ``symbols``.
+
+    Returns the same ``{symbol: record or None}`` mapping as the original serial
+    loop. A symbol whose history cannot be fetched maps to None; a symbol whose
+    ``info`` times out keeps its history with an empty ``info`` dict. When a
+    ``PriceCache`` is given, histories are served from it and only missing bars
+    are downloaded. Symbols missing or empty in the bulk result fall back to a
+    per-symbol request. When a ``FundamentalsCache`` is given, ``info`` holds its
+    compact ``Fundamentals`` record instead of the raw yfinance dict.
+    ``interval`` selects the bar size; intraday histories fetched through the
+    cache are passed to ``on_chunk`` as their windows arrive.
+    """
+    executor = get_executor(max_workers)
+    info_deadline = time.monotonic() + timeout
+    if fundamentals is not None:
+        info_futures = {symbol: executor.submit(fundamentals.get, client, symbol) for symbol in symbols}
+    else:
+        info_futures = {symbol: executor.submit(client.info, symbol) for symbol in symbols}
+
+    if cache is not None:
+        histories = cache.fetch(client, symbols, period, interval, max_workers=max_workers, on_chunk=on_chunk)
+    else:
+        histories = download_histories(client, symbols, max_workers, period=period, interval=interval)
+
+    history_deadline = time.monotonic() + timeout
+    history_futures = {
+        symbol: executor.submit(client.history, symbol, period=period, interval=interval)
+        for symbol in symbols if histories.get(symbol) is None or histories[symbol].empty
+    }
+
+    data = {}
+    for symbol in symbols:
+        hist = histories.get(symbol)
+        if hist is None or hist.empty:
+            hist = _result(history_futures[symbol], history_deadline, symbol, "history")
+        if hist is None:
+            info_futures[symbol].cancel()
+            data[symbol] = None
+            continue
+        info = _result(info_futures[symbol], info_deadline, symbol, "info")
+        data[symbol] = summarize_history(hist, info or {})
+    return data
@@ -0,0 +1,222 @@
+"""
+Quantitative metrics over the fetched price histories.
+
+All symbols are aligned into one close and one volume matrix, so every metric
+is computed in a single vectorized pass across symbols: annualized return and
+volatility, Sharpe ratio, maximum drawdown, beta against a benchmark, volume
+statistics, the correlation matrix over the latest window and, per pair, the
+range of the rolling correlation over the whole history. The compact tables
+feed the analysis prompt, giving the model hard numbers instead of asking it to
+read trends off the chart image. Intraday histories are collapsed to daily
+closes and volumes first, so annualization stays in trading days.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Optional
+
+from . import config
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+TRADING_DAYS = 252
+
+# Window (trading days) for the rolling correlations and recent volume
+CORRELATION_WINDOW = 63
+VOLUME_WINDOW = 20
+
+# Rows of the rolling correlation combined at a time, bounding its bars x pairs temporaries
+_PAIR_BLOCK_ROWS = 256
+
+
+@dataclass
+class MarketMetrics:
+    """
+    Per-symbol metric table (one row per symbol), the correlation matrix of the latest window
+    and the rolling correlation of every pair summarized as latest/mean/min/max (one row per "A/B").
+    """
+    table: pd.DataFrame
+    correlation: pd.DataFrame
+    benchmark: Optional[str]
+    correlation_window: int
+    observations: int
+    rolling_correlation: Optional[pd.DataFrame] = None
+
+    def to_dict(self) -> Dict:
+        """JSON-serializable form, e.g. for the batch pipeline output."""
+        table = self.table.astype(object).where(self.table.notna(), None)
+        correlation = self.correlation.astype(object).where(self.correlation.notna(), None)
+        rolling = self.rolling_correlation
+        if rolling is not None:
+            rolling = rolling.astype(object).where(rolling.notna(), None).to_dict(orient='index')
+        return {
+            'table': table.to_dict(orient='index'),
+            'correlation': correlation.to_dict(orient='index'),
+            'rolling_correlation': rolling,
+            'benchmark': self.benchmark,
+            'correlation_window': self.correlation_window,
+            'observations': self.observations,
+        }
+
+
+def _daily_index(index) -> pd.DatetimeIndex:
+    """Map a history index to tz-naive calendar days so different exchanges line up."""
+    import pandas as pd
+
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize()
+
+
+def _daily(s: pd.Series, how: str) -> pd.Series:
+    """``s`` as float64 with one value per calendar day; intraday bars collapse to the day's last value or sum."""
+    import pandas as pd
+
+    s = pd.Series(s.to_numpy(dtype='float64'), index=_daily_index(s.index))
+    if not s.index.has_duplicates:
+        return s
+    return s.groupby(level=0).sum() if how == 'sum' else s.groupby(level=0).last()
+
+
+def align(data: Dict, column: str, extra: Optional[Dict[str, pd.Series]] = None, how: str = 'last') -> pd.DataFrame:
+    """One column of every history as a date x symbol matrix; intraday bars are combined per day by ``how``."""
+    import pandas as pd
+
+    series = {}
+    for symbol, symbol_data in data.items():
+        if symbol_data and column in symbol_data['history'].columns and not symbol_data['history'].empty:
+            series[symbol] = _daily(symbol_data['history'][column], how)
+    for name, s in (extra or {}).items():
+        if name not in series and s is not None and len(s):
+            series[name] = _daily(s, how)
+    if not series:
+        return pd.DataFrame()
+    frame = pd.concat(series, axis=1).sort_index()
+    return frame[~frame.index.duplicated(keep='last')]
+
+
+def compute_metrics(data: Dict, benchmark: Optional[pd.Series] = None,
+                    benchmark_symbol: Optional[str] = None,
+                    risk_free_rate: Optional[float] = None,
+                    correlation_window: int = CORRELATION_WINDOW,
+                    volume_window: int = VOLUME_WINDOW) -> Optional[MarketMetrics]:
+    """Compute the metric table and correlation matrix for ``data``; None without usable histories."""
+    import numpy as np
+    import pandas as pd
+
+    rf = config.RISK_FREE_RATE if risk_free_rate is None else risk_free_rate
+    benchmark_symbol = benchmark_symbol or config.BENCHMARK_SYMBOL
+    closes = align(data, 'Close', {benchmark_symbol: benchmark} if benchmark is not None else None)
+    if closes.empty or len(closes) < 2:
+        return None
+    symbols = [s for s in data if s in closes.columns]
+
+    # Returns between a symbol's own consecutive bars, even across other symbols' extra trading days
+    returns = closes.ffill().pct_change(fill_method=None).where(closes.notna())
+
+    first = closes.bfill().iloc[0]
+    last = closes.ffill().iloc[-1]
+    bars = closes.notna().sum()
+    total_return = last / first - 1
+    ann_return = (last / first) ** (TRADING_DAYS / (bars - 1).clip(lower=1)) - 1
+    ann_vol = returns.std() * np.sqrt(TRADING_DAYS)
+    sharpe = (returns.mean() * TRADING_DAYS - rf) / ann_vol.replace(0, np.nan)
+    max_drawdown = (closes / closes.cummax() - 1).min()
+
+    table = pd.DataFrame({
+        'total_return': total_return,
+        'ann_return': ann_return,
+        'ann_volatility': ann_vol,
+        'sharpe': sharpe,
+        'max_drawdown': max_drawdown,
+    })
+
+    has_benchmark = benchmark_symbol in returns.columns
+    if has_benchmark:
+        cov = returns.cov()
+        table['beta'] = cov[benchmark_symbol] / cov.loc[benchmark_symbol, benchmark_symbol]
+
+    volumes = align(data, 'Volume', how='sum')
+    if not volumes.empty:
+        volumes = volumes.reindex(index=closes.index)
+        avg_volume = volumes.mean()
+        recent_volume = volumes.tail(volume_window).mean()
+        table['avg_volume'] = avg_volume
+        table['volume_trend'] = recent_volume / avg_volume.replace(0, np.nan)
+        table['avg_dollar_volume'] = (volumes * closes[volumes.columns]).mean()
+
+    window = min(correlation_window, len(returns) - 1)
+    correlation = returns[symbols].tail(window).corr()
+    return MarketMetrics(
+        table=table.loc[symbols],
+        correlation=correlation,
+        benchmark=benchmark_symbol if has_benchmark else None,
+        correlation_window=window,
+        observations=len(closes),
+        rolling_correlation=rolling_correlation(returns[symbols], window),
+    )
+
+
+def rolling_correlation(returns: pd.DataFrame, window: int) -> pd.DataFrame:
+    """
+    Rolling ``window``-bar correlation of every pair of columns, summarized as latest, mean, min and max.
+
+    All pairs are computed in one vectorized pass over windowed running sums.
+    Like ``rolling(window).corr()``, a window with a missing return in either
+    column has no value, so only complete windows count; their per-column sums
+    need no pairwise masking, and only the cross products are bars x pairs.
+    """
+    import numpy as np
+    import pandas as pd
+
+    columns = list(returns.columns)
+    summary = pd.DataFrame(columns=['latest', 'mean', 'min', 'max'], dtype=float)
+    if len(columns) < 2 or window < 2 or len(returns) < window:
+        return summary
+    values = returns.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(values)
+    x = np.where(valid, values, 0.0)
+
+    def windowed(total: np.ndarray) -> np.ndarray:
+        # ``total`` holds the values from row 1 on; row 0 is the zero the first window starts from
+        total[0] = 0.0
+        np.cumsum(total, axis=0, out=total)
+        return total[window:] - total[:-window]
+
+    first, second = np.triu_indices(len(columns), k=1)
+    complete = windowed(np.vstack([np.zeros(len(columns)), valid])) == window
+    s = windowed(np.vstack([np.zeros(len(columns)), x]))
+    var = window * windowed(np.vstack([np.zeros(len(columns)), x * x])) - s * s
+    # The bars x pairs arrays dominate memory: the cross products are summed in place and the
+    # per-pair terms are combined a block of rows at a time
+    total = np.empty((len(x) + 1, len(first)))
+    for start in range(0, len(x), _PAIR_BLOCK_ROWS):
+        rows = slice(start, start + _PAIR_BLOCK_ROWS)
+        np.multiply(x[rows][:, first], x[rows][:, second], out=total[1:][rows])
+    corr = windowed(total)
+    del total
+    for start in range(0, len(corr), _PAIR_BLOCK_ROWS):
+        rows = slice(start, start + _PAIR_BLOCK_ROWS)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr[rows] = ((window * corr[rows] - s[rows][:, first] * s[rows][:, second])
+                          / np.sqrt(var[rows][:, first] * var[rows][:, second]))
+        corr[rows][~(complete[rows][:, first] & complete[rows][:, second])] = np.nan
+    np.clip(corr, -1.0, 1.0, out=corr)
+
+    # Pairs without a single complete window are left out
+    present = ~np.isnan(corr)
+    keep = present.any(axis=0)
+    if not keep.any():
+        return summary
+    corr, present = corr[:, keep], present[:, keep]
+    last = len(corr) - 1 - present[::-1].argmax(axis=0)
+    # fmin/fmax skip NaN without the copies nanmin/nanmax make
+    table = pd.DataFrame({'latest': corr[last, np.arange(corr.shape[1])], 'mean': 0.0,
+                          'min': np.fmin.reduce(corr, axis=0), 'max': np.fmax.reduce(corr, axis=0)},
+                         index=[f"{columns[i]}/{columns[j]}" for i, j in zip(first[keep], second[keep])])
+    corr[~present] = 0.0
+    table['mean'] = corr.sum(axis=0) / present.sum(axis=0)
+    return table
@@ -0,0 +1,192 @@
+"""
+News and research headlines per symbol.
+
+Each symbol costs one ``yf.Search`` request (news and research together) on a
+small process-wide pool, so no matter how many sessions ask at once only a
+bounded number of searches hit Yahoo. Results are cached per symbol for a short
+TTL in memory and in the shared SQLite store, and concurrent requests for the
+same symbol share one search, across worker processes too. A persistent URL index remembers which symbol an
+article was first seen under and when, so the same story listed for several
+symbols is shown once, attributed consistently, with a stable timestamp.
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import config, telemetry
+from .kvstore import KVStore
+from .singleflight import get_flight
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_news_executor(max_workers: Optional[int] = None) -> ThreadPoolExecutor:
+    """Return the process-wide pool that bounds concurrent news searches."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers or config.NEWS_MAX_WORKERS,
+                                           thread_name_prefix="luminafi-news")
+        return _executor
+
+
+def _article(item: Dict, symbol: str, default_title: str) -> Optional[Dict]:
+    url = item.get('link') or item.get('url')
+    if not url:
+        return None
+    return {
+        'title': item.get('title', default_title),
+        'description': item.get('publisher', '') + (': ' + item.get('summary', '') if item.get('summary') else ''),
+        'url': url,
+        'publishedAt': item.get('providerPublishTime') or item.get('published_at'),
+        'symbol': symbol,
+    }
+
+
+def search_news(client, symbol: str, news_count: Optional[int] = None) -> List[Dict]:
+    """Fetch news and research headlines for ``symbol`` in a single search request."""
+    result = client.search(symbol, news_count=news_count or config.NEWS_COUNT, include_research=True)
+    articles = []
+    for item in getattr(result, 'news', None) or []:
+        article = _article(item, symbol, f"{symbol} News")
+        if article:
+            articles.append(article)
+    for item in getattr(result, 'research', None) or []:
+        article = _article(item, symbol, f"{symbol} Research")
+        if article:
+            articles.append(article)
+    return articles
+
+
+class NewsService:
+    """Bounded, cached news fetcher with cross-symbol URL deduplication."""
+
+    def __init__(self, ttl: Optional[float] = None, store: Optional[KVStore] = None,
+                 url_index: Optional[KVStore] = None, index_max_age: Optional[float] = None):
+        self.ttl = config.NEWS_TTL_SECONDS if ttl is None else ttl
+        self.index_max_age = config.NEWS_INDEX_MAX_AGE_SECONDS if index_max_age is None else index_max_age
+        self.store = store if store is not None else KVStore("news")
+        self.url_index = url_index if url_index is not None else KVStore("news_urls")
+        self._memory: Dict[str, Tuple[List[Dict], float]] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.flight = get_flight("news")
+
+    def _cached(self, symbol: str) -> Optional[List[Dict]]:
+        with self._lock:
+            entry = self._memory.get(symbol)
+        if entry is None:
+            try:
+                stored = self.store.get(symbol)
+            except Exception as e:
+                print(f"Error reading news cache for {symbol}: {str(e)}")
+                stored = None
+            if stored is None:
+                return None
+            entry = (stored[0], stored[1])
+            with self._lock:
+                self._memory[symbol] = entry
+        articles, fetched_at = entry
+        return articles if time.time() - fetched_at < self.ttl else None
+
+    def _index(self, articles: List[Dict]) -> List[Dict]:
+        """Attribute each URL to the symbol it was first seen under and give it a stable timestamp."""
+        for article in articles:
+            try:
+                seen = self.url_index.get(article['url'])
+                if seen is None:
+                    first_seen = time.time()
+                    self.url_index.set(article['url'], {'symbol': article['symbol'], 'first_seen': first_seen},
+                                       created_at=first_seen)
+                else:
+                    article['symbol'] = seen[0]['symbol']
+                    first_seen = seen[0]['first_seen']
+            except Exception as e:
+                print(f"Error updating news URL index: {str(e)}")
+                first_seen = time.time()
+            if not article['publishedAt']:
+                article['publishedAt'] = datetime.fromtimestamp(first_seen).isoformat()
+        return articles
+
+    def _stored(self, symbol: str) -> Optional[List[Dict]]:
+        """Articles another process stored within the TTL, or None."""
+        try:
+            stored = self.store.get(symbol)
+        except Exception as e:
+            print(f"Error reading news cache for {symbol}: {str(e)}")
+            return None
+        if stored is None or time.time() - stored[1] >= self.ttl:
+            return None
+        with self._lock:
+            self._memory[symbol] = (stored[0], stored[1])
+        return stored[0]
+
+    def _search(self, client, symbol: str) -> List[Dict]:
+        articles = self._index(search_news(client, symbol))
+        fetched_at = time.time()
+        with self._lock:
+            self._memory[symbol] = (articles, fetched_at)
+        try:
+            self.store.set(symbol, articles, created_at=fetched_at)
+            self.url_index.expire(self.index_max_age)
+        except Exception as e:
+            print(f"Error writing news cache for {symbol}: {str(e)}")
+        return articles
+
+    def _fetch(self, client, symbol: str) -> List[Dict]:
+        try:
+            # Searches in this process are already shared through _inflight; this also covers other processes
+            return self.flight.do(symbol, self._search, client, symbol, recheck=lambda: self._stored(symbol))
+        finally:
+            with self._lock:
+                self._inflight.pop(symbol, None)
+
+    def submit(self, client, symbol: str) -> Future:
+        """Return a future for the articles of ``symbol``: already done on a cache hit, shared while in flight."""
+        cached = self._cached(symbol)
+        telemetry.CACHE_REQUESTS.inc(cache="news", result="miss" if cached is None else "hit")
+        if cached is not None:
+            future: Future = Future()
+            future.set_result(cached)
+            return future
+        with self._lock:
+            future = self._inflight.get(symbol)
+            if future is None or future.done():
+                future = get_news_executor().submit(self._fetch, client, symbol)
+                self._inflight[symbol] = future
+        return future
+
+    def get(self, client, symbol: str, timeout: Optional[float] = None) -> List[Dict]:
+        """Articles for one symbol; an empty list if the search fails or times out."""
+        try:
+            return self.submit(client, symbol).result(timeout=timeout)
+        except Exception as e:
+            print(f"Error fetching news/research for {symbol}: {str(e)}")
+            return []
+
+    def fetch_all(self, client, symbols: Iterable[str], timeout: Optional[float] = None) -> List[Dict]:
+        """Articles for all ``symbols``, searched concurrently and merged without duplicate URLs."""
+        futures = [(symbol, self.submit(client, symbol)) for symbol in symbols]
+        results = []
+        for symbol, future in futures:
+            try:
+                results.append(future.result(timeout=timeout))
+            except Exception as e:
+                print(f"Error fetching news/research for {symbol}: {str(e)}")
+        return merge_articles(results)
+
+
+def merge_articles(article_lists: Iterable[List[Dict]]) -> List[Dict]:
+    """Concatenate article lists, keeping the first occurrence of each URL."""
+    merged, seen = [], set()
+    for articles in article_lists:
+        for article in articles or []:
+            url = article.get('url')
+            if url and url not in seen:
+                seen.add(url)
+                merged.append(article)
+    return merged
@@ -0,0 +1,350 @@
+"""
+Headless analysis pipeline.
+
+Runs the same steps as the Streamlit app (symbol extraction, data fetching,
+chart rendering, AI analysis and news) without any UI, so analyses can be
+computed in batch, e.g. nightly for a whole coverage universe. Within an item
+the steps run as a stage DAG (see ``stages``); items of a watchlist run
+concurrently on a bounded thread pool and results are yielded in completion
+order, ready to be streamed to a JSONL or Parquet file.
+"""
+
+import base64
+import functools
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import config, prompts
+from .news import merge_articles
+from .stages import StageGraph, StageRun, on_loop
+from .streaming import chunk_text
+from .utils import sanitize_markdown
+
+# Queries naming more symbols than this are truncated, as in the app
+MAX_SYMBOLS = 10
+
+COMMON_WORDS = {'THE', 'AND', 'OR', 'FOR', 'WITH', 'VS', 'VERSUS', 'COMPARE', 'ANALYZE', 'STOCK', 'STOCKS'}
+
+# A watchlist line that is a bare ticker is used as-is, without symbol extraction
+_TICKER_RE = re.compile(r'^\$?[A-Z0-9][A-Z0-9.\-^=]{0,9}$')
+
+IMAGE_EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp"}
+
+
+def read_watchlist(path: str) -> List[str]:
+    """Read one symbol or query per line, skipping blank lines and ``#`` comments."""
+    items = []
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                items.append(line)
+    return items
+
+
+def resolve_symbols(workflow, query: str) -> List[str]:
+    """Resolve the symbols of a query, falling back to ticker-like words when extraction finds none."""
+    if _TICKER_RE.match(query):
+        return [query.lstrip('$')]
+    symbols = workflow.extract_symbols(query) or []
+    if not symbols:
+        symbols = re.findall(r'\b[A-Z0-9]{1,5}\b', re.sub(r'[^A-Z0-9\s]', '', query.upper()))
+        symbols = [symbol for symbol in symbols if symbol not in COMMON_WORDS]
+    return symbols[:MAX_SYMBOLS]
+
+
+def collect_stream(stream) -> str:
+    """Concatenate the text deltas of a streamed chat completion."""
+    return "".join(filter(None, (chunk_text(chunk) for chunk in stream)))
+
+
+def _number(value):
+    """Convert numpy scalars to plain floats; leave missing values as None."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def summarize(data: Dict) -> Dict:
+    """Reduce fetched data to the JSON-serializable figures shown in the app's summary table."""
+    summary = {}
+    for symbol, symbol_data in data.items():
+        if not symbol_data:
+            summary[symbol] = None
+            continue
+        info = symbol_data['info']
+        summary[symbol] = {
+            'current_price': _number(symbol_data['current_price']),
+            'price_change': _number(symbol_data['price_change']),
+            'price_change_pct': _number(symbol_data['price_change_pct']),
+            'market_cap': _number(info.get('marketCap')),
+            'trailing_pe': _number(info.get('trailingPE')),
+            'fifty_two_week_high': _number(info.get('fiftyTwoWeekHigh')),
+            'fifty_two_week_low': _number(info.get('fiftyTwoWeekLow')),
+            'bars': len(symbol_data['history']),
+        }
+    return summary
+
+
+def _slug(text: str) -> str:
+    return re.sub(r'[^A-Za-z0-9]+', '_', text).strip('_')[:40] or "item"
+
+
+def merge_news(run: StageRun, symbols: List[str]) -> List[Dict]:
+    """Combine the per-symbol news stages of a run, dropping duplicate articles and empty placeholders."""
+    return merge_articles(run.results.get(f"news:{symbol}") for symbol in symbols)
+
+
+def build_graph(workflow, symbols: List[str], query: str, period: str = "1y", chart_type: str = "line",
+                analysis: bool = True, news: bool = True, chart: bool = False, figure: bool = False,
+                stream: bool = False, interval: str = "1d", on_chunk=None) -> StageGraph:
+    """
+    Declare the workflow stages for ``symbols``.
+
+    News for every symbol and the benchmark history run next to the price
+    fetch; metrics and the analysis prompt are built while the chart image
+    renders; the LLM call waits for both. When vision analysis is disabled
+    the LLM call does not wait for the image. With
+    ``stream=True`` the ``analysis`` stage returns the response stream (or the
+    text-only answer) for the caller to consume, otherwise the full text.
+    Intraday histories downloaded by the fetch are passed to ``on_chunk`` on
+    the event loop thread as their windows arrive.
+
+    Every stage but the news is keyed by the inputs it depends on (symbols,
+    period, interval, chart type, query), so runs with a ``StageMemo`` only recompute
+    what a parameter change affects. News has its own TTL cache. A streamed
+    analysis cannot be reused as is; the caller memoizes the final text under
+    the stage's key instead.
+    """
+    symbols_key = tuple(symbols)
+    graph = StageGraph()
+    graph.add('fetch', functools.partial(workflow.fetch_financial_data, symbols, period, interval,
+                                         on_loop(on_chunk) if on_chunk else None),
+              key=(symbols_key, period, interval), keep=_complete)
+    if news:
+        for symbol in symbols:
+            graph.add(f"news:{symbol}", functools.partial(workflow.fetch_financial_news, symbol, [symbol]))
+    if figure:
+        graph.add('figure', functools.partial(_figure, workflow, chart_type=chart_type), deps=('fetch',),
+                  key=(symbols_key, period, interval, chart_type))
+    vision = analysis and config.VISION_ANALYSIS
+    if vision or chart:
+        graph.add('chart', functools.partial(_chart, workflow, chart_type=chart_type), deps=('fetch',),
+                  key=(symbols_key, period, interval, chart_type), keep=lambda image: bool(image[0]))
+    if analysis:
+        graph.add('benchmark', functools.partial(workflow.fetch_benchmark, period), key=(period,))
+        graph.add('metrics', workflow.compute_metrics, deps=('fetch', 'benchmark'),
+                  key=(symbols_key, period, interval))
+        graph.add('prompt', functools.partial(_prompt, query=query), deps=('fetch', 'metrics'),
+                  key=(symbols_key, period, interval, query))
+        graph.add('analysis', functools.partial(_analyze, workflow, query=query, stream=stream),
+                  deps=('fetch', 'prompt', 'chart') if vision else ('fetch', 'prompt'),
+                  key=(symbols_key, period, interval, chart_type if vision else None, query),
+                  keep=lambda text: not stream and bool(text) and not workflow.is_fallback_analysis(text))
+    return graph
+
+
+def _complete(data: Dict) -> bool:
+    """Only reuse fetched data that covers every symbol; failed symbols are retried on the next run."""
+    return all(data.values())
+
+
+def _has_data(data: Dict) -> bool:
+    return any(symbol_data for symbol_data in data.values())
+
+
+def _figure(workflow, data: Dict, chart_type: str):
+    return workflow.create_comparison_chart(data, chart_type) if _has_data(data) else None
+
+
+def _chart(workflow, data: Dict, chart_type: str) -> Tuple[Optional[str], str]:
+    if not _has_data(data):
+        return None, "image/png"
+    return workflow.render_chart_image(data, chart_type)
+
+
+def _prompt(data: Dict, metrics, query: str) -> prompts.AnalysisPrompt:
+    return prompts.build_analysis_prompt(data, query, metrics)
+
+
+def _analyze(workflow, data: Dict, prompt: str, chart: Tuple[Optional[str], str] = (None, "image/png"),
+             query: str = "", stream: bool = False):
+    """Vision analysis when a chart image is available, text-only analysis otherwise or on failure."""
+    chart_base64, chart_mime = chart
+    if chart_base64:
+        response = workflow.call_together_ai_with_vision(data, query, chart_base64, chart_mime, analysis_prompt=prompt)
+        if response is not None and stream:
+            return response
+        text = collect_stream(response) if response is not None else ""
+        if text:
+            return sanitize_markdown(text)
+    return sanitize_markdown(workflow.call_together_ai_text_only(data, query, analysis_prompt=prompt))
+
+
+def run_item(workflow, item: str, index: int = 0, period: str = "1y", chart_type: str = "line",
+             analysis: bool = True, news: bool = True, charts_dir: Optional[str] = None,
+             interval: str = "1d") -> Dict:
+    """Run the full pipeline for one watchlist item and return a JSON-serializable record."""
+    started = time.perf_counter()
+    record = {
+        'index': index,
+        'item': item,
+        'status': 'ok',
+        'error': None,
+        'symbols': [],
+        'period': period,
+        'interval': interval,
+        'summary': {},
+        'analysis': None,
+        'chart_path': None,
+        'news': [],
+        'metrics': None,
+        'prompt_tokens': None,
+        'prompt_dropped': [],
+        'timings': {},
+        'critical_path': [],
+    }
+    try:
+        t0 = time.perf_counter()
+        symbols = resolve_symbols(workflow, item)
+        record['timings']['symbols'] = round(time.perf_counter() - t0, 4)
+        record['symbols'] = symbols
+        if not symbols:
+            raise ValueError("no symbols found")
+
+        run = build_graph(workflow, symbols, item, period, chart_type, analysis=analysis, news=news,
+                          chart=bool(charts_dir), interval=interval).run_sync()
+        record['timings'].update({name: round(t.seconds, 4) for name, t in run.timings.items()})
+        record['critical_path'] = run.critical_path()
+        if not run.ok('fetch'):
+            raise run.errors.get('fetch') or RuntimeError("fetch failed")
+
+        data = run.results['fetch']
+        record['summary'] = summarize(data)
+        if not _has_data(data):
+            record['status'] = 'no_data'
+        record['analysis'] = run.results.get('analysis')
+        prompt = run.results.get('prompt')
+        if prompt is not None:
+            record['prompt_tokens'] = prompt.tokens
+            record['prompt_dropped'] = prompt.dropped
+        metrics = run.results.get('metrics')
+        record['metrics'] = metrics.to_dict() if metrics is not None else None
+        record['news'] = merge_news(run, symbols)
+
+        chart_base64, chart_mime = run.results.get('chart') or (None, None)
+        if chart_base64 and charts_dir:
+            path = os.path.join(charts_dir, f"{index:05d}_{_slug(item)}.{IMAGE_EXTENSIONS.get(chart_mime, 'png')}")
+            with open(path, "wb") as handle:
+                handle.write(base64.b64decode(chart_base64))
+            record['chart_path'] = path
+    except Exception as e:
+        print(f"Error analyzing {item!r}: {str(e)}")
+        record['status'] = 'error'
+        record['error'] = str(e)
+    record['elapsed_seconds'] = round(time.perf_counter() - started, 4)
+    return record
+
+
+def run_batch(workflow, items: Iterable[str], concurrency: int = 4, **options) -> Iterator[Dict]:
+    """
+    Run ``run_item`` for every item with at most ``concurrency`` items in flight.
+
+    Records are yielded as soon as they complete, so output can be streamed;
+    each carries its watchlist ``index`` to restore the input order.
+    """
+    items = iter(enumerate(items))
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="luminafi-batch") as executor:
+        pending = set()
+        while True:
+            # Keep a bounded window of submitted items so huge watchlists don't queue up at once
+            for index, item in items:
+                pending.add(executor.submit(run_item, workflow, item, index, **options))
+                if len(pending) >= concurrency * 2:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+class JSONLWriter:
+    """Write one JSON record per line, flushed as it arrives."""
+
+    def __init__(self, path: str):
+        self.handle = open(path, "w", encoding="utf-8")
+
+    def write(self, record: Dict):
+        self.handle.write(json.dumps(record, default=str) + "\n")
+        self.handle.flush()
+
+    def close(self):
+        self.handle.close()
+
+
+class ParquetWriter:
+    """Write records to a Parquet file in row groups of ``batch_size``; nested fields are stored as JSON."""
+
+    JSON_FIELDS = ('summary', 'metrics', 'news', 'timings')
+
+    def __init__(self, path: str, batch_size: int = 64):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.schema = pa.schema([
+            ('index', pa.int64()),
+            ('item', pa.string()),
+            ('status', pa.string()),
+            ('error', pa.string()),
+            ('symbols', pa.list_(pa.string())),
+            ('period', pa.string()),
+            ('interval', pa.string()),
+            ('summary', pa.string()),
+            ('metrics', pa.string()),
+            ('prompt_tokens', pa.int64()),
+            ('prompt_dropped', pa.list_(pa.string())),
+            ('analysis', pa.string()),
+            ('chart_path', pa.string()),
+            ('news', pa.string()),
+            ('timings', pa.string()),
+            ('critical_path', pa.list_(pa.string())),
+            ('elapsed_seconds', pa.float64()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.batch_size = batch_size
+        self.rows: List[Dict] = []
+
+    def write(self, record: Dict):
+        row = {name: record.get(name) for name in self.schema.names}
+        for name in self.JSON_FIELDS:
+            row[name] = json.dumps(row[name], default=str)
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        import pyarrow as pa
+
+        if self.rows:
+            self.writer.write_table(pa.Table.from_pylist(self.rows, schema=self.schema))
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def open_writer(path: str, fmt: Optional[str] = None):
+    """Open a JSONL or Parquet writer, picking the format from the file extension unless given."""
+    fmt = fmt or ("parquet" if path.endswith((".parquet", ".pq")) else "jsonl")
+    if fmt == "parquet":
+        return ParquetWriter(path)
+    if fmt == "jsonl":
+        return JSONLWriter(path)
+    raise ValueError(f"Unsupported output format: {fmt}")
@@ -0,0 +1,457 @@
+"""
+Persistent on-disk OHLCV cache.
+
+One Parquet file per symbol and interval holds every bar fetched so far. A
+request is served from the file when it already covers the requested period;
+otherwise only the bars since the last cached one are downloaded and merged in.
+Old bars never change, so a cached five-year history only ever grows at the tail.
+
+Writes go to a temporary file that is atomically renamed into place, so readers
+in other Streamlit worker processes always see a complete file. Writers and the
+size-based eviction hold an advisory file lock. Concurrent requests for the same
+symbols share one download, across worker processes too.
+
+Loaded histories live in the process-wide ``PriceStore`` as compact read-only
+arrays keyed by the file version, so sessions share one copy and a file is only
+parsed again after it changed.
+
+Intraday intervals (1m to 1h) only reach back a limited number of days and
+Yahoo caps the span of one request, so their bars are downloaded in day-aligned
+windows that run concurrently and are stitched together as they arrive. The
+caller can watch the stitched bars grow through ``on_chunk``; only the
+contiguous run of windows ending today is cached, so a failed window never
+leaves a gap.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import re
+import time
+from concurrent.futures import as_completed
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+
+from . import config, telemetry
+from .market_data import MarketDataClient, download_histories, get_executor
+from .price_store import get_price_store
+from .singleflight import FileLock, get_flight
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from .live import Quote
+
+_METADATA_KEY = b"luminafi"
+
+# yfinance period -> pandas DateOffset arguments
+PERIOD_OFFSETS = {
+    "1d": {"days": 1},
+    "5d": {"days": 5},
+    "1mo": {"months": 1},
+    "3mo": {"months": 3},
+    "6mo": {"months": 6},
+    "1y": {"years": 1},
+    "2y": {"years": 2},
+    "5y": {"years": 5},
+    "10y": {"years": 10},
+}
+
+# Intraday interval -> (days of history Yahoo serves, days per window request)
+INTRADAY_WINDOWS = {
+    "1m": (30, 7),
+    "5m": (60, 10),
+    "15m": (60, 20),
+    "30m": (60, 20),
+    "1h": (730, 90),
+}
+
+ChunkCallback = Callable[[Dict[str, "pd.DataFrame"]], None]
+
+# Day periods are counted back from; replays pin it to the day their responses were recorded
+_today: Optional[pd.Timestamp] = None
+
+
+def pin_today(day: Optional[pd.Timestamp]):
+    """Count periods back from ``day`` instead of the current date (None unpins)."""
+    global _today
+    _today = day.normalize() if day is not None else None
+
+
+def today() -> pd.Timestamp:
+    import pandas as pd
+    return _today if _today is not None else pd.Timestamp.now().normalize()
+
+
+def period_start(period: str, now: Optional[pd.Timestamp] = None) -> Optional[pd.Timestamp]:
+    """Return the first date covered by a yfinance ``period`` string, or None for "max"."""
+    import pandas as pd
+    now = (now or today()).normalize()
+    if period == "max":
+        return None
+    if period == "ytd":
+        return pd.Timestamp(year=now.year, month=1, day=1)
+    if period not in PERIOD_OFFSETS:
+        raise ValueError(f"Unsupported period: {period}")
+    return now - pd.DateOffset(**PERIOD_OFFSETS[period])
+
+
+def is_intraday(interval: str) -> bool:
+    return interval in INTRADAY_WINDOWS
+
+
+def fetch_start(period: str, interval: str = "1d", now: Optional[pd.Timestamp] = None) -> Optional[pd.Timestamp]:
+    """First date to request for ``period`` at ``interval``, limited to the history Yahoo serves intraday."""
+    import pandas as pd
+    start = period_start(period, now)
+    if not is_intraday(interval):
+        return start
+    earliest = (now or today()).normalize() - pd.Timedelta(days=INTRADAY_WINDOWS[interval][0] - 1)
+    return earliest if start is None or start < earliest else start
+
+
+def windows(start: pd.Timestamp, interval: str, now: Optional[pd.Timestamp] = None
+            ) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """Day-aligned ``[start, end)`` request windows from ``start`` through today, newest first."""
+    import pandas as pd
+    days = pd.Timedelta(days=INTRADAY_WINDOWS[interval][1])
+    start = start.normalize()
+    end = (now or today()).normalize() + pd.Timedelta(days=1)
+    spans = []
+    while end > start:
+        spans.append((max(start, end - days), end))
+        end = spans[-1][0]
+    return spans
+
+
+def stitch(frames: Iterable[Optional[pd.DataFrame]]) -> Optional[pd.DataFrame]:
+    """Concatenate window downloads (oldest first) into one sorted history; later frames win on overlap."""
+    import pandas as pd
+    frames = [_naive_index(frame) for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return None
+    frame = pd.concat(frames) if len(frames) > 1 else frames[0]
+    return frame[~frame.index.duplicated(keep='last')].sort_index()
+
+
+def _received(histories: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Drop the symbols a download returned no bars for; those count as failed."""
+    return {symbol: bars for symbol, bars in histories.items() if not bars.empty}
+
+
+def _naive_index(frame: pd.DataFrame) -> pd.DataFrame:
+    """Drop the timezone from a history index, keeping exchange wall-clock times."""
+    import pandas as pd
+    if isinstance(frame.index, pd.DatetimeIndex) and frame.index.tz is not None:
+        frame = frame.copy()
+        frame.index = frame.index.tz_localize(None)
+    return frame
+
+
+@dataclass
+class CachedHistory:
+    """Bars cached for one symbol and interval."""
+    frame: pd.DataFrame
+    covered_from: Optional[pd.Timestamp]  # None means the full "max" history
+    fetched_at: float
+
+    def covers(self, start: Optional[pd.Timestamp]) -> bool:
+        if self.covered_from is None:
+            return True
+        return start is not None and self.covered_from <= start
+
+
+class PriceCache:
+    """Parquet-backed history cache shared by all sessions and worker processes."""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None,
+                 refresh_seconds: Optional[float] = None):
+        self.directory = directory or os.path.join(config.CACHE_DIR, "prices")
+        self.max_bytes = config.PRICE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.refresh_seconds = config.PRICE_CACHE_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        self.flight = get_flight("prices")
+        self.store = get_price_store()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, symbol: str, interval: str) -> str:
+        safe_symbol = re.sub(r'[^A-Za-z0-9.\-]', '_', symbol.upper())
+        return os.path.join(self.directory, f"{safe_symbol}_{interval}.parquet")
+
+    @staticmethod
+    def _store_key(path: str) -> str:
+        return os.path.splitext(os.path.basename(path))[0]
+
+    @staticmethod
+    def _version(stat: os.stat_result) -> str:
+        # A rewrite can reuse the inode and keep the size (same bar count), but not the modification time
+        return f"{stat.st_ino}-{stat.st_size}-{stat.st_mtime_ns}"
+
+    def _intern(self, path: str, stat: os.stat_result, entry: CachedHistory) -> CachedHistory:
+        """Keep ``entry`` in the shared price store as the version of ``path`` described by ``stat``."""
+        try:
+            series = self.store.put(self._store_key(path), self._version(stat), entry.frame,
+                                    entry.covered_from, entry.fetched_at)
+        except (TypeError, ValueError) as e:
+            print(f"Error storing {os.path.basename(path)} in the price store: {str(e)}")
+            return entry
+        return CachedHistory(series.frame(), series.covered_from, series.fetched_at)
+
+    def _lock(self, path: str) -> FileLock:
+        """An exclusive advisory lock on ``path``; its lock file is deleted again on release."""
+        return FileLock(path + ".lock", self.flight.wait)
+
+    def read(self, symbol: str, interval: str = "1d") -> Optional[CachedHistory]:
+        """Load the cached bars for a symbol, or None if nothing usable is cached."""
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = self.path(symbol, interval)
+        try:
+            with open(path, "rb") as handle:
+                stat = os.fstat(handle.fileno())
+                series = self.store.get(self._store_key(path), self._version(stat))
+                if series is None:
+                    table = pq.read_table(handle)
+                    meta = json.loads(table.schema.metadata[_METADATA_KEY])
+            # Mark as recently used for eviction; the modification time is part of the version, so keep it
+            os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+        except (OSError, KeyError, ValueError, pa.ArrowException):
+            return None
+        if series is not None:
+            return CachedHistory(series.frame(), series.covered_from, series.fetched_at)
+        covered_from = meta.get("covered_from")
+        return self._intern(path, stat, CachedHistory(
+            frame=table.to_pandas(),
+            covered_from=pd.Timestamp(covered_from) if covered_from else None,
+            fetched_at=meta.get("fetched_at", 0.0),
+        ))
+
+    def write(self, symbol: str, interval: str, entry: CachedHistory) -> CachedHistory:
+        """Atomically replace the cached bars for a symbol; returns the entry as kept in the price store."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = self.path(symbol, interval)
+        table = pa.Table.from_pandas(entry.frame, preserve_index=True)
+        meta = dict(table.schema.metadata or {})
+        meta[_METADATA_KEY] = json.dumps({
+            "covered_from": entry.covered_from.isoformat() if entry.covered_from is not None else None,
+            "fetched_at": entry.fetched_at,
+        }).encode()
+        table = table.replace_schema_metadata(meta)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with self._lock(path):
+            pq.write_table(table, tmp_path, compression="zstd")
+            os.replace(tmp_path, path)
+            stat = os.stat(path)
+        return self._intern(path, stat, entry)
+
+    def evict(self):
+        """Delete least recently used files until the cache fits in ``max_bytes``."""
+        with self._lock(os.path.join(self.directory, ".evict")):
+            files = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(".parquet"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                files.append((stat.st_atime, stat.st_size, name))
+            total = sum(size for _, size, _ in files)
+            for _, size, name in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(self.directory, name))
+                    total -= size
+                self.store.remove(self._store_key(name))
+
+    def append_quote(self, quote: Quote, interval: str = "1d") -> bool:
+        """
+        Merge a live quote into a fresh cached daily history as the bar of its trading day; False if skipped.
+
+        The history keeps its download time, so it turns stale (and is completed
+        by a download) on the same schedule as without live quotes.
+        """
+        import pandas as pd
+        entry = self.read(quote.symbol, interval)
+        # A stale history may be missing bars before today; the next download completes it instead
+        if (interval != "1d" or entry is None or entry.frame.empty
+                or time.time() - entry.fetched_at >= self.refresh_seconds):
+            return False
+        day = quote.market_time().normalize()
+        if entry.frame.index[-1] > day:
+            return False
+        same_day = entry.frame.index[-1] == day
+        bar = entry.frame.iloc[-1].to_dict() if same_day else dict.fromkeys(entry.frame.columns, 0)
+        if 'Open' in bar and not same_day:
+            bar['Open'] = quote.open or quote.price
+        if 'High' in bar:
+            bar['High'] = max(quote.high or quote.price, quote.price, bar['High'] if same_day else quote.price)
+        if 'Low' in bar:
+            bar['Low'] = min(quote.low or quote.price, quote.price, bar['Low'] if same_day else quote.price)
+        bar['Close'] = quote.price
+        if 'Volume' in bar and quote.volume:
+            bar['Volume'] = quote.volume
+        self._merge(quote.symbol, interval, entry, pd.DataFrame([bar], index=pd.DatetimeIndex([day], name=entry.frame.index.name)),
+                    entry.covered_from, fetched_at=entry.fetched_at)
+        return True
+
+    def _merge(self, symbol: str, interval: str, previous: Optional[CachedHistory],
+               bars: pd.DataFrame, covered_from: Optional[pd.Timestamp],
+               fetched_at: Optional[float] = None) -> pd.DataFrame:
+        """Merge freshly downloaded bars into the cached ones and persist the result, fetched now unless given."""
+        import pandas as pd
+        bars = _naive_index(bars)
+        if previous is not None:
+            if previous.covered_from is None or covered_from is None:
+                covered_from = None
+            else:
+                covered_from = min(previous.covered_from, covered_from)
+            if bars.empty:
+                # Nothing was downloaded: keep the entry as it is, still stale
+                return previous.frame
+            # Newer bars win: the last cached bar may have been an unfinished session
+            frame = pd.concat([previous.frame, bars])
+            frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+        elif bars.empty:
+            return bars
+        else:
+            frame = bars
+
+        try:
+            frame = self.write(symbol, interval, CachedHistory(frame, covered_from,
+                                                              time.time() if fetched_at is None else fetched_at)).frame
+        except OSError as e:
+            print(f"Error writing price cache for {symbol}: {str(e)}")
+        return frame
+
+    def fetch(self, client: MarketDataClient, symbols: List[str], period: str = "1y",
+              interval: str = "1d", max_workers: int = 8,
+              on_chunk: Optional[ChunkCallback] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Return histories for ``symbols`` covering ``period``, downloading only what is missing.
+
+        Symbols whose download failed are left out of the result so the caller
+        can fall back to per-symbol requests. Concurrent requests for the same
+        symbols, period and interval share one download. Intraday downloads call
+        ``on_chunk`` with the bars stitched so far each time a window arrives.
+        """
+        start = fetch_start(period, interval)
+        cached, histories, full, tails = self._plan(symbols, interval, start)
+        telemetry.CACHE_REQUESTS.inc(len(histories), cache="prices", result="hit")
+        telemetry.CACHE_REQUESTS.inc(len(tails), cache="prices", result="tail")
+        telemetry.CACHE_REQUESTS.inc(len(full), cache="prices", result="miss")
+        if not full and not tails:
+            return self._trim(histories, start)
+        key = (interval, period, tuple(sorted(symbols)))
+        # Another session or worker process may be downloading the same bars; once it has, they are on disk
+        return dict(self.flight.do(key, self._fill, client, symbols, period, interval, max_workers, on_chunk,
+                                   recheck=lambda: self._ready(symbols, interval, start)))
+
+    def cached(self, symbols: List[str], period: str = "1y", interval: str = "1d") -> Dict[str, pd.DataFrame]:
+        """The cached histories of ``symbols`` covering ``period``, fresh or not, without downloading anything."""
+        start = fetch_start(period, interval)
+        entries = {symbol: self.read(symbol, interval) for symbol in symbols}
+        return self._trim({symbol: entry.frame for symbol, entry in entries.items() if entry is not None}, start)
+
+    def _plan(self, symbols: List[str], interval: str, start):
+        """Split ``symbols`` into fresh cached histories, symbols to download in full and stale ones to extend."""
+        cached = {symbol: self.read(symbol, interval) for symbol in symbols}
+        histories = {}
+        full, tails = [], []
+        for symbol, entry in cached.items():
+            if entry is None or not entry.covers(start):
+                full.append(symbol)
+            elif time.time() - entry.fetched_at < self.refresh_seconds:
+                histories[symbol] = entry.frame
+            else:
+                tails.append(symbol)
+        return cached, histories, full, tails
+
+    def _ready(self, symbols: List[str], interval: str, start) -> Optional[Dict[str, pd.DataFrame]]:
+        """The histories if every symbol is now cached and fresh, else None."""
+        _, histories, full, tails = self._plan(symbols, interval, start)
+        return None if full or tails else self._trim(histories, start)
+
+    @staticmethod
+    def _trim(histories: Dict[str, pd.DataFrame], start) -> Dict[str, pd.DataFrame]:
+        if start is None:
+            return histories
+        # Positional slices stay views of the shared arrays
+        return {symbol: frame if frame.empty else frame.iloc[frame.index.searchsorted(start):]
+                for symbol, frame in histories.items()}
+
+    def _download_windows(self, client: MarketDataClient, symbols: List[str], start: pd.Timestamp, interval: str,
+                          max_workers: int, on_chunk: Optional[ChunkCallback] = None):
+        """
+        Download intraday bars since ``start`` in concurrent window requests.
+
+        Returns ``({symbol: bars}, covered_from)``. Only windows from today back
+        to the newest failed one are kept, so the bars have no gap;
+        ``covered_from`` is where they begin.
+        """
+        spans = windows(start, interval)
+        executor = get_executor(max_workers)
+        futures = {executor.submit(download_histories, client, symbols, max_workers,
+                                   start=window_start.strftime('%Y-%m-%d'), end=window_end.strftime('%Y-%m-%d'),
+                                   interval=interval): i
+                   for i, (window_start, window_end) in enumerate(spans)}
+        chunks: List[Optional[Dict[str, pd.DataFrame]]] = [None] * len(spans)
+        for future in as_completed(futures):
+            # download_histories reports a failed request as an empty dict
+            chunks[futures[future]] = future.result()
+            if on_chunk is not None:
+                partial = {symbol: stitch(chunk.get(symbol) for chunk in reversed(chunks) if chunk)
+                           for symbol in symbols}
+                try:
+                    on_chunk({symbol: bars for symbol, bars in partial.items() if bars is not None})
+                except Exception as e:
+                    print(f"Error in history chunk callback: {str(e)}")
+
+        kept = next((i for i, chunk in enumerate(chunks) if not chunk), len(chunks))
+        covered_from = spans[kept - 1][0] if kept else None
+        histories = {symbol: stitch(chunk.get(symbol) for chunk in reversed(chunks[:kept])) for symbol in symbols}
+        return {symbol: bars for symbol, bars in histories.items() if bars is not None}, covered_from
+
+    def _fill(self, client: MarketDataClient, symbols: List[str], period: str, interval: str,
+              max_workers: int, on_chunk: Optional[ChunkCallback] = None) -> Dict[str, pd.DataFrame]:
+        """Download what is missing or stale, merge it into the cache and return every history."""
+        start = fetch_start(period, interval)
+        cached, histories, full, tails = self._plan(symbols, interval, start)
+
+        if full and is_intraday(interval):
+            downloaded, covered_from = self._download_windows(client, full, start, interval, max_workers, on_chunk)
+            for symbol, bars in downloaded.items():
+                # Bars that do not reach back to ``start`` replace the cached ones rather than leave a gap
+                previous = cached[symbol] if covered_from == start else None
+                histories[symbol] = self._merge(symbol, interval, previous, bars, covered_from)
+        elif full:
+            downloaded = _received(download_histories(client, full, max_workers, period=period, interval=interval))
+            for symbol, bars in downloaded.items():
+                histories[symbol] = self._merge(symbol, interval, cached[symbol], bars, start)
+
+        if tails:
+            # Re-fetch from the last cached bar so an unfinished session gets completed
+            tail_start = min(cached[symbol].frame.index[-1] for symbol in tails)
+            if is_intraday(interval):
+                downloaded, covered_from = self._download_windows(client, tails, tail_start, interval, max_workers)
+                if covered_from != tail_start.normalize():
+                    downloaded = {}  # partial tails would leave a gap before them
+            else:
+                downloaded = _received(download_histories(client, tails, max_workers,
+                                                          start=tail_start.strftime('%Y-%m-%d'), interval=interval))
+            for symbol in tails:
+                entry = cached[symbol]
+                if symbol in downloaded:
+                    histories[symbol] = self._merge(symbol, interval, entry, downloaded[symbol], entry.covered_from)
+                else:
+                    histories[symbol] = entry.frame  # serve stale bars rather than nothing
+
+        if full or tails:
+            self.evict()
+        return self._trim(histories, start)
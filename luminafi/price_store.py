@@ -0,0 +1,309 @@
+"""
+Compact, shared, read-only price store.
+
+Histories are kept once per worker process as columnar arrays instead of a
+pandas DataFrame per session and request: prices and the other float columns
+as one float32 matrix, volume as int64 and the bar timestamps as int64
+nanoseconds. float32 keeps about seven significant digits, well below a cent
+for prices under $100,000.
+
+Each series is also written to ``<cache dir>/store`` as ``.npy`` files named
+after the price-cache file version it was built from, and memory-mapped
+read-only. Every worker process that loads the same version shares the same
+pages of the OS page cache, and those pages are file-backed, so the kernel can
+reclaim them under pressure. The arrays are read-only in both modes.
+Sessions get zero-copy DataFrames whose first write to a column copies it:
+pandas copy-on-write is always on from pandas 3, and the store switches
+``mode.copy_on_write`` on for the process under pandas 2 before it builds its
+first frame (pandas is only imported when needed, so not at import time).
+
+The store keeps a hard budget on the bytes it references and drops the least
+recently used series beyond it (views still held by sessions stay valid).
+``report()`` gives the per-worker numbers.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import glob
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from . import config
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+# Integer column kept as int64; every other column is stored as float32
+VOLUME = "Volume"
+
+
+@dataclass
+class PriceSeries:
+    """One history as columnar arrays plus the price-cache metadata it came with."""
+    index: np.ndarray  # int64 nanoseconds
+    values: np.ndarray  # float32, one row per column in ``columns``
+    volume: Optional[np.ndarray]  # int64
+    columns: Tuple[str, ...]
+    order: Tuple[str, ...]  # original column order, including Volume
+    index_name: Optional[str]
+    tz: Optional[str]
+    covered_from: Optional[pd.Timestamp]
+    fetched_at: float
+    version: str
+    mapped: bool = False
+    _base: Optional[pd.DataFrame] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def nbytes(self) -> int:
+        return self.index.nbytes + self.values.nbytes + (self.volume.nbytes if self.volume is not None else 0)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def frame(self) -> pd.DataFrame:
+        """
+        A DataFrame of the series that callers may modify freely.
+
+        It is a shallow copy of one base frame over the stored arrays; under
+        copy-on-write nothing is copied until a column is written to.
+        """
+        base = self._base
+        if base is None:
+            base = self._base = self._build_frame()
+        return base.copy(deep=False)
+
+    def _build_frame(self) -> pd.DataFrame:
+        import numpy as np
+        import pandas as pd
+
+        _enable_copy_on_write()
+        index = pd.DatetimeIndex(self.index.view('datetime64[ns]'), name=self.index_name)
+        if self.tz:
+            index = index.tz_localize("UTC").tz_convert(self.tz)
+        rows = {name: i for i, name in enumerate(self.columns)}
+        # Every column keeps the base frame alive, so copy-on-write still sees the arrays as shared
+        # (and copies before a write) after this series has been dropped from the store
+        owner = {}
+        columns = {name: np.asarray(_Pin(self.volume if name == VOLUME else self.values[rows[name]], owner))
+                   for name in self.order}
+        owner['frame'] = base = pd.DataFrame(columns, index=index, copy=False)
+        return base
+
+    def freeze(self):
+        """Make the stored arrays read-only, so no session can write into data other sessions share."""
+        for array in (self.index, self.values, self.volume):
+            if array is not None:
+                array.flags.writeable = False
+
+    def _meta(self) -> Dict:
+        return {'columns': list(self.columns), 'order': list(self.order), 'index_name': self.index_name,
+                'tz': self.tz, 'covered_from': self.covered_from.isoformat() if self.covered_from is not None else None,
+                'fetched_at': self.fetched_at, 'version': self.version}
+
+
+def to_series(frame: pd.DataFrame, version: str, covered_from=None, fetched_at: float = 0.0) -> PriceSeries:
+    """Convert a history frame to compact columnar arrays."""
+    import numpy as np
+    import pandas as pd
+
+    index = pd.DatetimeIndex(frame.index)
+    tz = str(index.tz) if index.tz is not None else None
+    if tz:
+        index = index.tz_convert("UTC").tz_localize(None)
+    columns = tuple(str(column) for column in frame.columns if column != VOLUME)
+    values = np.empty((len(columns), len(frame)), dtype=np.float32)
+    for i, column in enumerate(columns):
+        values[i] = frame[column].to_numpy(dtype=np.float32, na_value=np.nan)
+    volume = None
+    if VOLUME in frame.columns:
+        volume = frame[VOLUME].fillna(0).to_numpy(dtype=np.int64)
+    series = PriceSeries(index=np.ascontiguousarray(index.as_unit("ns").asi8), values=values, volume=volume,
+                         columns=columns, order=tuple(str(column) for column in frame.columns),
+                         index_name=frame.index.name, tz=tz, covered_from=covered_from, fetched_at=fetched_at,
+                         version=version)
+    series.freeze()
+    return series
+
+
+def _enable_copy_on_write():
+    """Turn pandas copy-on-write on for the process; pandas 3 always has it."""
+    import pandas as pd
+
+    if int(pd.__version__.split(".")[0]) < 3 and pd.get_option("mode.copy_on_write") is not True:
+        pd.set_option("mode.copy_on_write", True)
+
+
+class _Pin:
+    """
+    Exposes ``array``'s memory through the array interface and keeps ``owner`` alive.
+
+    ``np.asarray`` of a pin is a plain ndarray whose base is the pin, so the
+    owner lives as long as that array or any view of it.
+    """
+
+    def __init__(self, array: np.ndarray, owner):
+        self.array = array
+        self.owner = owner
+        self.__array_interface__ = array.__array_interface__
+
+
+class PriceStore:
+    """Process-wide LRU of ``PriceSeries`` under a byte budget, memory-mapped from shared files."""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None,
+                 mmap: Optional[bool] = None):
+        self.directory = directory or os.path.join(config.CACHE_DIR, "store")
+        self.max_bytes = config.PRICE_STORE_MAX_BYTES if max_bytes is None else max_bytes
+        self.mmap = config.PRICE_STORE_MMAP if mmap is None else mmap
+        self.counters = {'hits': 0, 'loads': 0, 'misses': 0, 'puts': 0, 'evictions': 0}
+        self._series: "OrderedDict[str, PriceSeries]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if self.mmap:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
+
+    def _prefix(self, key: str, version: str) -> str:
+        return os.path.join(self.directory, f"{key}.{version}")
+
+    def get(self, key: str, version: str) -> Optional[PriceSeries]:
+        """The series stored under ``key`` at ``version``, from memory or mapped from another worker's files."""
+        with self._lock:
+            series = self._series.get(key)
+            if series is not None and series.version == version:
+                self._series.move_to_end(key)
+                self.counters['hits'] += 1
+                return series
+        series = self._load(key, version) if self.mmap else None
+        if series is None:
+            self._count('misses')
+            return None
+        self._count('loads')
+        self._insert(key, series)
+        return series
+
+    def put(self, key: str, version: str, frame: pd.DataFrame, covered_from=None,
+            fetched_at: float = 0.0) -> PriceSeries:
+        """Store ``frame`` as the series for ``key`` at ``version`` and return it."""
+        series = to_series(frame, version, covered_from, fetched_at)
+        if self.mmap and len(series):
+            try:
+                self._save(key, series)
+                series = self._load(key, version) or series
+            except OSError as e:
+                print(f"Error writing price store files for {key}: {str(e)}")
+        self._count('puts')
+        self._insert(key, series)
+        return series
+
+    def _insert(self, key: str, series: PriceSeries):
+        series.freeze()
+        with self._lock:
+            previous = self._series.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._series[key] = series
+            self._bytes += series.nbytes
+            # Hard budget: drop least recently used series (sessions holding views keep theirs alive)
+            while self._bytes > self.max_bytes and len(self._series) > 1:
+                _, evicted = self._series.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.counters['evictions'] += 1
+
+    def _save(self, key: str, series: PriceSeries):
+        import numpy as np
+
+        prefix = self._prefix(key, series.version)
+        tmp = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        parts = [("index", series.index), ("values", series.values)]
+        if series.volume is not None:
+            parts.append(("volume", series.volume))
+        for part, array in parts:
+            with open(prefix + f".{part}.npy" + tmp, "wb") as handle:
+                np.save(handle, array)
+            os.replace(prefix + f".{part}.npy" + tmp, prefix + f".{part}.npy")
+        # The metadata file is written last and marks the series as complete
+        with open(prefix + ".json" + tmp, "w") as handle:
+            json.dump(series._meta(), handle)
+        os.replace(prefix + ".json" + tmp, prefix + ".json")
+        # Older versions are no longer read; processes that still map them keep their pages
+        for path in glob.glob(os.path.join(glob.escape(self.directory), glob.escape(key) + ".*")):
+            if not path.startswith(prefix + ".") and not path.endswith(".tmp"):
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+
+    def _load(self, key: str, version: str) -> Optional[PriceSeries]:
+        import numpy as np
+        import pandas as pd
+
+        prefix = self._prefix(key, version)
+        try:
+            with open(prefix + ".json") as handle:
+                meta = json.load(handle)
+            index = np.load(prefix + ".index.npy", mmap_mode="r")
+            values = np.load(prefix + ".values.npy", mmap_mode="r")
+            volume = np.load(prefix + ".volume.npy", mmap_mode="r") if VOLUME in meta['order'] else None
+        except (OSError, ValueError, KeyError):
+            return None
+        return PriceSeries(index=index, values=values, volume=volume, columns=tuple(meta['columns']),
+                           order=tuple(meta['order']), index_name=meta.get('index_name'), tz=meta.get('tz'),
+                           covered_from=pd.Timestamp(meta['covered_from']) if meta.get('covered_from') else None,
+                           fetched_at=meta.get('fetched_at', 0.0), version=version, mapped=True)
+
+    def remove(self, key: str):
+        """Forget ``key`` and delete its files, e.g. when the price cache evicts it."""
+        with self._lock:
+            series = self._series.pop(key, None)
+            if series is not None:
+                self._bytes -= series.nbytes
+        if self.mmap:
+            for path in glob.glob(os.path.join(glob.escape(self.directory), glob.escape(key) + ".*")):
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+
+    def report(self) -> Dict:
+        """Memory report of this worker: series held, their bytes against the budget, counters and process RSS."""
+        with self._lock:
+            report = dict(self.counters)
+            report.update(pid=os.getpid(), series=len(self._series), bytes=self._bytes,
+                          mapped_bytes=sum(s.nbytes for s in self._series.values() if s.mapped),
+                          max_bytes=self.max_bytes)
+        report['rss_bytes'] = _rss_bytes()
+        return report
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident set size of this process, where the platform reports it."""
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        try:
+            import resource
+
+            # Peak rather than current RSS (kilobytes on Linux, bytes on macOS)
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except ImportError:
+            return None
+
+
+_store: Optional[PriceStore] = None
+_store_lock = threading.Lock()
+
+
+def get_price_store() -> PriceStore:
+    """Return the process-wide price store shared by every session."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PriceStore()
+        return _store
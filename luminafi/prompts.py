@@ -2,6 +2,12 @@
 Collection of prompts used for LLM interactions in LuminaFi.
 """
 
+import functools
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from . import config
+
 SYSTEM_FINANCIAL_ANALYST = """You are a professional financial analyst with expertise in stock market analysis, \
 investment strategies, and risk assessment. You can analyze both numerical data and financial charts. \
 Provide detailed, actionable financial insights based on both the data and the visual chart patterns you observe."""
@@ -13,57 +19,193 @@ from the following user query. Return ONLY a JSON array of strings, e.g. ["AAPL"
 
 User query: {query}"""
 
-def generate_analysis_prompt(data: dict, user_query: str) -> str:
-    """Generate prompt for financial analysis based on data and user query."""
-    prompt = f'''
-    Analyze the following financial data for the user query: "{user_query}"
-    
-    Financial Data Summary:
-    '''
-    
+# Context window of the models we call; unknown models get the conservative default
+MODEL_CONTEXT_TOKENS = {
+    "meta-llama/Llama-Vision-Free": 131072,
+    "meta-llama/Llama-3.2-3B-Instruct-Turbo": 131072,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+# Rough prompt cost of one chart image for Llama 3.2 Vision
+IMAGE_TOKENS = 1601
+# Never ask for fewer output tokens than this, and keep a small safety margin below the context size
+MIN_OUTPUT_TOKENS = 256
+CONTEXT_MARGIN_TOKENS = 64
+
+ANALYSIS_TASK = ("Task: detailed financial analysis for investors covering 1) performance comparison "
+                 "2) key financial metrics 3) investment recommendations 4) risk assessment "
+                 "5) market outlook and trends. Be comprehensive and actionable.")
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    """tiktoken's cl100k_base encoding if installed (a close proxy for Llama 3 tokenization), else None."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count prompt tokens with tiktoken when available, else estimate four characters per token."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def choose_max_tokens(model: str, prompt_tokens: int, cap: int) -> int:
+    """Largest completion size up to ``cap`` that still fits the model's context after the prompt."""
+    remaining = MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS) - prompt_tokens - CONTEXT_MARGIN_TOKENS
+    return max(MIN_OUTPUT_TOKENS, min(cap, remaining))
+
+
+def _pct(value, signed: bool = True) -> str:
+    if value is None or value != value:
+        return "n/a"
+    return f"{value * 100:+.1f}%" if signed else f"{value * 100:.1f}%"
+
+
+def _num(value, digits: int = 2) -> str:
+    if not isinstance(value, (int, float)) or value != value:
+        return "n/a"
+    return f"{value:.{digits}f}"
+
+
+def _ratio(value) -> str:
+    return "n/a" if value is None or value != value else f"{value:.2f}x"
+
+
+def _compact(value) -> str:
+    """Large numbers with a T/B/M/K suffix."""
+    if not isinstance(value, (int, float)) or value != value:
+        return "n/a"
+    for unit, scale in (("T", 1e12), ("B", 1e9), ("M", 1e6), ("K", 1e3)):
+        if abs(value) >= scale:
+            return f"{value / scale:.1f}{unit}"
+    return f"{value:.0f}"
+
+
+def _metric(name: str):
+    return lambda symbol_data, row: row.get(name) if row is not None else None
+
+
+# Columns of the summary table: (header, priority, value getter, formatter, needs metrics).
+# When the prompt is over budget, the lowest-priority column is dropped first.
+COLUMNS = [
+    ("Price", 100, lambda d, row: float(d['current_price']), _num, False),
+    ("Chg%", 95, lambda d, row: float(d['price_change_pct']) / 100, _pct, False),
+    ("AnnVol", 85, _metric('ann_volatility'), lambda v: _pct(v, signed=False), True),
+    ("AnnRet", 80, _metric('ann_return'), _pct, True),
+    ("MaxDD", 75, _metric('max_drawdown'), _pct, True),
+    ("Sharpe", 70, _metric('sharpe'), _num, True),
+    ("Beta", 65, _metric('beta'), _num, True),
+    ("MktCap", 60, lambda d, row: d['info'].get('marketCap'), _compact, False),
+    ("P/E", 55, lambda d, row: d['info'].get('trailingPE'), lambda v: _num(v, 1), False),
+    ("Chg$", 40, lambda d, row: float(d['price_change']), _num, False),
+    ("52wH", 30, lambda d, row: d['info'].get('fiftyTwoWeekHigh'), _num, False),
+    ("52wL", 30, lambda d, row: d['info'].get('fiftyTwoWeekLow'), _num, False),
+    ("VolTrend", 25, _metric('volume_trend'), _ratio, True),
+    ("AvgVol", 20, _metric('avg_volume'), _compact, True),
+]
+# Priority of the correlation matrix and of the rolling correlation ranges relative to the columns above
+CORRELATION_PRIORITY = 50
+ROLLING_CORRELATION_PRIORITY = 45
+
+
+@dataclass
+class AnalysisPrompt:
+    text: str
+    tokens: int
+    budget: int
+    dropped: List[str] = field(default_factory=list)
+
+    @property
+    def over_budget(self) -> bool:
+        return self.tokens > self.budget
+
+
+def _render(data: dict, user_query: str, metrics, columns, correlation: bool, rolling: bool = False) -> str:
+    lines = [f'Query: "{user_query}"']
+    if metrics is not None:
+        beta = f"; beta vs {metrics.benchmark}" if metrics.benchmark else ""
+        lines.append(f"Data: {metrics.observations} daily bars; returns/volatility annualized{beta}.")
+    lines.append("|".join(["Symbol"] + [header for header, *_ in columns]))
+    no_price, no_data = [], []
     for symbol, symbol_data in data.items():
-        if symbol_data and symbol_data['current_price'] is not None:
-            current_price = symbol_data['current_price']
-            price_change = symbol_data['price_change']
-            price_change_pct = symbol_data['price_change_pct']
-            market_cap = symbol_data['info'].get('marketCap', 'N/A')
-            pe_ratio = symbol_data['info'].get('trailingPE', 'N/A')
-            week_52_high = symbol_data['info'].get('fiftyTwoWeekHigh', 'N/A')
-            week_52_low = symbol_data['info'].get('fiftyTwoWeekLow', 'N/A')
-            
-            prompt += f"""
-            {symbol}:
-            - Current Price: ${current_price:.2f}
-            - Price Change: ${price_change:.2f} ({price_change_pct:.2f}%)
-            - Market Cap: {market_cap if market_cap != 'N/A' else 'N/A'}
-            - P/E Ratio: {pe_ratio if pe_ratio != 'N/A' else 'N/A'}
-            - 52 Week High: ${week_52_high if isinstance(week_52_high, (int, float)) else 'N/A'}
-            - 52 Week Low: ${week_52_low if isinstance(week_52_low, (int, float)) else 'N/A'}
-            """
-        elif symbol_data:
-            prompt += f"""
-            {symbol}:
-            - Status: Data available but current price unavailable
-            - Historical data points: {len(symbol_data['history']) if not symbol_data['history'].empty else 0}
-            """
-        else:
-            prompt += f"""
-            {symbol}:
-            - Status: Unable to fetch data for this symbol
-            """
-    
-    prompt += """
-    Please provide a detailed financial analysis including:
-    1. Performance comparison between the securities
-    2. Key financial metrics analysis
-    3. Investment recommendations
-    4. Risk assessment
-    5. Market outlook and trends
-    
-    Make the analysis comprehensive and actionable for investors.
+        if not symbol_data:
+            no_data.append(symbol)
+            continue
+        if symbol_data['current_price'] is None:
+            no_price.append(f"{symbol} ({len(symbol_data['history'])} bars)")
+            continue
+        row = None
+        if metrics is not None and symbol in metrics.table.index:
+            row = metrics.table.loc[symbol]
+        cells = [symbol]
+        for header, _, getter, formatter, _ in columns:
+            try:
+                cells.append(formatter(getter(symbol_data, row)))
+            except (TypeError, ValueError, KeyError):
+                cells.append("n/a")
+        lines.append("|".join(cells))
+    if no_price:
+        lines.append("No current price: " + ", ".join(no_price))
+    if no_data:
+        lines.append("Unable to fetch data: " + ", ".join(no_data))
+    if correlation:
+        symbols = list(metrics.correlation.columns)
+        lines.append(f"Return correlation ({metrics.correlation_window}d):")
+        lines.append("|".join([""] + symbols))
+        for symbol in symbols:
+            lines.append("|".join([symbol] + [_num(metrics.correlation.loc[symbol, other]) for other in symbols]))
+    if rolling:
+        lines.append(f"Rolling {metrics.correlation_window}d correlation over the period:")
+        lines.append("Pair|Now|Avg|Min|Max")
+        for pair, row in metrics.rolling_correlation.iterrows():
+            lines.append("|".join([pair] + [_num(row[column]) for column in ('latest', 'mean', 'min', 'max')]))
+    lines.append(ANALYSIS_TASK)
+    return "\n".join(lines)
+
+
+def build_analysis_prompt(data: dict, user_query: str, metrics=None,
+                          budget: Optional[int] = None) -> AnalysisPrompt:
+    """
+    Build a dense tabular analysis prompt that fits ``budget`` tokens.
+
+    Columns (and the correlation tables) are dropped lowest priority first
+    until the prompt fits; price and change are always kept.
     """
-    
-    return prompt
+    budget = config.PROMPT_TOKEN_BUDGET if budget is None else budget
+    columns = [c for c in COLUMNS if metrics is not None or not c[4]]
+    correlation = metrics is not None and len(metrics.correlation) > 1
+    rolling = (metrics is not None and metrics.rolling_correlation is not None
+               and not metrics.rolling_correlation.empty)
+    dropped: List[str] = []
+    while True:
+        text = _render(data, user_query, metrics, columns, correlation, rolling)
+        tokens = count_tokens(text)
+        droppable = [(c[1], c[0]) for c in columns if c[1] < 95]
+        if correlation:
+            droppable.append((CORRELATION_PRIORITY, "correlation"))
+        if rolling:
+            droppable.append((ROLLING_CORRELATION_PRIORITY, "rolling correlation"))
+        if tokens <= budget or not droppable:
+            return AnalysisPrompt(text=text, tokens=tokens, budget=budget, dropped=dropped)
+        _, name = min(droppable)
+        dropped.append(name)
+        if name == "correlation":
+            correlation = False
+        elif name == "rolling correlation":
+            rolling = False
+        else:
+            columns = [c for c in columns if c[0] != name]
+
+
+def generate_analysis_prompt(data: dict, user_query: str, metrics=None) -> str:
+    """Generate prompt for financial analysis based on data, optional quantitative metrics and user query."""
+    return build_analysis_prompt(data, user_query, metrics).text
+
 
 def generate_vision_prompt(prompt: str) -> str:
     """Add vision-specific instructions to the analysis prompt."""
@@ -0,0 +1,172 @@
+"""
+Fast chart rasterization for the vision model.
+
+Plotly's ``fig.to_image`` starts a Kaleido (headless Chromium) renderer for every
+call. The vision model only needs a static picture of the same series, so this
+module draws it straight from the history arrays with Matplotlib's Agg backend
+inside a small pool of warm worker processes, then encodes it as a compressed
+PNG, JPEG or WebP. Rendered images are cached by data fingerprint and chart type.
+"""
+
+import base64
+import io
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+from . import config
+from .llm_cache import data_fingerprint
+
+COLORS = ['#667eea', '#764ba2', '#f093fb', '#f5576c', '#4facfe', '#00f2fe']
+
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+
+# Worker pool and rendered images are shared by every rasterizer in the process
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_image_cache: "OrderedDict[Tuple, str]" = OrderedDict()
+_image_cache_lock = threading.Lock()
+
+
+def _warm_worker():
+    """Pay Matplotlib's import and font-cache cost once per worker process."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    plt.close(plt.figure())
+
+
+def render_image(series: List[Dict], chart_type: str, width: int, height: int,
+                 fmt: str, quality: int) -> bytes:
+    """Draw the comparison chart from plain arrays and return encoded image bytes. Runs in a worker."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import numpy as np
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+    from PIL import Image
+
+    fig, ax = plt.subplots(figsize=(width / 100, height / 100), dpi=100)
+    try:
+        for i, s in enumerate(series):
+            color = COLORS[i % len(COLORS)]
+            if chart_type == "candlestick":
+                x = mdates.date2num(s['dates'])
+                bar_width = float(np.median(np.diff(x))) * 0.7 if len(x) > 1 else 0.7
+                colors = np.where(s['close'] >= s['open'], '#26a69a', '#ef5350')
+                ax.vlines(x, s['low'], s['high'], colors=colors, linewidth=0.6)
+                ax.bar(x, s['close'] - s['open'], bottom=s['open'], width=bar_width, color=colors,
+                       label=s['symbol'])
+                ax.xaxis_date()
+            else:
+                ax.plot(s['dates'], s['close'], color=color, linewidth=1.5, label=s['symbol'])
+        ax.set_title("Financial Data Comparison")
+        ax.set_xlabel("Date")
+        ax.set_ylabel("Price ($)")
+        ax.grid(True, alpha=0.3)
+        if series:
+            ax.legend(loc="upper left")
+        fig.tight_layout()
+        png = io.BytesIO()
+        fig.savefig(png, format="png")
+    finally:
+        plt.close(fig)
+
+    png.seek(0)
+    image = Image.open(png)
+    out = io.BytesIO()
+    if fmt == "png":
+        # An adaptive palette keeps the few chart colors and shrinks the file severalfold
+        image.convert("RGB").quantize(colors=64).save(out, format="PNG", optimize=True)
+    else:
+        image.convert("RGB").save(out, format=fmt.upper(), quality=quality)
+    return out.getvalue()
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the shared pool of warm rendering processes."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver/spawn: never fork a process that is already running Streamlit threads
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker,
+                                        mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+
+def _series(data: Dict, chart_type: str, width: int) -> List[Dict]:
+    """Extract compact float32 arrays, downsampled to the image width, for every symbol with history."""
+    import numpy as np
+
+    from .downsample import downsample_line, downsample_ohlc
+
+    series = []
+    for symbol, symbol_data in data.items():
+        if not symbol_data or symbol_data['history'].empty:
+            continue
+        if chart_type == "candlestick":
+            bars = downsample_ohlc(symbol_data['history'], width)
+            s = {'symbol': symbol, 'dates': bars.index.values}
+            for column in ('Open', 'High', 'Low', 'Close'):
+                s[column.lower()] = bars[column].to_numpy(np.float32)
+        else:
+            closes = downsample_line(symbol_data['history'], width)
+            s = {'symbol': symbol, 'dates': closes.index.values, 'close': closes.to_numpy(np.float32)}
+        series.append(s)
+    return series
+
+
+class ChartRasterizer:
+    """Renders vision-model chart images on a warm process pool and caches the results."""
+
+    def __init__(self, fmt: Optional[str] = None, width: Optional[int] = None, height: Optional[int] = None,
+                 quality: Optional[int] = None, workers: Optional[int] = None, cache_size: int = 64):
+        self.fmt = (fmt or config.CHART_IMAGE_FORMAT).lower()
+        if self.fmt not in MIME_TYPES:
+            raise ValueError(f"Unsupported chart image format: {self.fmt}")
+        self.width = width or config.CHART_IMAGE_WIDTH
+        self.height = height or config.CHART_IMAGE_HEIGHT
+        self.quality = quality or config.CHART_IMAGE_QUALITY
+        self.workers = workers or config.CHART_RENDER_WORKERS
+        self.cache_size = cache_size
+
+    @property
+    def mime_type(self) -> str:
+        return MIME_TYPES[self.fmt]
+
+    def render(self, data: Dict, chart_type: str = "line") -> bytes:
+        """Render ``data`` as an encoded image in a worker process."""
+        future = get_pool(self.workers).submit(render_image, _series(data, chart_type, self.width), chart_type,
+                                               self.width, self.height, self.fmt, self.quality)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            # A crashed worker poisons the pool; start a fresh one next time
+            shutdown_pool()
+            raise
+
+    def render_base64(self, data: Dict, chart_type: str = "line") -> str:
+        """Return the base64-encoded chart image, reusing a cached render of the same data."""
+        key = (data_fingerprint(data), chart_type, self.fmt, self.width, self.height, self.quality)
+        with _image_cache_lock:
+            if key in _image_cache:
+                _image_cache.move_to_end(key)
+                return _image_cache[key]
+        encoded = base64.b64encode(self.render(data, chart_type)).decode()
+        with _image_cache_lock:
+            _image_cache[key] = encoded
+            while len(_image_cache) > self.cache_size:
+                _image_cache.popitem(last=False)
+        return encoded
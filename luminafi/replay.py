@@ -0,0 +1,335 @@
+"""
+Record/replay of upstream responses for offline, deterministic runs.
+
+A ``Cassette`` is one gzip-compressed JSON file holding the responses LuminaFi
+consumes: price histories (column-oriented), the ``ticker.info`` dicts, the
+news and research lists of ``yf.Search`` and chat completions (the streamed
+deltas plus token usage). Recording clients wrap the live clients and capture
+every response; replay clients answer from the cassette alone, with the same
+interface as ``MarketDataClient`` and ``together_client.chat.completions``.
+
+Chat completions are keyed by model, stream flag and the text of the messages;
+images are left out of the key so a re-rendered chart still replays.
+Histories are keyed per symbol, so a bulk download replays from the same
+records as single-symbol requests; a request whose exact range was not
+recorded is served from another recording of the symbol, cut to its start.
+The cassette also keeps the time it was recorded: replays count periods back
+from that day, so histories are trimmed (and the prompts built from them
+read) exactly as when they were recorded.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+
+from .llm_cache import make_chunk
+from .market_data import DEFAULT_TIMEOUT
+from .price_cache import pin_today
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+CASSETTE_VERSION = 1
+
+
+class CassetteMiss(LookupError):
+    """The cassette has no recording for a request."""
+
+    # Reported like a not-found response so the resilience layer does not retry it
+    status_code = 404
+
+
+class Cassette:
+    """Thread-safe store of recorded responses, grouped by kind (history, info, search, chat)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, object]] = {}
+        # Epoch time of the last recorded response
+        self.recorded_at: Optional[float] = None
+        self.dirty = False
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self.load()
+
+    def load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get('version') != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version in {self.path}: {payload.get('version')}")
+        with self._lock:
+            self.entries = payload['entries']
+            self.recorded_at = payload.get('recorded_at')
+            self.dirty = False
+
+    def save(self):
+        """Write the cassette atomically if anything was recorded since the last save."""
+        with self._lock:
+            if not self.dirty:
+                return
+            payload = json.dumps({'version': CASSETTE_VERSION, 'recorded_at': self.recorded_at,
+                                  'entries': self.entries},
+                                 separators=(",", ":"), default=str)
+            self.dirty = False
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp, self.path)
+
+    def get(self, kind: str, key: str):
+        with self._lock:
+            try:
+                return self.entries[kind][key]
+            except KeyError:
+                raise CassetteMiss(f"No recorded {kind} response for {key!r}") from None
+
+    def put(self, kind: str, key: str, value):
+        with self._lock:
+            self.entries.setdefault(kind, {})[key] = value
+            self.recorded_at = time.time()
+            self.dirty = True
+
+    def keys(self, kind: str) -> List[str]:
+        with self._lock:
+            return list(self.entries.get(kind, {}))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self.entries.values())
+
+
+def encode_frame(frame: pd.DataFrame) -> Dict:
+    """Column-oriented JSON form of a history frame; timestamps as UTC epoch milliseconds plus the time zone."""
+    import pandas as pd
+
+    index = pd.DatetimeIndex(frame.index)
+    return {
+        'index': index.as_unit("ms").asi8.tolist(),
+        'tz': str(index.tz) if index.tz is not None else None,
+        'columns': {str(column): frame[column].tolist() for column in frame.columns},
+    }
+
+
+def decode_frame(payload: Dict) -> pd.DataFrame:
+    import pandas as pd
+
+    index = pd.to_datetime(payload['index'], unit="ms")
+    if payload.get('tz'):
+        index = index.tz_localize("UTC").tz_convert(payload['tz'])
+    index = pd.DatetimeIndex(index, name="Date")
+    return pd.DataFrame({column: pd.Series(values, dtype="float64") for column, values in payload['columns'].items()}
+                        ).set_index(index)
+
+
+def history_key(symbol: str, interval: str = "1d", period: Optional[str] = None, start=None, end=None) -> str:
+    key = f"{symbol}|{interval}|{period or ''}|{start or ''}"
+    return f"{key}|{end}" if end else key
+
+
+def chat_key(kwargs: Dict) -> str:
+    """Hash of the model, stream flag and message text of a chat completion request."""
+    messages = []
+    for message in kwargs.get('messages', []):
+        content = message.get('content')
+        if isinstance(content, list):
+            content = [part.get('text') if part.get('type') == 'text' else part.get('type') for part in content]
+        messages.append([message.get('role'), content])
+    raw = json.dumps([kwargs.get('model'), bool(kwargs.get('stream')), messages], separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _usage(usage) -> Optional[Dict]:
+    if usage is None:
+        return None
+    return {'prompt_tokens': getattr(usage, 'prompt_tokens', None),
+            'completion_tokens': getattr(usage, 'completion_tokens', None)}
+
+
+class RecordingMarketClient:
+    """Wrap a live ``MarketDataClient`` and record every response into a cassette."""
+
+    def __init__(self, client, cassette: Cassette):
+        self.client = client
+        self.cassette = cassette
+
+    @property
+    def timeout(self) -> float:
+        return self.client.timeout
+
+    def download(self, symbols: List[str], **kwargs) -> pd.DataFrame:
+        from .market_data import split_download
+
+        frame = self.client.download(symbols, **kwargs)
+        for symbol, hist in split_download(frame, symbols).items():
+            if not hist.empty:
+                key = history_key(symbol, kwargs.get('interval', '1d'), kwargs.get('period'), kwargs.get('start'),
+                                  kwargs.get('end'))
+                self.cassette.put("history", key, encode_frame(hist))
+        return frame
+
+    def history(self, symbol: str, **kwargs) -> pd.DataFrame:
+        hist = self.client.history(symbol, **kwargs)
+        key = history_key(symbol, kwargs.get('interval', '1d'), kwargs.get('period'), kwargs.get('start'),
+                          kwargs.get('end'))
+        self.cassette.put("history", key, encode_frame(hist))
+        return hist
+
+    def info(self, symbol: str) -> Dict:
+        info = self.client.info(symbol)
+        self.cassette.put("info", symbol, info)
+        return info
+
+    def search(self, query: str, **kwargs):
+        result = self.client.search(query, **kwargs)
+        self.cassette.put("search", query, {'news': list(getattr(result, 'news', None) or []),
+                                            'research': list(getattr(result, 'research', None) or [])})
+        return result
+
+    def close(self):
+        self.client.close()
+        self.cassette.save()
+
+
+class ReplayMarketClient:
+    """``MarketDataClient`` stand-in that answers from a cassette only."""
+
+    def __init__(self, cassette: Cassette, timeout: float = DEFAULT_TIMEOUT):
+        self.cassette = cassette
+        self.timeout = timeout
+        if cassette.recorded_at is not None:
+            import pandas as pd
+
+            # Periods end on the recording day, so the bars (and prompts) match the recorded ones
+            pin_today(pd.Timestamp.fromtimestamp(cassette.recorded_at))
+
+    def _history(self, symbol: str, interval: str = "1d", period: Optional[str] = None, start=None,
+                 end=None) -> pd.DataFrame:
+        import pandas as pd
+
+        try:
+            return decode_frame(self.cassette.get("history", history_key(symbol, interval, period, start, end)))
+        except CassetteMiss:
+            prefix = f"{symbol}|{interval}|"
+            candidates = [key for key in self.cassette.keys("history") if key.startswith(prefix)]
+            if not candidates:
+                raise
+        # Longest recording of the symbol, cut to the requested start and end
+        frames = [decode_frame(self.cassette.get("history", key)) for key in candidates]
+        frame = max(frames, key=len)
+        def bound(value):
+            value = pd.Timestamp(value)
+            if frame.index.tz is not None and value.tz is None:
+                value = value.tz_localize(frame.index.tz)
+            return value
+
+        if start is not None:
+            frame = frame[frame.index >= bound(start)]
+        if end is not None:
+            frame = frame[frame.index < bound(end)]
+        return frame
+
+    def download(self, symbols: List[str], **kwargs) -> pd.DataFrame:
+        import pandas as pd
+
+        frames = {}
+        for symbol in symbols:
+            try:
+                frames[symbol] = self._history(symbol, kwargs.get('interval', '1d'), kwargs.get('period'),
+                                               kwargs.get('start'), kwargs.get('end'))
+            except CassetteMiss:
+                continue
+        if not frames:
+            return pd.DataFrame()
+        # Same ticker-grouped layout as yf.download(group_by="ticker")
+        return pd.concat(frames, axis=1)
+
+    def history(self, symbol: str, **kwargs) -> pd.DataFrame:
+        return self._history(symbol, kwargs.get('interval', '1d'), kwargs.get('period'), kwargs.get('start'),
+                             kwargs.get('end'))
+
+    def info(self, symbol: str) -> Dict:
+        return self.cassette.get("info", symbol)
+
+    def search(self, query: str, **kwargs):
+        return SimpleNamespace(**self.cassette.get("search", query))
+
+    def close(self):
+        pass
+
+
+class _Completions:
+    def __init__(self, create):
+        self.create = create
+
+
+class RecordingTogether:
+    """Wrap a live Together client and record chat completions, streamed or not."""
+
+    def __init__(self, client, cassette: Cassette):
+        self.client = client
+        self.cassette = cassette
+        self.chat = SimpleNamespace(completions=_Completions(self._create))
+
+    def _create(self, **kwargs):
+        response = self.client.chat.completions.create(**kwargs)
+        key = chat_key(kwargs)
+        if kwargs.get('stream'):
+            return self._record_stream(key, response)
+        content = response.choices[0].message.content if getattr(response, 'choices', None) else None
+        self.cassette.put("chat", key, {'content': content, 'usage': _usage(getattr(response, 'usage', None))})
+        return response
+
+    def _record_stream(self, key: str, stream) -> Iterator:
+        deltas, usage = [], None
+        for chunk in stream:
+            usage = getattr(chunk, 'usage', None) or usage
+            if getattr(chunk, 'choices', None) and hasattr(chunk.choices[0], 'delta'):
+                delta = getattr(chunk.choices[0].delta, "content", None)
+                if delta:
+                    deltas.append(delta)
+            yield chunk
+        self.cassette.put("chat", key, {'deltas': deltas, 'usage': _usage(usage)})
+
+    def close(self):
+        close = getattr(self.client, 'close', None)
+        if close:
+            close()
+        self.cassette.save()
+
+
+class ReplayTogether:
+    """Together client stand-in that replays recorded chat completions."""
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+        self.chat = SimpleNamespace(completions=_Completions(self._create))
+
+    def _create(self, **kwargs):
+        record = self.cassette.get("chat", chat_key(kwargs))
+        usage = SimpleNamespace(**record['usage']) if record.get('usage') else None
+        if kwargs.get('stream'):
+            return self._replay_stream(record, usage)
+        message = SimpleNamespace(role="assistant", content=record.get('content'))
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")], usage=usage)
+
+    @staticmethod
+    def _replay_stream(record: Dict, usage) -> Iterator:
+        deltas = record.get('deltas')
+        if deltas is None:
+            deltas = [record.get('content') or ""]
+        for delta in deltas:
+            yield make_chunk(delta)
+        if usage is not None:
+            yield SimpleNamespace(choices=[], usage=usage)
+
+    def close(self):
+        pass
@@ -0,0 +1,303 @@
+"""
+Shared resilience layer for upstream calls (Yahoo Finance, Together).
+
+Every upstream gets one process-wide ``Upstream`` guard combining:
+
+- a token-bucket rate limiter, so bursts from many sessions are smoothed
+  instead of getting us throttled;
+- retries with jittered exponential backoff for transient errors;
+- a circuit breaker that fails fast while an upstream keeps failing and lets
+  a single trial call through after a cool-down;
+- optional hedging: when a call is still running after ``hedge_after``
+  seconds, a second identical call is raced against it (only if the rate
+  limiter has a spare token) and the first answer wins.
+
+Call counts, retries, rejections and breaker state are kept per upstream and
+reported by ``snapshot()``; with telemetry enabled they are also exported as
+metrics, along with the duration of every attempt.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from typing import Callable, Dict, Optional
+
+from . import config, telemetry
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class RateLimitedError(RuntimeError):
+    """Raised when no rate limit token becomes available within the allowed wait."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Client errors (HTTP 4xx other than timeout and rate limiting) are not worth retrying."""
+    if isinstance(error, (CircuitOpenError, RateLimitedError)):
+        return False
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if isinstance(status, int) and 400 <= status < 500:
+        return status in (408, 429)
+    return True
+
+
+def backoff_delay(attempt: int, base: float, cap: float, rng=random) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return rng.uniform(0.0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at ``rate`` tokens per second up to ``burst``; rate <= 0 disables it."""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, cost: float = 1.0) -> float:
+        """Take ``cost`` tokens if available and return 0.0, else return the seconds until they will be."""
+        if self.rate <= 0:
+            return 0.0
+        cost = min(cost, self.burst)
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= cost:
+                self.tokens -= cost
+                return 0.0
+            return (cost - self.tokens) / self.rate
+
+    def acquire(self, cost: float = 1.0, timeout: Optional[float] = None) -> float:
+        """Block until ``cost`` tokens are taken and return the seconds waited."""
+        waited = 0.0
+        while True:
+            wait_for = self.try_acquire(cost)
+            if wait_for == 0.0:
+                return waited
+            if timeout is not None and waited + wait_for > timeout:
+                raise RateLimitedError(f"No rate limit token within {timeout:.1f}s")
+            self.sleep(wait_for)
+            waited += wait_for
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures; half-opens for one trial call after ``reset_timeout``."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opens = 0
+        self.opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go through now; in half-open state only one trial call at a time."""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+                self._trial = False
+            if self.state == HALF_OPEN:
+                if self._trial:
+                    return False
+                self._trial = True
+            return True
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets a trial call through."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self.clock() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opens += 1
+                self.state = OPEN
+                self.opened_at = self.clock()
+
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_lock = threading.Lock()
+
+
+def get_hedge_executor() -> ThreadPoolExecutor:
+    """Return the pool hedged calls run on, separate from the fetch pools that wait on them."""
+    global _hedge_executor
+    with _hedge_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=config.HTTP_POOL_SIZE,
+                                                 thread_name_prefix="luminafi-hedge")
+        return _hedge_executor
+
+
+class Upstream:
+    """Rate limiter, retry policy, circuit breaker and counters for one upstream service."""
+
+    def __init__(self, name: str, rate: float = 0.0, burst: float = 1, retries: int = 2,
+                 base_delay: float = 0.5, max_delay: float = 4.0, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0, max_wait: Optional[float] = 10.0,
+                 hedge_after: Optional[float] = None, sleep: Callable[[float], None] = time.sleep,
+                 rng=random):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst, sleep=sleep)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.retries = max(0, retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self.hedge_after = hedge_after or None
+        self.sleep = sleep
+        self.rng = rng
+        self.counters = {'calls': 0, 'successes': 0, 'failures': 0, 'errors': 0, 'retries': 0,
+                         'rejected': 0, 'throttled': 0, 'throttled_seconds': 0.0, 'hedges': 0, 'hedge_wins': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str, amount=1):
+        with self._lock:
+            self.counters[key] += amount
+
+    def _observe(self, outcome: str, started: float):
+        if telemetry.enabled():
+            telemetry.UPSTREAM_CALLS.inc(upstream=self.name, outcome=outcome)
+            telemetry.UPSTREAM_SECONDS.observe(time.perf_counter() - started, upstream=self.name)
+            telemetry.CIRCUIT_OPEN.set(1 if self.breaker.state == OPEN else 0, upstream=self.name)
+
+    def _hedged(self, func, args, kwargs):
+        """Run ``func`` and, if it is still running after ``hedge_after``, race a second copy against it."""
+        executor = get_hedge_executor()
+        primary = executor.submit(func, *args, **kwargs)
+        try:
+            return primary.result(timeout=self.hedge_after)
+        except FutureTimeoutError:
+            pass
+        # Hedging adds load, so only hedge when the rate limiter has a spare token
+        if self.bucket.try_acquire() > 0:
+            return primary.result()
+        self._count('hedges')
+        backup = executor.submit(func, *args, **kwargs)
+        done, _ = wait([primary, backup], return_when=FIRST_COMPLETED)
+        first = done.pop()
+        if first.exception() is not None:
+            first = backup if first is primary else primary
+        if first is backup and backup.exception() is None:
+            self._count('hedge_wins')
+        return first.result()
+
+    def call(self, func: Callable, *args, hedge: bool = False, cost: float = 1.0, **kwargs):
+        """
+        Call ``func(*args, **kwargs)`` under the rate limit, retry policy and breaker.
+
+        Raises ``CircuitOpenError`` while the breaker is open, ``RateLimitedError``
+        if no token frees up in time, or the last error once retries are spent.
+        """
+        self._count('calls')
+        last_error: Optional[Exception] = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count('retries')
+                telemetry.UPSTREAM_RETRIES.inc(upstream=self.name)
+                self.sleep(backoff_delay(attempt - 1, self.base_delay, self.max_delay, self.rng))
+            waited = self.bucket.acquire(cost, timeout=self.max_wait)
+            if waited:
+                self._count('throttled')
+                self._count('throttled_seconds', waited)
+            if not self.breaker.allow():
+                self._count('rejected')
+                telemetry.UPSTREAM_CALLS.inc(upstream=self.name, outcome="rejected")
+                raise CircuitOpenError(f"{self.name} is unavailable, retrying in "
+                                       f"{self.breaker.retry_after():.0f}s") from last_error
+            started = time.perf_counter()
+            try:
+                if hedge and self.hedge_after:
+                    result = self._hedged(func, args, kwargs)
+                else:
+                    result = func(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    # The upstream answered, it just refused this request
+                    self.breaker.record_success()
+                    self._count('errors')
+                    self._observe("error", started)
+                    raise
+                self.breaker.record_failure()
+                self._count('failures')
+                self._observe("failure", started)
+                last_error = e
+                continue
+            self.breaker.record_success()
+            self._count('successes')
+            self._observe("success", started)
+            return result
+        raise last_error
+
+    def metrics(self) -> Dict:
+        """Counters plus the current breaker state."""
+        with self._lock:
+            counters = dict(self.counters)
+        counters.update(state=self.breaker.state, consecutive_failures=self.breaker.failures,
+                        opens=self.breaker.opens, retry_after=round(self.breaker.retry_after(), 1))
+        return counters
+
+
+_upstreams: Dict[str, Upstream] = {}
+_upstreams_lock = threading.Lock()
+
+
+def _settings(name: str) -> Dict:
+    settings = dict(retries=config.RETRY_ATTEMPTS, base_delay=config.RETRY_BASE_DELAY_SECONDS,
+                    max_delay=config.RETRY_MAX_DELAY_SECONDS, failure_threshold=config.BREAKER_FAILURE_THRESHOLD,
+                    reset_timeout=config.BREAKER_RESET_SECONDS, max_wait=config.RATE_LIMIT_MAX_WAIT_SECONDS)
+    if name == "yahoo":
+        settings.update(rate=config.YAHOO_RATE_PER_SECOND, burst=config.YAHOO_BURST,
+                        hedge_after=config.HEDGE_INFO_AFTER_SECONDS)
+    elif name == "together":
+        settings.update(rate=config.TOGETHER_RATE_PER_SECOND, burst=config.TOGETHER_BURST)
+    return settings
+
+
+def get_upstream(name: str) -> Upstream:
+    """Return the process-wide guard for upstream ``name``, created from the config on first use."""
+    with _upstreams_lock:
+        upstream = _upstreams.get(name)
+        if upstream is None:
+            upstream = _upstreams[name] = Upstream(name, **_settings(name))
+        return upstream
+
+
+def snapshot() -> Dict[str, Dict]:
+    """Metrics of every upstream guard created so far."""
+    with _upstreams_lock:
+        upstreams = list(_upstreams.values())
+    return {upstream.name: upstream.metrics() for upstream in upstreams}
@@ -0,0 +1,131 @@
+"""
+Process-wide FinanceWorkflow shared by every Streamlit session and thread.
+
+Building a workflow reads the environment, opens a Together client and an HTTP
+session for yfinance, so it is created once per process (lazily, on first use)
+and reused. The shared instance keeps its connections alive and pooled. After
+too many consecutive upstream failures it is replaced on the next request,
+which recovers from poisoned connections or expired credentials. Sessions
+still using the old instance finish with it; its connections are closed once
+the last of them lets go.
+
+``LUMINAFI_STANDIN_URL`` points both clients at a local stand-in server and
+``LUMINAFI_CASSETTE`` records live responses to, or replays them from, a
+cassette file, so the app, the CLI and the benchmarks can run offline.
+"""
+
+import atexit
+import os
+import threading
+import time
+import weakref
+from typing import Dict, Optional
+
+from . import config, live, resilience, singleflight, telemetry
+from .finance_workflow import FinanceWorkflow
+from .market_data import MarketDataClient, make_session
+from .price_store import get_price_store
+
+_lock = threading.Lock()
+_workflow: Optional[FinanceWorkflow] = None
+_rebuilds = 0
+
+
+def _make_together_client(base_url: Optional[str] = None):
+    """Create a Together client whose HTTP connection pool fits the expected concurrency."""
+    from together import Together
+
+    api_key = os.getenv("TOGETHER_API_KEY")
+    if not api_key:
+        if base_url is None:
+            raise ValueError("TOGETHER_API_KEY not found in environment. Please set it in your .env file.")
+        api_key = "standin"  # the stand-in server does not check keys
+    kwargs = {'base_url': base_url} if base_url else {}
+    try:
+        import httpx
+        limits = httpx.Limits(max_connections=config.HTTP_POOL_SIZE,
+                              max_keepalive_connections=config.HTTP_POOL_SIZE)
+        return Together(api_key=api_key, http_client=httpx.Client(limits=limits), **kwargs)
+    except (ImportError, TypeError):
+        # Older SDKs manage their own connections
+        return Together(api_key=api_key, **kwargs)
+
+
+def _build() -> FinanceWorkflow:
+    if config.STANDIN_URL:
+        from .standin import StandInMarketClient
+
+        market = StandInMarketClient(config.STANDIN_URL)
+        together_client = _make_together_client(base_url=config.STANDIN_URL.rstrip("/") + "/v1")
+        return FinanceWorkflow(together_client=together_client, market=market)
+    if config.CASSETTE:
+        from .replay import Cassette, RecordingMarketClient, RecordingTogether, ReplayMarketClient, ReplayTogether
+
+        cassette = Cassette(config.CASSETTE)
+        if config.CASSETTE_MODE == "record":
+            atexit.register(cassette.save)
+            market = RecordingMarketClient(MarketDataClient(session=make_session(config.HTTP_POOL_SIZE)), cassette)
+            return FinanceWorkflow(together_client=RecordingTogether(_make_together_client(), cassette),
+                                   market=market)
+        return FinanceWorkflow(together_client=ReplayTogether(cassette), market=ReplayMarketClient(cassette))
+    market = MarketDataClient(session=make_session(config.HTTP_POOL_SIZE))
+    return FinanceWorkflow(together_client=_make_together_client(), market=market)
+
+
+def _unhealthy(workflow: FinanceWorkflow) -> bool:
+    return (workflow.consecutive_failures >= config.WORKFLOW_MAX_FAILURES
+            and time.time() - workflow.created_at >= config.WORKFLOW_MIN_REBUILD_SECONDS)
+
+
+def get_workflow() -> FinanceWorkflow:
+    """Return the shared workflow, creating it on first use and rebuilding it when unhealthy."""
+    global _workflow, _rebuilds
+    with _lock:
+        if _workflow is not None and _unhealthy(_workflow):
+            print(f"Rebuilding FinanceWorkflow after {_workflow.consecutive_failures} consecutive failures")
+            _retire(_workflow)
+            _workflow = None
+            _rebuilds += 1
+        if _workflow is None:
+            if telemetry.enabled():
+                telemetry.start_exporters()
+            _workflow = _build()
+        return _workflow
+
+
+def _close(market: MarketDataClient, together_client):
+    try:
+        FinanceWorkflow.close_clients(market, together_client)
+    except Exception as e:
+        print(f"Error closing FinanceWorkflow: {str(e)}")
+
+
+def _retire(workflow: FinanceWorkflow):
+    """Close ``workflow``'s connections once nothing uses it any more, not under in-flight requests."""
+    weakref.finalize(workflow, _close, workflow.market, workflow.together_client)
+
+
+def reset():
+    """Drop the shared workflow; the next ``get_workflow()`` builds a fresh one."""
+    global _workflow
+    with _lock:
+        if _workflow is not None:
+            _retire(_workflow)
+            _workflow = None
+
+
+def health_check() -> Dict:
+    """Report the lifecycle state of the shared workflow, the upstream guards, request coalescing and the price store."""
+    with _lock:
+        workflow = _workflow
+        return {
+            'created': workflow is not None,
+            'healthy': workflow is not None and workflow.consecutive_failures < config.WORKFLOW_MAX_FAILURES,
+            'consecutive_failures': workflow.consecutive_failures if workflow else 0,
+            'age_seconds': time.time() - workflow.created_at if workflow else 0.0,
+            'rebuilds': _rebuilds,
+            'upstreams': resilience.snapshot(),
+            'single_flight': singleflight.snapshot(),
+            'price_store': get_price_store().report(),
+            'live': live.snapshot(),
+        }
@@ -0,0 +1,228 @@
+"""
+Universe screening.
+
+The comparison workflow looks at a handful of symbols at a time. A screen
+takes a whole universe, such as an index constituent list, an uploaded CSV or
+the bundled ticker index. It fetches the daily histories through the price
+cache in bulk chunks that run in parallel, and ranks every symbol in one
+vectorized pass over the aligned close matrix: returns over several horizons,
+12-1 month momentum, volatility, Sharpe ratio and maximum drawdown. Only the
+top symbols go on to the regular analysis pipeline, with the ranking as
+context for the model.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from . import config, telemetry
+from .metrics import TRADING_DAYS
+from .symbols import DEFAULT_INDEX_PATH
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+# Ranking columns: label and whether higher values rank first
+RANK_COLUMNS = {
+    'momentum': ("12-1 month momentum", True),
+    'return_1m': ("1-month return", True),
+    'return_3m': ("3-month return", True),
+    'total_return': ("Total return", True),
+    'sharpe': ("Sharpe ratio", True),
+    'ann_volatility': ("Annualized volatility", False),
+    'max_drawdown': ("Maximum drawdown", True),  # closest to zero first
+}
+
+# Trading days behind the horizons; momentum skips the most recent month
+MONTH = 21
+QUARTER = 63
+
+# Symbols with fewer daily closes than this are left out of the ranking
+MIN_BARS = 20
+
+_SYMBOL_COLUMNS = ("symbol", "symbols", "ticker", "tickers", "code")
+_TICKER_RE = re.compile(r'^\^?[A-Z0-9][A-Z0-9.\-=]{0,9}$')
+_DAY_NS = 86_400 * 10**9
+
+
+def parse_universe(text: str) -> List[str]:
+    """
+    Symbols from a CSV export or a plain list, in order and without repeats.
+
+    A CSV with a Symbol or Ticker column (any case) contributes that column;
+    otherwise every upper-case, ticker-shaped cell or word is taken, so
+    comma-, space- and newline-separated lists all work.
+    """
+    rows = [row for row in csv.reader(io.StringIO(text)) if row and not row[0].lstrip().startswith("#")]
+    header = [cell.strip().lower() for cell in rows[0]] if rows else []
+    column = next((i for i, name in enumerate(header) if name in _SYMBOL_COLUMNS), None)
+    if column is not None:
+        cells = [row[column].strip().lstrip("$").upper() for row in rows[1:] if len(row) > column]
+    else:
+        cells = [word.lstrip("$") for row in rows for cell in row for word in cell.split()]
+    return list(dict.fromkeys(cell for cell in cells if _TICKER_RE.match(cell)))
+
+
+def known_universe(path: str = DEFAULT_INDEX_PATH) -> List[str]:
+    """The tickers of the bundled symbol index."""
+    with open(path, encoding="utf-8") as handle:
+        return parse_universe("\n".join(line.partition("\t")[0] for line in handle))
+
+
+def fetch_universe(cache, client, symbols: List[str], period: str = "1y", chunk_size: Optional[int] = None,
+                   max_workers: Optional[int] = None,
+                   on_chunk: Optional[Callable[[int, int], None]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Daily histories of ``symbols`` through the price cache, in bulk chunks fetched in parallel.
+
+    ``on_chunk(done, total)`` is called on the calling thread after each chunk.
+    Symbols whose history could not be fetched are left out.
+    """
+    chunk_size = chunk_size or config.SCREENER_CHUNK_SIZE
+    chunks = [symbols[i:i + chunk_size] for i in range(0, len(symbols), chunk_size)]
+    histories = {}
+    done = 0
+    with ThreadPoolExecutor(max_workers=max_workers or config.SCREENER_WORKERS,
+                            thread_name_prefix="luminafi-screen") as executor:
+        futures = {executor.submit(cache.fetch, client, chunk, period): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                histories.update(future.result())
+            except Exception as e:
+                print(f"Error fetching histories for a screen chunk of {len(chunk)} symbols: {str(e)}")
+            done += len(chunk)
+            if on_chunk is not None:
+                on_chunk(done, len(symbols))
+    return histories
+
+
+def order(table: pd.DataFrame, sort_by: str = "momentum") -> pd.DataFrame:
+    """``table`` sorted best first by ``sort_by``, with a 1-based ``rank`` column."""
+    higher_first = RANK_COLUMNS[sort_by][1]
+    table = table.drop(columns="rank", errors="ignore").sort_values(sort_by, ascending=not higher_first,
+                                                                    na_position="last", kind="stable")
+    table.insert(0, "rank", range(1, len(table) + 1))
+    return table
+
+
+def close_matrix(histories: Dict[str, pd.DataFrame]) -> Tuple[np.ndarray, List[str]]:
+    """
+    Daily closes of every history as one float64 day x symbol matrix (NaN where a symbol has no bar).
+
+    Bars are dated by calendar day so exchanges line up; of several bars on a
+    day the last one counts.
+    """
+    import numpy as np
+    import pandas as pd
+
+    symbols, days, closes = [], [], []
+    for symbol, hist in histories.items():
+        if hist is None or hist.empty or 'Close' not in hist.columns:
+            continue
+        index = pd.DatetimeIndex(hist.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        stamps = index.as_unit("ns").asi8
+        day = stamps - stamps % _DAY_NS  # midnight of each bar, without pandas' per-index frequency inference
+        last_of_day = np.r_[day[1:] != day[:-1], True]
+        symbols.append(symbol)
+        days.append(day[last_of_day])
+        closes.append(hist['Close'].to_numpy(dtype=np.float64)[last_of_day])
+    if not symbols:
+        return np.empty((0, 0)), []
+    calendar = np.unique(np.concatenate(days))
+    matrix = np.full((len(calendar), len(symbols)), np.nan)
+    for column, (day, close) in enumerate(zip(days, closes)):
+        matrix[np.searchsorted(calendar, day), column] = close
+    return matrix, symbols
+
+
+def rank(histories: Dict[str, pd.DataFrame], sort_by: str = "momentum",
+         risk_free_rate: Optional[float] = None) -> pd.DataFrame:
+    """Ranking metrics for every history with at least ``MIN_BARS`` closes, one row per symbol, best first."""
+    import numpy as np
+    import pandas as pd
+
+    rf = config.RISK_FREE_RATE if risk_free_rate is None else risk_free_rate
+    closes, symbols = close_matrix(histories)
+    valid = ~np.isnan(closes)
+    keep = valid.sum(axis=0) >= MIN_BARS
+    closes, valid, symbols = closes[:, keep], valid[:, keep], [s for s, k in zip(symbols, keep) if k]
+    if not symbols:
+        return pd.DataFrame(columns=["rank", "last_price", "bars", *RANK_COLUMNS]).rename_axis("symbol")
+
+    # Forward-fill each column by carrying the row of its latest bar; rows before a symbol's first bar stay NaN
+    rows = np.maximum.accumulate(np.where(valid, np.arange(len(closes))[:, None], 0), axis=0)
+    filled = np.take_along_axis(closes, rows, axis=0)
+    first = closes[valid.argmax(axis=0), np.arange(len(symbols))]
+    last = filled[-1]
+    # Returns between a symbol's own consecutive bars, even across other symbols' extra trading days
+    returns = np.where(valid[1:], filled[1:] / filled[:-1] - 1, np.nan)
+
+    def back(days: int) -> np.ndarray:
+        # Close ``days`` trading days before the last one; a shorter history starts from its first close
+        close = filled[max(len(filled) - 1 - days, 0)]
+        return np.where(np.isnan(close), first, close)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ann_vol = np.nanstd(returns, axis=0, ddof=1) * np.sqrt(TRADING_DAYS)
+        table = pd.DataFrame({
+            'last_price': last,
+            'bars': valid.sum(axis=0),
+            'momentum': back(MONTH) / back(TRADING_DAYS) - 1,
+            'return_1m': last / back(MONTH) - 1,
+            'return_3m': last / back(QUARTER) - 1,
+            'total_return': last / first - 1,
+            'sharpe': (np.nanmean(returns, axis=0) * TRADING_DAYS - rf) / np.where(ann_vol > 0, ann_vol, np.nan),
+            'ann_volatility': ann_vol,
+            'max_drawdown': np.nanmin(filled / np.fmax.accumulate(filled, axis=0) - 1, axis=0),
+        }, index=pd.Index(symbols, name="symbol"))
+    return order(table, sort_by)
+
+
+@dataclass
+class ScreenResult:
+    """A ranked universe: the metric table (best first) and the symbols without usable history."""
+    table: pd.DataFrame
+    universe: List[str]
+    missing: List[str]
+    period: str
+    sort_by: str
+    seconds: float
+
+    def top(self, n: int) -> List[str]:
+        return list(self.table.index[:n])
+
+
+def screen(workflow, universe: List[str], period: str = "1y", sort_by: str = "momentum",
+           on_chunk: Optional[Callable[[int, int], None]] = None, chunk_size: Optional[int] = None,
+           max_workers: Optional[int] = None) -> ScreenResult:
+    """Fetch and rank ``universe`` with the workflow's market client and price cache."""
+    started = time.perf_counter()
+    with telemetry.span("screen", universe=len(universe), period=period, sort_by=sort_by) as span:
+        histories = fetch_universe(workflow.price_cache, workflow.market, universe, period, chunk_size,
+                                   max_workers, on_chunk)
+        table = rank(histories, sort_by)
+        span.set(ranked=len(table))
+    return ScreenResult(table=table, universe=list(universe),
+                        missing=[symbol for symbol in universe if symbol not in table.index],
+                        period=period, sort_by=sort_by, seconds=time.perf_counter() - started)
+
+
+def screen_query(result: ScreenResult, n: int) -> str:
+    """Analysis request for the top ``n`` symbols of a screen, with their place in the universe."""
+    label = RANK_COLUMNS[result.sort_by][0]
+    leaders = ", ".join(f"{symbol} ({row[result.sort_by]:+.1%})" if result.sort_by != 'sharpe'
+                        else f"{symbol} ({row[result.sort_by]:.2f})"
+                        for symbol, row in result.table.head(n).iterrows())
+    return (f"These are the top {n} of {len(result.table)} tickers screened over {result.period}, "
+            f"ranked by {label.lower()}: {leaders}. Explain what drives their lead, "
+            f"how they compare with each other and which risks could reverse it.")
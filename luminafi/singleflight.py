@@ -0,0 +1,306 @@
+"""
+Single-flight deduplication of identical upstream work.
+
+When a ticker is in the news, many sessions ask for the same histories,
+fundamentals, headlines and analyses at once. A ``SingleFlight`` lets the
+first caller for a key (the leader) do the work while concurrent callers with
+the same key wait for it and receive the same result, or the same error.
+Streamed LLM answers are shared through a ``SharedStream``, so every waiting
+session renders the tokens as they arrive.
+
+Across worker processes the leader also holds an advisory file lock for its
+key and, once it has the lock, re-checks the shared cache (``recheck``): a
+leader in another process that just finished has already stored the result,
+so at most one process calls the upstream. Every key has its own lock file,
+which its holder removes on release, so unrelated keys never wait on each
+other; if the lock is not free within ``LUMINAFI_SINGLE_FLIGHT_WAIT_SECONDS``
+the caller goes ahead on its own.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from . import config, telemetry
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalesce within the process only
+    fcntl = None
+
+_MISSING = object()
+
+
+class FileLock:
+    """
+    Advisory exclusive lock on a file, given up after ``timeout`` seconds of waiting.
+
+    The holder deletes the file on release. A waiter that then gets the lock
+    on the deleted file notices the path now names another file (or none) and
+    starts over, so two processes never both hold the lock.
+    """
+
+    def __init__(self, path: str, timeout: float):
+        self.path = path
+        self.timeout = timeout
+        self._handle = None
+
+    def acquire(self) -> bool:
+        """Take the lock; False if it could not be taken in time (the caller proceeds unlocked)."""
+        if fcntl is None:
+            return False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        deadline = time.monotonic() + self.timeout
+        handle = open(self.path, "a")
+        while True:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if self._current(handle):
+                    self._handle = handle
+                    return True
+                handle.close()  # locked a file the previous holder already deleted
+                handle = open(self.path, "a")
+                continue
+            except BlockingIOError:
+                pass
+            if time.monotonic() >= deadline:
+                handle.close()
+                print(f"Gave up waiting for {self.path} after {self.timeout:.0f}s")
+                return False
+            time.sleep(0.05)
+
+    def _current(self, handle) -> bool:
+        try:
+            return os.stat(self.path).st_ino == os.fstat(handle.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+    def release(self):
+        handle, self._handle = self._handle, None
+        if handle is not None:
+            try:
+                os.unlink(self.path)  # still locked, so no one else can hold this file
+            except OSError:
+                pass
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+class SharedStream:
+    """
+    One response stream read by any number of readers, each from the start.
+
+    Items are buffered as they arrive. Whichever reader is furthest ahead pulls
+    the next item from the source, so the stream keeps flowing as long as any
+    session is reading it; once every reader has left early the source is closed.
+    """
+
+    def __init__(self, source: Iterator, on_close: Optional[Callable[[], None]] = None):
+        self._source = iter(source)
+        self._items = []
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._readers = 0
+        self._lock = threading.Lock()
+        self._pull_lock = threading.Lock()
+        self._on_close = on_close
+
+    def _finish(self, error: Optional[BaseException] = None):
+        with self._lock:
+            if self._done:
+                return
+            self._done = True
+            self._error = error
+        if self._on_close:
+            self._on_close()
+
+    def _pull(self, index: int):
+        with self._pull_lock:
+            with self._lock:
+                if index < len(self._items) or self._done:
+                    return  # another reader pulled meanwhile
+            try:
+                item = next(self._source)
+            except StopIteration:
+                self._finish()
+                return
+            except Exception as e:
+                self._finish(e)
+                return
+            with self._lock:
+                self._items.append(item)
+
+    def reader(self) -> Iterator:
+        """A new iterator over the whole stream."""
+        index = 0
+        with self._lock:
+            self._readers += 1
+        try:
+            while True:
+                with self._lock:
+                    if index < len(self._items):
+                        item = self._items[index]
+                    elif self._done:
+                        if self._error is not None:
+                            raise self._error
+                        return
+                    else:
+                        item = _MISSING
+                if item is _MISSING:
+                    self._pull(index)
+                    continue
+                index += 1
+                yield item
+        finally:
+            with self._lock:
+                self._readers -= 1
+                abandoned = self._readers == 0 and not self._done
+            if abandoned:
+                close = getattr(self._source, 'close', None)
+                if close:
+                    close()
+                self._finish(RuntimeError("Shared stream closed by all of its readers"))
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one, within the process and optionally across processes."""
+
+    def __init__(self, name: str, cross_process: Optional[bool] = None, lock_dir: Optional[str] = None,
+                 wait: Optional[float] = None):
+        self.name = name
+        self.cross_process = config.SINGLE_FLIGHT_CROSS_PROCESS if cross_process is None else cross_process
+        self.lock_dir = lock_dir or os.path.join(config.CACHE_DIR, "locks")
+        self.wait = config.SINGLE_FLIGHT_WAIT_SECONDS if wait is None else wait
+        self.counters = {'leaders': 0, 'shared': 0, 'rechecked': 0}
+        self._calls: Dict[Any, Future] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, role: str):
+        with self._lock:
+            self.counters[role] += 1
+        telemetry.SINGLE_FLIGHT.inc(flight=self.name, role=role)
+
+    def _join(self, key) -> Tuple[Future, bool]:
+        """The shared future for ``key`` and whether the caller leads (created it)."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def _forget(self, key):
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def _file_lock(self, key) -> Optional[FileLock]:
+        if not self.cross_process or fcntl is None:
+            return None
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return FileLock(os.path.join(self.lock_dir, f"{self.name}-{digest}.lock"), self.wait)
+
+    def do(self, key, func: Callable, *args, recheck: Optional[Callable[[], Any]] = None, **kwargs):
+        """
+        Return ``func(*args, **kwargs)``, sharing one call among concurrent callers with the same ``key``.
+
+        ``recheck()`` looks the result up in the cache shared between processes
+        (None on a miss); it runs under the cross-process lock before ``func``.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            self._count('shared')
+            return future.result()
+        lock = self._file_lock(key) if recheck is not None else None
+        try:
+            if lock is not None:
+                lock.acquire()
+            result = recheck() if recheck is not None else None
+            if result is None:
+                self._count('leaders')
+                result = func(*args, **kwargs)
+            else:
+                self._count('rechecked')
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            if lock is not None:
+                lock.release()
+            self._forget(key)
+        future.set_result(result)
+        return result
+
+    def stream(self, key, open_stream: Callable[..., Iterator], *args,
+               recheck: Optional[Callable[[], Optional[Iterator]]] = None, **kwargs) -> Iterator:
+        """
+        Like ``do`` for streamed responses: concurrent callers each get a reader of one shared stream.
+
+        The key stays claimed (and the cross-process lock held) until the stream
+        has been read to the end, so late arrivals join the running stream.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            self._count('shared')
+            return future.result().reader()
+        lock = self._file_lock(key) if recheck is not None else None
+        try:
+            if lock is not None:
+                lock.acquire()
+            source = recheck() if recheck is not None else None
+            if source is None:
+                self._count('leaders')
+                source = open_stream(*args, **kwargs)
+            else:
+                self._count('rechecked')
+        except BaseException as e:
+            if lock is not None:
+                lock.release()
+            self._forget(key)
+            future.set_exception(e)
+            raise
+
+        def on_close():
+            self._forget(key)
+            if lock is not None:
+                lock.release()
+
+        shared = SharedStream(source, on_close)
+        future.set_result(shared)
+        return shared.reader()
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+            counters['in_flight'] = len(self._calls)
+        return counters
+
+
+_flights: Dict[str, SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+
+def get_flight(name: str) -> SingleFlight:
+    """Return the process-wide single-flight group ``name``, shared by every session and workflow."""
+    with _flights_lock:
+        flight = _flights.get(name)
+        if flight is None:
+            flight = _flights[name] = SingleFlight(name)
+        return flight
+
+
+def snapshot() -> Dict[str, Dict]:
+    """Counters of every single-flight group created so far."""
+    with _flights_lock:
+        flights = list(_flights.values())
+    return {flight.name: flight.metrics() for flight in flights}
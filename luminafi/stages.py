@@ -0,0 +1,270 @@
+"""
+Asyncio stage scheduler for the analysis workflow.
+
+A workflow run is declared as a small DAG of named stages. Each stage starts as
+soon as all of its dependencies have finished, so independent work (news
+lookups, the price fetch, prompt building, image rendering) overlaps instead of
+running one step after another. Blocking stage functions run on a thread pool;
+coroutine functions run on the event loop. A stage receives the results of its
+dependencies as positional arguments, in the order they were declared.
+
+A failed stage does not stop the run: stages that depend on it are skipped and
+everything else completes. Every stage is timed relative to the start of the
+run, which makes the critical path visible.
+
+A stage declared with a ``key`` (built from its real inputs) can be memoized
+across runs in a ``StageMemo``: a later run whose stage has the same key reuses
+the earlier result without waiting for the stage's dependencies, so changing
+one parameter only recomputes the stages that depend on it.
+
+Callbacks wrapped with ``on_loop`` can be handed to blocking stage functions
+to report progress (e.g. history chunks as they download); their calls are
+delivered on the event loop thread, where ``on_complete`` callbacks also run.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+_MISSING = object()
+
+# Event loop of the run a stage belongs to; copied into worker threads with the task's context
+_run_loop: contextvars.ContextVar = contextvars.ContextVar("luminafi_stage_loop", default=None)
+
+
+def on_loop(callback: Callable[..., None]) -> Callable[..., None]:
+    """Wrap ``callback`` so that calls from stage worker threads run on the event loop thread of their run."""
+
+    def invoke(*args):
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"Error in stage progress callback: {str(e)}")
+
+    def call(*args):
+        loop = _run_loop.get()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is None or loop is running or loop.is_closed():
+            invoke(*args)
+        else:
+            loop.call_soon_threadsafe(invoke, *args)
+
+    return call
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable
+    deps: Tuple[str, ...] = ()
+    # Memo key built from the stage's real inputs; None means the stage always runs
+    key: Optional[Hashable] = None
+    # Whether a result may be reused; by default anything but None is kept
+    keep: Optional[Callable[[Any], bool]] = None
+
+
+class StageMemo:
+    """Results of keyed stages from earlier runs: the most recent ``per_stage`` keys of each stage, for ``ttl`` seconds."""
+
+    def __init__(self, per_stage: int = 4, ttl: float = 900.0):
+        self.per_stage = per_stage
+        self.ttl = ttl
+        self._entries: Dict[str, "OrderedDict[Hashable, Tuple[float, Any]]"] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, key: Hashable, default=None):
+        with self._lock:
+            entries = self._entries.get(name)
+            entry = entries.get(key) if entries else None
+            if entry is None:
+                return default
+            if time.time() - entry[0] >= self.ttl:
+                del entries[key]
+                return default
+            entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, name: str, key: Hashable, value):
+        with self._lock:
+            entries = self._entries.setdefault(name, OrderedDict())
+            entries[key] = (time.time(), value)
+            entries.move_to_end(key)
+            while len(entries) > self.per_stage:
+                entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+@dataclass
+class StageTiming:
+    name: str
+    start: float
+    end: float
+    status: str
+    deps: Tuple[str, ...] = ()
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class StageRun:
+    """Results, errors and timings of one run of a ``StageGraph``."""
+    results: Dict[str, Any] = field(default_factory=dict)
+    errors: Dict[str, BaseException] = field(default_factory=dict)
+    timings: Dict[str, StageTiming] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    def ok(self, name: str) -> bool:
+        return name in self.results
+
+    def critical_path(self) -> List[str]:
+        """Stages on the longest chain of dependencies, ending with the stage that finished last."""
+        if not self.timings:
+            return []
+        path = [max(self.timings.values(), key=lambda t: t.end).name]
+        while True:
+            deps = [self.timings[d] for d in self.timings[path[-1]].deps if d in self.timings]
+            if not deps:
+                return path[::-1]
+            path.append(max(deps, key=lambda t: t.end).name)
+
+    def timing_table(self) -> List[Dict]:
+        """One row per stage, in start order, for display or logging."""
+        critical = set(self.critical_path())
+        return [
+            {
+                'stage': t.name,
+                'start_s': round(t.start, 3),
+                'duration_s': round(t.seconds, 3),
+                'status': t.status,
+                'critical': t.name in critical,
+            }
+            for t in sorted(self.timings.values(), key=lambda t: (t.start, t.end))
+        ]
+
+
+class StageGraph:
+    """A set of named stages and the dependencies between them."""
+
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+
+    def __len__(self) -> int:
+        return len(self.stages)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.stages
+
+    def add(self, name: str, func: Callable, deps: Tuple[str, ...] = (), key: Optional[Hashable] = None,
+            keep: Optional[Callable[[Any], bool]] = None) -> "StageGraph":
+        """
+        Add a stage; ``func`` is called with the results of ``deps`` once they have all finished.
+
+        With a ``key``, the result is memoized under it when the graph runs with
+        a ``StageMemo``, unless ``keep(result)`` is false.
+        """
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        self.stages[name] = Stage(name, func, tuple(deps), key, keep)
+        return self
+
+    def order(self) -> List[str]:
+        """Stage names in dependency order; raises ValueError on unknown dependencies or cycles."""
+        order: List[str] = []
+        state: Dict[str, int] = {}
+
+        def visit(name, chain):
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"Stage cycle: {' -> '.join(chain + [name])}")
+            state[name] = 1
+            for dep in self.stages[name].deps:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage {name} depends on unknown stage {dep}")
+                visit(dep, chain + [name])
+            state[name] = 2
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    async def run(self, on_complete: Optional[Callable[[str, StageRun], None]] = None,
+                  executor: Optional[Executor] = None, memo: Optional[StageMemo] = None) -> StageRun:
+        """
+        Run every stage as early as its dependencies allow.
+
+        ``on_complete(name, run)`` is called on the event loop thread after each
+        stage finishes, fails or is skipped, e.g. to advance a progress bar.
+        Keyed stages found in ``memo`` are not run; their status is 'cached'.
+        """
+        loop = asyncio.get_running_loop()
+        token = _run_loop.set(loop)
+        run = StageRun()
+        started = time.perf_counter()
+        tasks: Dict[str, asyncio.Future] = {}
+
+        async def run_stage(stage: Stage):
+            memoized = _MISSING
+            if memo is not None and stage.key is not None:
+                memoized = memo.get(stage.name, stage.key, _MISSING)
+            if stage.deps and memoized is _MISSING:
+                await asyncio.gather(*(tasks[dep] for dep in stage.deps))
+            t0 = time.perf_counter() - started
+            if memoized is not _MISSING:
+                run.results[stage.name] = memoized
+                status = 'cached'
+            elif any(not run.ok(dep) for dep in stage.deps):
+                status = 'skipped'
+            else:
+                args = [run.results[dep] for dep in stage.deps]
+                try:
+                    if asyncio.iscoroutinefunction(stage.func):
+                        result = await stage.func(*args)
+                    else:
+                        # Run in a copy of the task's context so request-scoped state (e.g. span collection)
+                        # reaches the worker thread
+                        context = contextvars.copy_context()
+                        result = await loop.run_in_executor(executor, functools.partial(context.run, stage.func,
+                                                                                        *args))
+                    run.results[stage.name] = result
+                    status = 'ok'
+                    if memo is not None and stage.key is not None and (
+                            stage.keep(result) if stage.keep else result is not None):
+                        memo.put(stage.name, stage.key, result)
+                except Exception as e:
+                    print(f"Stage {stage.name} failed: {str(e)}")
+                    run.errors[stage.name] = e
+                    status = 'failed'
+            run.timings[stage.name] = StageTiming(stage.name, t0, time.perf_counter() - started, status, stage.deps)
+            if on_complete:
+                try:
+                    on_complete(stage.name, run)
+                except Exception as e:
+                    print(f"Error in stage callback for {stage.name}: {str(e)}")
+
+        for name in self.order():
+            tasks[name] = asyncio.ensure_future(run_stage(self.stages[name]))
+        await asyncio.gather(*tasks.values())
+        _run_loop.reset(token)
+        run.elapsed = time.perf_counter() - started
+        return run
+
+    def run_sync(self, on_complete: Optional[Callable[[str, StageRun], None]] = None,
+                 executor: Optional[Executor] = None, memo: Optional[StageMemo] = None) -> StageRun:
+        """Run the graph from synchronous code (the Streamlit script thread or a batch worker)."""
+        return asyncio.run(self.run(on_complete, executor, memo))
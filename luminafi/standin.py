@@ -0,0 +1,419 @@
+"""
+Local stand-in HTTP server that serves a recorded cassette.
+
+The server answers Together-compatible ``POST /v1/chat/completions`` requests
+(JSON, or server-sent events when ``stream`` is set), so the real Together SDK
+can be pointed at it with ``base_url``. Yahoo data is served on simple JSON
+routes (``/yahoo/history``, ``/yahoo/info``, ``/yahoo/search``) consumed by
+``StandInMarketClient``, which goes through the same resilience guard as the
+live ``MarketDataClient``. Latency, jitter, per-token stream delay and error
+injection are configurable and driven by a seeded RNG, so benchmark and CI
+runs are repeatable without network access. ``StandInQuoteFeed`` is a
+websocket stand-in for Yahoo's quote streamer that pushes seeded random-walk
+quotes for the subscribed symbols. Run them with
+
+    python -m luminafi.standin cassette.json.gz --port 8765 --latency 0.05 --error-rate 0.1 --quotes-port 8766
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from .live import Quote, encode_quote
+from .market_data import DEFAULT_MAX_WORKERS, DEFAULT_TIMEOUT
+from .replay import Cassette, CassetteMiss, ReplayMarketClient, ReplayTogether, decode_frame, encode_frame
+from .resilience import Upstream, get_upstream
+from .streaming import chunk_text
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class StandInHTTPError(RuntimeError):
+    """Error response from the stand-in server; ``status_code`` drives the retry policy."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload, separators=(",", ":"), default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.standin.count('bytes_out', len(body))
+
+    def _inject(self) -> bool:
+        """Apply the configured latency; answer with an injected error and return True if one is due."""
+        standin = self.server.standin
+        standin.count('requests')
+        standin.count('bytes_in', len(self.path))
+        delay = standin.latency + (standin.rng_uniform(0.0, standin.jitter) if standin.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        if standin.error_rate and standin.rng_uniform(0.0, 1.0) < standin.error_rate:
+            standin.count('errors')
+            self._send_json(standin.error_status, {'error': {'message': "injected error"}})
+            return True
+        return False
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+        if url.path == "/health":
+            self._send_json(200, {'status': "ok", 'entries': len(self.server.standin.cassette)})
+            return
+        if self._inject():
+            return
+        market = self.server.standin.market
+        try:
+            if url.path == "/yahoo/history":
+                frame = market.history(query['symbol'], interval=query.get('interval', '1d'),
+                                       period=query.get('period'), start=query.get('start'), end=query.get('end'))
+                self._send_json(200, encode_frame(frame))
+            elif url.path == "/yahoo/info":
+                self._send_json(200, market.info(query['symbol']))
+            elif url.path == "/yahoo/search":
+                result = market.search(query['q'])
+                self._send_json(200, {'news': result.news, 'research': result.research})
+            else:
+                self._send_json(404, {'error': {'message': f"unknown route {url.path}"}})
+        except (CassetteMiss, KeyError) as e:
+            self._send_json(404, {'error': {'message': str(e)}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.server.standin.count('bytes_in', length)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {'error': {'message': "invalid JSON"}})
+            return
+        if self._inject():
+            return
+        if urllib.parse.urlsplit(self.path).path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {'error': {'message': f"unknown route {self.path}"}})
+            return
+        try:
+            response = self.server.standin.together.chat.completions.create(**request)
+        except CassetteMiss as e:
+            self._send_json(404, {'error': {'message': str(e)}})
+            return
+        model = request.get('model', "")
+        if request.get('stream'):
+            self._stream(model, response)
+        else:
+            usage = response.usage
+            self._send_json(200, {
+                'id': "standin", 'object': "chat.completion", 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'finish_reason': "stop",
+                             'message': {'role': "assistant", 'content': response.choices[0].message.content}}],
+                'usage': _usage_dict(usage),
+            })
+
+    def _stream(self, model: str, chunks):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        created = int(time.time())
+        token_delay = self.server.standin.token_delay
+        for chunk in chunks:
+            payload = {'id': "standin", 'object': "chat.completion.chunk", 'created': created, 'model': model,
+                       'choices': []}
+            delta = chunk_text(chunk)
+            if delta is not None:
+                if token_delay:
+                    time.sleep(token_delay)
+                payload['choices'] = [{'index': 0, 'delta': {'role': "assistant", 'content': delta}}]
+            if getattr(chunk, 'usage', None) is not None:
+                payload['usage'] = _usage_dict(chunk.usage)
+            event = b"data: " + json.dumps(payload, separators=(",", ":")).encode() + b"\n\n"
+            self.wfile.write(event)
+            self.wfile.flush()
+            self.server.standin.count('bytes_out', len(event))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def _usage_dict(usage) -> Optional[Dict]:
+    if usage is None:
+        return None
+    prompt_tokens = getattr(usage, 'prompt_tokens', None) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', None) or 0
+    return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Concurrent fetches open many connections at once; the default backlog of 5 drops SYNs
+    request_queue_size = 128
+    standin: "StandInServer"
+
+
+class StandInServer:
+    """Serve ``cassette`` over HTTP on ``host:port`` (port 0 picks a free one) with injected latency and errors."""
+
+    def __init__(self, cassette: Cassette, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, token_delay: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, seed: int = 0):
+        self.cassette = cassette
+        self.market = ReplayMarketClient(cassette)
+        self.together = ReplayTogether(cassette)
+        self.latency = latency
+        self.jitter = jitter
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        # Requests, injected errors and payload bytes received (paths and bodies) and sent (bodies)
+        self.requests = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.standin = self
+        self._thread: Optional[threading.Thread] = None
+
+    def rng_uniform(self, low: float, high: float) -> float:
+        with self._lock:
+            return self._rng.uniform(low, high)
+
+    def count(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors,
+                    'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out}
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """Serve in a background thread and return the base URL."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, name="luminafi-standin", daemon=True)
+            self._thread.start()
+        return self.url
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "StandInServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StandInQuoteFeed:
+    """Websocket stand-in for Yahoo's quote streamer: a random-walk quote per subscribed symbol every ``interval``."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, interval: float = 0.5,
+                 prices: Optional[Dict[str, float]] = None, volatility: float = 0.002, seed: int = 0):
+        from websockets.sync.server import serve
+
+        self.interval = interval
+        self.volatility = volatility
+        # Connections accepted, subscribe/unsubscribe messages received and quotes sent
+        self.connections = 0
+        self.subscriptions = 0
+        self.quotes = 0
+        self._prices = dict(prices or {})
+        self._days: Dict[str, Dict] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = serve(self._handle, host, port)
+        self._thread: Optional[threading.Thread] = None
+
+    def count(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def next_quote(self, symbol: str) -> Quote:
+        """Move ``symbol`` one random step and return its quote, with the day's open, range and volume."""
+        with self._lock:
+            price = self._prices.get(symbol) or self._rng.uniform(20, 500)
+            day = self._days.setdefault(symbol, {'open': price, 'high': price, 'low': price, 'volume': 0,
+                                                  'previous_close': price})
+            price = round(price * (1 + self._rng.gauss(0, self.volatility)), 2)
+            self._prices[symbol] = price
+            day['high'] = max(day['high'], price)
+            day['low'] = min(day['low'], price)
+            day['volume'] += self._rng.randint(100, 10000)
+            self.quotes += 1
+        return Quote(symbol=symbol, time=time.time(), price=price, open=day['open'], high=day['high'],
+                     low=day['low'], volume=day['volume'], previous_close=day['previous_close'],
+                     change_percent=(price / day['previous_close'] - 1) * 100)
+
+    def _handle(self, connection):
+        from websockets.exceptions import ConnectionClosed
+
+        self.count('connections')
+        subscribed = set()
+        next_tick = time.monotonic()
+        try:
+            while True:
+                try:
+                    request = json.loads(connection.recv(timeout=max(0.0, next_tick - time.monotonic())))
+                    self.count('subscriptions')
+                    subscribed.update(request.get("subscribe", []))
+                    subscribed.difference_update(request.get("unsubscribe", []))
+                    continue
+                except TimeoutError:
+                    pass
+                for symbol in sorted(subscribed):
+                    connection.send(encode_quote(self.next_quote(symbol)))
+                next_tick += self.interval
+        except ConnectionClosed:
+            pass
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.socket.getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    def start(self) -> str:
+        """Serve in a background thread and return the websocket URL."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, name="luminafi-standin-quotes",
+                                            daemon=True)
+            self._thread.start()
+        return self.url
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "StandInQuoteFeed":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StandInMarketClient:
+    """``MarketDataClient`` that talks to a stand-in server instead of Yahoo."""
+
+    def __init__(self, base_url: str, timeout: float = DEFAULT_TIMEOUT, upstream: Optional[Upstream] = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.upstream = upstream or get_upstream("yahoo")
+        self._executor = ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS, thread_name_prefix="luminafi-standin")
+
+    def _get(self, route: str, **params):
+        query = urllib.parse.urlencode({key: value for key, value in params.items() if value is not None})
+        try:
+            with urllib.request.urlopen(f"{self.base_url}{route}?{query}", timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise StandInHTTPError(e.code, e.read().decode(errors="replace")) from None
+
+    def _history(self, symbol: str, **kwargs) -> pd.DataFrame:
+        start, end = kwargs.get('start'), kwargs.get('end')
+        return decode_frame(self._get("/yahoo/history", symbol=symbol, interval=kwargs.get('interval', '1d'),
+                                      period=kwargs.get('period'), start=str(start) if start else None,
+                                      end=str(end) if end else None))
+
+    def download(self, symbols: List[str], **kwargs) -> pd.DataFrame:
+        import pandas as pd
+
+        # Like yf.download: concurrent requests, one per symbol; missing symbols are left out
+        kwargs = {key: kwargs[key] for key in ('period', 'interval', 'start', 'end') if key in kwargs}
+        futures = {symbol: self._executor.submit(self.upstream.call, self._history, symbol, **kwargs)
+                   for symbol in symbols}
+        frames = {}
+        for symbol, future in futures.items():
+            try:
+                frames[symbol] = future.result()
+            except StandInHTTPError as e:
+                print(f"Stand-in download failed for {symbol}: {str(e)}")
+        return pd.concat(frames, axis=1) if frames else pd.DataFrame()
+
+    def history(self, symbol: str, **kwargs) -> pd.DataFrame:
+        return self.upstream.call(self._history, symbol, **kwargs)
+
+    def info(self, symbol: str) -> Dict:
+        return self.upstream.call(self._get, "/yahoo/info", hedge=True, symbol=symbol)
+
+    def search(self, query: str, **kwargs):
+        from types import SimpleNamespace
+        return SimpleNamespace(**self.upstream.call(self._get, "/yahoo/search", q=query))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a LuminaFi cassette as local Yahoo and Together stand-ins")
+    parser.add_argument("cassette", help="cassette file recorded with LUMINAFI_CASSETTE_MODE=record")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quotes-port", type=int, help="also serve a live quote feed on this port")
+    parser.add_argument("--quote-interval", type=float, default=0.5, help="seconds between quotes per symbol")
+    args = parser.parse_args(argv)
+
+    server = StandInServer(Cassette(args.cassette), args.host, args.port, latency=args.latency, jitter=args.jitter,
+                           token_delay=args.token_delay, error_rate=args.error_rate,
+                           error_status=args.error_status, seed=args.seed)
+    print(f"Serving {len(server.cassette)} recorded responses on {server.url} "
+          f"(set LUMINAFI_STANDIN_URL={server.url})")
+    if args.quotes_port is not None:
+        quotes = StandInQuoteFeed(args.host, args.quotes_port, interval=args.quote_interval, seed=args.seed)
+        print(f"Serving live quotes on {quotes.start()} (set LUMINAFI_LIVE_FEED_URL={quotes.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
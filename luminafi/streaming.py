@@ -0,0 +1,106 @@
+"""
+Throttled, incremental rendering of a streamed LLM answer.
+
+Re-rendering the whole growing document for every token costs O(n^2) work and
+websocket traffic. ``StreamRenderer`` buffers deltas and flushes at most every
+``interval`` seconds (or once ``max_chars`` are pending). On a flush, finished
+markdown blocks (text before a blank line, outside code fences and open
+``<div>``s) are written once into their own element and never sent again; only
+the unfinished tail is sanitized and re-rendered in a trailing placeholder.
+"""
+
+import time
+from typing import Callable, Iterable, Optional, Tuple
+
+from .utils import sanitize_markdown
+
+
+def chunk_text(chunk) -> Optional[str]:
+    """Return the text delta carried by a streamed chat completion chunk."""
+    if hasattr(chunk, 'choices') and chunk.choices and hasattr(chunk.choices[0], 'delta'):
+        return getattr(chunk.choices[0].delta, "content", None)
+    return None
+
+
+def split_complete(text: str) -> Tuple[str, str]:
+    """Split ``text`` into finished markdown blocks and the unfinished tail."""
+    parts = text.split("\n\n")
+    fences = divs = 0
+    offset = cut = 0
+    for part in parts[:-1]:
+        fences += part.count("```")
+        divs += part.count("<div") - part.count("</div>")
+        offset += len(part) + 2
+        if fences % 2 == 0 and divs <= 0:
+            cut = offset
+    return text[:cut], text[cut:]
+
+
+class StreamRenderer:
+    """
+    Render streamed markdown into a Streamlit container (anything with ``empty()``
+    returning placeholders that have ``markdown()``).
+    """
+
+    def __init__(self, container, interval: float = 0.1, max_chars: int = 2000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.container = container
+        self.interval = interval
+        self.max_chars = max_chars
+        self.clock = clock
+        self.parts = []
+        self.pending = ""
+        self.tail = ""
+        self.placeholder = None
+        self.last_flush = clock()
+        # Rendering statistics
+        self.flushes = 0
+        self.blocks = 0
+        self.bytes_pushed = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts) + self.tail + self.pending
+
+    def _push(self, markdown: str):
+        if self.placeholder is None:
+            self.placeholder = self.container.empty()
+        self.placeholder.markdown(markdown)
+        self.bytes_pushed += len(markdown.encode("utf-8"))
+
+    def feed(self, delta: Optional[str]):
+        """Buffer a delta and flush if the time or size budget is spent."""
+        if not delta:
+            return
+        self.pending += delta
+        if len(self.pending) >= self.max_chars or self.clock() - self.last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """Append newly finished blocks and re-render the sanitized tail."""
+        self.last_flush = self.clock()
+        if not self.pending:
+            return
+        self.flushes += 1
+        self.tail += self.pending
+        self.pending = ""
+        complete, self.tail = split_complete(self.tail)
+        if complete:
+            # The tail placeholder becomes the finished block; later output goes below it
+            self._push(complete)
+            self.parts.append(complete)
+            self.blocks += 1
+            self.placeholder = None
+        if self.tail:
+            self._push(sanitize_markdown(self.tail))
+
+    def close(self) -> str:
+        """Flush whatever is left and return the full text."""
+        self.flush()
+        return self.text
+
+    def render(self, stream: Iterable) -> str:
+        """Consume a chat completion stream and return its full text."""
+        for chunk in stream:
+            self.feed(chunk_text(chunk))
+        return self.close()
@@ -0,0 +1,206 @@
+"""
+Local symbol resolution in front of the LLM extractor.
+
+Most queries name their tickers explicitly ("Compare AAPL vs MSFT") or use a
+well-known company name ("Compare Apple and Microsoft"). Those are resolved
+in-process from a bundled ticker/company-name index; only queries the index
+cannot confidently resolve are sent to the LLM, whose answers are memoized by
+normalized query; concurrent identical queries share one LLM call.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .singleflight import get_flight
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(__file__), "data", "tickers.tsv")
+
+_TOKEN_RE = re.compile(r"[$^]?[A-Za-z0-9][A-Za-z0-9&.'+\-]*|&")
+_TICKER_RE = re.compile(r"^\^?[A-Z0-9]{1,6}([-=][A-Z0-9]{1,4})?$")
+# Chart periods such as 5Y, 1MO or 6m; YTD and MAX are stopwords
+_PERIOD_RE = re.compile(r"^\d+(D|WK|W|MO|M|Y|YR|YRS)$", re.IGNORECASE)
+_SENTENCE_END_RE = re.compile(r"[.!?:;\n]")
+
+# Upper-case words that show up in queries but are not meant as tickers
+STOPWORDS = {
+    'A', 'I', 'AI', 'AND', 'ARE', 'AS', 'AT', 'BY', 'CEO', 'COMPARE', 'EPS', 'ETF', 'ETFS', 'FOR', 'GDP',
+    'HOW', 'IN', 'IPO', 'IS', 'IT', 'ME', 'MY', 'OF', 'ON', 'OR', 'P', 'PE', 'ROI', 'STOCK', 'STOCKS',
+    'THE', 'TO', 'US', 'USA', 'USD', 'VS', 'VERSUS', 'WHAT', 'WITH', 'YOY', 'YTD', 'ANALYZE',
+    'MAX', 'SHOW', 'TELL', 'GIVE', 'PLEASE', 'WHICH', 'WHY', 'SHOULD', 'CAN', 'DO', 'DOES', 'BUY', 'SELL',
+    'HOLD', 'PRICE', 'PRICES', 'PERFORMANCE', 'TREND', 'TRENDS', 'NEWS', 'ANALYSIS', 'OVER', 'LAST', 'PAST',
+    'THIS', 'YEAR', 'MONTH', 'WEEK', 'DAY', 'BETWEEN', 'FROM', 'BEST', 'TOP', 'VS.', 'INDEX', 'SHARES',
+}
+
+# Lower-case words that are also index tickers or company names; capitalization tells them apart
+COMMON_WORDS = {
+    'am', 'arm', 'block', 'booking', 'cat', 'coin', 'coke', 'cost', 'de', 'delta', 'dis', 'ether', 'hood',
+    'low', 'lucid', 'ma', 'meta', 'mo', 'ms', 'now', 'oracle', 'pm', 'ripple', 'shell', 'shop', 'snow', 'so',
+    'southwest', 'spot', 'square', 'target', 'visa', 'zoom',
+}
+
+
+def _clean_token(token: str) -> str:
+    """Strip sentence punctuation and possessives from a query token."""
+    token = re.sub(r"['’]s$", "", token)
+    return token.rstrip(".-'")
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for memoization: case-folded with collapsed whitespace."""
+    return " ".join(query.lower().split())
+
+
+@dataclass
+class Resolution:
+    """Symbols found by the local resolver and whether they can be trusted without the LLM."""
+    symbols: List[str]
+    confident: bool
+
+
+class SymbolResolver:
+    """Hash index of known tickers and company names loaded from a bundled TSV file."""
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.tickers: Set[str] = set()
+        self.names: Dict[str, str] = {}
+        self.max_name_words = 1
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                line = line.rstrip("\r\n")
+                if not line or line.startswith("#"):
+                    continue
+                symbol, _, aliases = line.partition("\t")
+                self.tickers.add(symbol)
+                for alias in aliases.split("|"):
+                    words = [_clean_token(t).lower() for t in _TOKEN_RE.findall(alias)]
+                    if words:
+                        self.names[" ".join(words)] = symbol
+                        self.max_name_words = max(self.max_name_words, len(words))
+
+    def _tokens(self, query: str) -> Tuple[List[str], Set[int]]:
+        """Cleaned query tokens and the positions of those that start a sentence."""
+        tokens, initial = [], set()
+        end = 0
+        for match in _TOKEN_RE.finditer(query):
+            token = _clean_token(match.group())
+            if not token:
+                continue
+            if not tokens or _SENTENCE_END_RE.search(query, end, match.start()):
+                initial.add(len(tokens))
+            tokens.append(token)
+            end = match.end()
+        return tokens, initial
+
+    def resolve(self, query: str) -> Resolution:
+        """
+        Match explicit tickers and company names; confident only if nothing else could be a symbol.
+
+        The LLM decides whenever a one-word name could be a plain word ("Target
+        price", "apple", "Shell"), a ticker is written in lower case ("brk.b")
+        or a capitalized word is not in the index ("Gold").
+        """
+        tokens, initial = self._tokens(query)
+        symbols: List[str] = []
+        unresolved = False
+        i = 0
+        while i < len(tokens):
+            # Longest company-name match first, e.g. "bank of america" before "bank"
+            for n in range(min(self.max_name_words, len(tokens) - i), 0, -1):
+                phrase = " ".join(tokens[i:i + n]).lower()
+                if phrase not in self.names:
+                    continue
+                if n == 1 and (not tokens[i][0].isupper() or i in initial or phrase in COMMON_WORDS):
+                    # Capitalization says nothing here: maybe a company, maybe a plain word
+                    unresolved = True
+                    continue
+                symbols.append(self.names[phrase])
+                i += n
+                break
+            else:
+                token = tokens[i]
+                ticker = token.upper().replace(".", "-")
+                if token.startswith("$"):
+                    # "$aapl" is an explicit ticker even if we do not know it
+                    symbols.append(token[1:].upper().replace(".", "-"))
+                elif _PERIOD_RE.match(token) or token.upper() in STOPWORDS:
+                    pass
+                elif token.isupper():
+                    if ticker in self.tickers:
+                        symbols.append(ticker)
+                    elif _TICKER_RE.match(ticker):
+                        unresolved = True
+                elif token.islower():
+                    # "spy" or "brk.b": a ticker typed in lower case, unless it is an ordinary word
+                    if (ticker in self.tickers and len(token) > 1 and token not in COMMON_WORDS) \
+                            or (re.search(r"[.\-=]", token) and _TICKER_RE.match(ticker)):
+                        unresolved = True
+                elif token[0].isupper():
+                    # "Gold": a name the index does not know
+                    unresolved = True
+                i += 1
+        symbols = list(dict.fromkeys(s for s in symbols if s))
+        return Resolution(symbols=symbols, confident=bool(symbols) and not unresolved)
+
+
+class SymbolExtractor:
+    """Local resolver with an LLM fallback, memoized LLM answers and hit-rate counters."""
+
+    def __init__(self, resolver: Optional[SymbolResolver] = None, memo_size: int = 1024):
+        self.resolver = resolver or SymbolResolver()
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.flight = get_flight("symbols")
+        self.local_hits = 0
+        self.memo_hits = 0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+
+    def extract(self, query: str, llm: Callable[[str], List[str]]) -> List[str]:
+        """Return symbols for ``query``, calling ``llm(query)`` only when the local index is unsure."""
+        resolution = self.resolver.resolve(query)
+        if resolution.confident:
+            with self._lock:
+                self.local_hits += 1
+            return resolution.symbols
+
+        key = normalize_query(query)
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                self.memo_hits += 1
+                return list(self._memo[key])
+
+        start = time.perf_counter()
+        # Sessions asking the same question at the same time share one LLM call
+        symbols = self.flight.do(key, llm, query)
+        symbols = list(symbols) if symbols else symbols
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_seconds += time.perf_counter() - start
+            if symbols:
+                self._memo[key] = list(symbols)
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+        # A failed LLM call still leaves us whatever the local index found
+        return symbols or resolution.symbols
+
+    def stats(self) -> Dict:
+        """Counters for the local hit rate and the LLM latency it saved."""
+        with self._lock:
+            total = self.local_hits + self.memo_hits + self.llm_calls
+            avg_llm = self.llm_seconds / self.llm_calls if self.llm_calls else 0.0
+            return {
+                'queries': total,
+                'local_hits': self.local_hits,
+                'memo_hits': self.memo_hits,
+                'llm_calls': self.llm_calls,
+                'hit_rate': (self.local_hits + self.memo_hits) / total if total else 0.0,
+                'avg_llm_seconds': avg_llm,
+                'latency_saved_seconds': (self.local_hits + self.memo_hits) * avg_llm,
+            }
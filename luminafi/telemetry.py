@@ -0,0 +1,445 @@
+"""
+Tracing and metrics for LuminaFi.
+
+Spans time the workflow methods (with attributes such as symbols, period,
+bytes and tokens); counters, gauges and histograms track upstream calls,
+retries, cache hits and LLM time-to-first-token and tokens per second.
+
+Everything is off unless ``LUMINAFI_TELEMETRY`` is set (or ``enable()`` is
+called): ``span()`` then returns a shared no-op object and metric updates
+return after a single flag check. Independently, ``collect()`` gathers the
+spans of one request (even while telemetry is off), which backs the debug
+panel in the app.
+
+Metrics are exported in the Prometheus text format, served on
+``LUMINAFI_METRICS_PORT`` and/or written to ``LUMINAFI_METRICS_FILE`` (every
+``LUMINAFI_METRICS_FILE_INTERVAL_SECONDS`` and once more on exit). With
+``LUMINAFI_OTEL`` set and the ``opentelemetry-api`` package installed, spans
+and metric updates are mirrored to the globally configured OpenTelemetry
+tracer and meter, so any OpenTelemetry exporter can ship them.
+"""
+
+import atexit
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from . import config
+
+_enabled = config.TELEMETRY
+_collector: contextvars.ContextVar = contextvars.ContextVar("luminafi_spans", default=None)
+_current: contextvars.ContextVar = contextvars.ContextVar("luminafi_span", default=None)
+
+_otel_lock = threading.Lock()
+_otel_state: Dict[str, object] = {}
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable():
+    """Turn on metrics and span export for the whole process."""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def _otel(kind: str):
+    """The OpenTelemetry tracer or meter, or None when not configured or not installed."""
+    if not config.OTEL:
+        return None
+    with _otel_lock:
+        if kind not in _otel_state:
+            try:
+                if kind == "tracer":
+                    from opentelemetry import trace
+                    _otel_state[kind] = trace.get_tracer("luminafi")
+                else:
+                    from opentelemetry import metrics
+                    _otel_state[kind] = metrics.get_meter("luminafi")
+            except ImportError:
+                print("LUMINAFI_OTEL is set but opentelemetry-api is not installed")
+                _otel_state.update(tracer=None, meter=None)
+        return _otel_state[kind]
+
+
+class _NoopSpan:
+    """Returned by ``span()`` when nothing is recording; every operation is a no-op."""
+    __slots__ = ()
+    # Lets callers skip computing attributes that would be thrown away
+    recording = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    """A timed operation with attributes; use as a context manager."""
+    __slots__ = ("name", "attributes", "start", "end", "depth", "status", "_token", "_otel")
+    recording = True
+
+    def __init__(self, name: str, attributes: Dict):
+        self.name = name
+        self.attributes = attributes
+        self.start = self.end = 0.0
+        self.depth = 0
+        self.status = "ok"
+        self._token = None
+        self._otel = None
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        parent = _current.get()
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self._token = _current.set(self)
+        tracer = _otel("tracer") if _enabled else None
+        if tracer is not None:
+            self._otel = tracer.start_as_current_span(self.name)
+            self._otel.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.status = "error"
+            self.attributes['error'] = f"{exc_type.__name__}: {exc}"
+        _current.reset(self._token)
+        _finish(self, exc_type, exc, tb)
+        return False
+
+
+def _otel_attribute(value):
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value]
+    return str(value)
+
+
+def _finish(span: Span, exc_type=None, exc=None, tb=None):
+    """Hand a finished span to the request collector, the span histogram and OpenTelemetry."""
+    spans = _collector.get()
+    if spans is not None:
+        spans.append({'name': span.name, 'start': span.start, 'seconds': span.seconds, 'depth': span.depth,
+                      'status': span.status, 'attributes': dict(span.attributes)})
+    if _enabled:
+        SPAN_SECONDS.observe(span.seconds, span=span.name)
+    if span._otel is not None:
+        try:
+            from opentelemetry import trace
+            current = trace.get_current_span()
+            for key, value in span.attributes.items():
+                current.set_attribute(f"luminafi.{key}", _otel_attribute(value))
+        finally:
+            span._otel.__exit__(exc_type, exc, tb)
+
+
+def span(name: str, **attributes):
+    """Time a block as a span; a no-op unless telemetry is enabled or spans are being collected."""
+    if not _enabled and _collector.get() is None:
+        return _NOOP
+    return Span(name, attributes)
+
+
+def record(name: str, start: float, end: float, **attributes):
+    """Record an already finished span, e.g. one measured across a generator's iterations."""
+    if not _enabled and _collector.get() is None:
+        return
+    finished = Span(name, attributes)
+    finished.start, finished.end = start, end
+    parent = _current.get()
+    finished.depth = parent.depth + 1 if parent is not None else 0
+    _finish(finished)
+
+
+def start_collecting(active: bool = True) -> Optional[List[Dict]]:
+    """Start gathering the spans of the current request (context) into a new list, or stop when not ``active``."""
+    spans = [] if active else None
+    _collector.set(spans)
+    return spans
+
+
+def stop_collecting():
+    _collector.set(None)
+
+
+@contextmanager
+def collect() -> Iterator[List[Dict]]:
+    """Gather the spans finished inside the block, including those of stages run on worker threads."""
+    spans: List[Dict] = []
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
+
+
+_registry: List["_Metric"] = []
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        self._otel_instrument = None
+        _registry.append(self)
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _mirror(self, method: str, value: float, labels: Dict):
+        meter = _otel("meter")
+        if meter is None:
+            return
+        if self._otel_instrument is None:
+            create = {"counter": meter.create_counter, "gauge": meter.create_up_down_counter,
+                      "histogram": meter.create_histogram}[self.kind]
+            self._otel_instrument = create(self.name, description=self.description)
+        getattr(self._otel_instrument, method)(value, attributes={k: str(v) for k, v in labels.items()})
+
+    def _label_text(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{self._label_text(key)} {_format(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        if not _enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+        if config.OTEL:
+            self._mirror("add", amount, labels)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        if not _enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            previous = self._values.get(key, 0.0)
+            self._values[key] = value
+        if config.OTEL:
+            self._mirror("add", value - previous, labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        if not _enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+        if config.OTEL:
+            self._mirror("record", value, labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                le = 'le="%s"' % _format(bound)
+                lines.append(f"{self.name}_bucket{self._label_text(key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{self._label_text(key, le)} {count}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_format(total)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {count}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# Instruments
+SPAN_SECONDS = Histogram("luminafi_span_seconds", "Duration of instrumented operations.", ("span",))
+UPSTREAM_CALLS = Counter("luminafi_upstream_calls_total", "Upstream call attempts by outcome.",
+                         ("upstream", "outcome"))
+UPSTREAM_SECONDS = Histogram("luminafi_upstream_call_seconds", "Duration of upstream call attempts.", ("upstream",))
+UPSTREAM_RETRIES = Counter("luminafi_upstream_retries_total", "Retries of failed upstream calls.", ("upstream",))
+CIRCUIT_OPEN = Gauge("luminafi_circuit_open", "1 while the upstream's circuit breaker is open.", ("upstream",))
+CACHE_REQUESTS = Counter("luminafi_cache_requests_total", "Cache lookups by cache and result.", ("cache", "result"))
+SINGLE_FLIGHT = Counter("luminafi_single_flight_total",
+                        "Coalesced calls by role: leader, shared (waited for a leader) or rechecked (found cached).",
+                        ("flight", "role"))
+LIVE_QUOTES = Counter("luminafi_live_quotes_total", "Quotes received from the live feed.")
+LIVE_SYMBOLS = Gauge("luminafi_live_symbols", "Symbols the live feed is subscribed to.")
+LLM_TIME_TO_FIRST_TOKEN = Histogram("luminafi_llm_time_to_first_token_seconds",
+                                    "Time from an LLM request to its first streamed token.", ("model",))
+LLM_TOKENS_PER_SECOND = Histogram("luminafi_llm_tokens_per_second", "Streaming speed of LLM completions.",
+                                  ("model",), buckets=(5, 10, 20, 40, 80, 160, 320, 640))
+LLM_TOKENS = Counter("luminafi_llm_tokens_total", "LLM tokens by model and kind (prompt or completion).",
+                     ("model", "kind"))
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: Optional[str] = None):
+    """Write the metrics to ``path`` (default ``LUMINAFI_METRICS_FILE``) atomically, e.g. for node_exporter."""
+    path = path or config.METRICS_FILE
+    if not path:
+        return
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as handle:
+        handle.write(render_prometheus())
+    os.replace(tmp, path)
+
+
+_server = None
+_exporters_lock = threading.Lock()
+
+
+def serve_metrics(port: int, host: str = "0.0.0.0"):
+    """Serve ``/metrics`` in the Prometheus text format from a background thread (once per process)."""
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _exporters_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), Handler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="luminafi-metrics", daemon=True).start()
+    return _server
+
+
+def export_metrics_file(path: str, interval: float) -> threading.Event:
+    """
+    Rewrite ``path`` every ``interval`` seconds (0 disables) from a daemon thread and once more on exit.
+
+    Setting the returned event stops the export, the exit-time write included.
+    """
+    stop = threading.Event()
+
+    def flush():
+        if stop.is_set():
+            return
+        try:
+            write_prometheus(path)
+        except OSError as e:
+            print(f"Error writing metrics to {path}: {str(e)}")
+
+    def run():
+        while not stop.wait(interval):
+            flush()
+
+    if interval > 0:
+        threading.Thread(target=run, name="luminafi-metrics-file", daemon=True).start()
+    # The final flush keeps the updates since the last periodic write
+    atexit.register(flush)
+    return stop
+
+
+_exporters_started = False
+
+
+def start_exporters():
+    """
+    Start the configured metrics endpoint and periodic file export, once per process.
+
+    Called by the process that serves requests (see ``resources.get_workflow``)
+    rather than on import, so worker processes that import this module (e.g.
+    the chart rasterizer pool) never bind the port or overwrite the file.
+    """
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    if config.METRICS_PORT:
+        try:
+            serve_metrics(config.METRICS_PORT)
+        except OSError as e:
+            # Another process (e.g. a second app worker) already serves this port
+            print(f"Metrics endpoint not started on port {config.METRICS_PORT}: {str(e)}")
+    if config.METRICS_FILE:
+        export_metrics_file(config.METRICS_FILE, config.METRICS_FILE_INTERVAL_SECONDS)
@@ -1,5 +1,4 @@
 import re
-import streamlit as st
 
 def sanitize_markdown(md: str) -> str:
     """Remove incomplete HTML tags and trailing partial markdown to prevent UI breakage."""
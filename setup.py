@@ -15,8 +15,11 @@ setup(
         'seaborn',
         'together',
         'websockets',
-        'python-dotenv'
+        'python-dotenv',
+        'pyarrow'
     ],
     include_package_data=True,
+    package_data={'luminafi': ['data/*.tsv']},
+    entry_points={'console_scripts': ['luminafi=luminafi.cli:main']},
     python_requires='>=3.8',
 ) 
\ No newline at end of file
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# Every on-disk cache (prices, price store, locks, fundamentals, news) goes to a throwaway directory;
+# set before luminafi.config is imported, as it reads the environment once
+os.environ["LUMINAFI_CACHE_DIR"] = tempfile.mkdtemp(prefix="luminafi-tests-")
+os.environ.setdefault("TOGETHER_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
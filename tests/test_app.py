@@ -1 +1,41 @@
-# (Move test_app.py here; update imports if needed) 
\ No newline at end of file
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from luminafi import config, resources
+from luminafi.finance_workflow import FinanceWorkflow
+from luminafi.replay import Cassette, RecordingMarketClient, RecordingTogether, ReplayMarketClient, ReplayTogether
+
+from test_replay import FakeMarket, fake_together, unpin_today  # noqa: F401
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+APP = str(Path(__file__).resolve().parents[1] / "luminafi" / "app.py")
+
+
+def run_app(monkeypatch, tmp_path, together_client, market):
+    # Fresh caches, so the answer comes from the clients rather than from an earlier run
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(resources, "_workflow", FinanceWorkflow(together_client=together_client, market=market))
+    app = AppTest.from_file(APP, default_timeout=60)
+    app.run()
+    app.chat_input[0].set_value("Compare AAPL and MSFT").run()
+    assert not app.exception, [error.value for error in app.exception]
+    return app
+
+
+def test_app_runs_offline_from_a_cassette(monkeypatch, tmp_path):
+    cassette = Cassette(str(tmp_path / "cassette.json.gz"))
+    recorded = run_app(monkeypatch, tmp_path / "record", RecordingTogether(fake_together(), cassette),
+                       RecordingMarketClient(FakeMarket(end=pd.Timestamp.now().normalize()), cassette))
+    cassette.save()
+    assert any("Analysis of **AAPL**" in block.value for block in recorded.markdown)
+
+    cassette = Cassette(cassette.path)
+    replayed = run_app(monkeypatch, tmp_path / "replay", ReplayTogether(cassette), ReplayMarketClient(cassette))
+    assert any("Analysis of **AAPL**" in block.value for block in replayed.markdown)
+    assert any("Workflow completed" in block.value for block in replayed.success)
+    summary = next(frame.value for frame in replayed.dataframe if 'Symbol' in frame.value.columns)
+    assert list(summary['Symbol']) == ["AAPL", "MSFT"]
+    assert any("news/AAPL" in block.value for block in replayed.markdown)
@@ -0,0 +1,59 @@
+import json
+
+import pyarrow.parquet as pq
+import pytest
+
+from luminafi.cli import build_parser
+from luminafi.pipeline import JSONLWriter, ParquetWriter, open_writer
+
+
+def record(index):
+    return {'index': index, 'item': f"ITEM{index}", 'status': 'ok', 'symbols': ["AAPL"], 'period': "1y",
+            'summary': {'AAPL': {'last': 1.0}}, 'timings': [], 'elapsed_seconds': 0.5}
+
+
+def test_open_writer_picks_format_from_extension(tmp_path):
+    for name, kind in (("out.jsonl", JSONLWriter), ("out.parquet", ParquetWriter), ("out.pq", ParquetWriter),
+                       ("out.txt", JSONLWriter)):
+        writer = open_writer(str(tmp_path / name))
+        assert isinstance(writer, kind)
+        writer.close()
+    writer = open_writer(str(tmp_path / "out.data"), "parquet")
+    assert isinstance(writer, ParquetWriter)
+    writer.close()
+    with pytest.raises(ValueError):
+        open_writer(str(tmp_path / "out.csv"), "csv")
+
+
+def test_jsonl_writer(tmp_path):
+    path = tmp_path / "out.jsonl"
+    writer = open_writer(str(path))
+    for i in range(3):
+        writer.write(record(i))
+        assert len(path.read_text().splitlines()) == i + 1  # flushed per record
+    writer.close()
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [row['item'] for row in rows] == ["ITEM0", "ITEM1", "ITEM2"]
+
+
+def test_parquet_writer_batches_and_stores_nested_fields_as_json(tmp_path):
+    path = tmp_path / "out.parquet"
+    writer = ParquetWriter(str(path), batch_size=2)
+    for i in range(5):
+        writer.write(record(i))
+    writer.close()
+    parquet = pq.ParquetFile(str(path))
+    assert parquet.metadata.num_rows == 5
+    assert parquet.num_row_groups == 3
+    table = parquet.read().to_pylist()
+    assert json.loads(table[0]['summary']) == {'AAPL': {'last': 1.0}}
+    assert table[4]['symbols'] == ["AAPL"] and table[4]['error'] is None
+
+
+def test_parser():
+    args = build_parser().parse_args(["analyze", "-q", "AAPL", "-q", "MSFT", "-o", "out.jsonl", "--no-news"])
+    assert (args.command, args.query, args.no_news, args.concurrency) == ("analyze", ["AAPL", "MSFT"], True, 4)
+    args = build_parser().parse_args(["screen", "-o", "ranked.csv", "--rank-by", "sharpe", "--top", "3"])
+    assert (args.command, args.rank_by, args.top, args.universe) == ("screen", "sharpe", 3, None)
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["screen", "-o", "x.csv", "--rank-by", "nope"])
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from luminafi.downsample import aggregate_ohlc, downsample_line, downsample_ohlc, lttb_indices
+
+
+def walk(n, seed=0):
+    return 100 + np.cumsum(np.random.default_rng(seed).normal(size=n))
+
+
+@pytest.mark.parametrize("n, n_out", [(1000, 100), (1000, 3), (10, 9), (257, 64)])
+def test_lttb_keeps_endpoints_and_length(n, n_out):
+    indices = lttb_indices(np.arange(n), walk(n), n_out)
+    assert len(indices) == n_out
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_lttb_keeps_extremes():
+    y = walk(5000) * 0.01
+    y[1234], y[3210] = 500.0, -500.0
+    indices = lttb_indices(np.arange(len(y)), y, 200)
+    assert {1234, 3210} <= set(indices.tolist())
+
+
+def test_lttb_leaves_short_series_alone():
+    assert lttb_indices(np.arange(5), np.arange(5.0), 10).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_downsample_line_keeps_dates():
+    hist = pd.DataFrame({'Close': walk(2000)}, index=pd.date_range("2020-01-01", periods=2000, freq="D"))
+    line = downsample_line(hist, width=300)
+    assert len(line) == 300
+    assert line.index[0] == hist.index[0] and line.index[-1] == hist.index[-1]
+    assert line.index.isin(hist.index).all()
+
+
+def test_aggregate_ohlc_per_bucket():
+    index = pd.date_range("2024-01-01", periods=14, freq="D")  # two Monday-to-Sunday weeks
+    hist = pd.DataFrame({'Open': np.arange(14.0), 'High': np.arange(14.0) + 10, 'Low': np.arange(14.0) - 10,
+                         'Close': np.arange(14.0) + 0.5, 'Volume': np.full(14, 100)}, index=index)
+    hist.loc[index[2], 'High'] = 99.0
+    hist.loc[index[9], 'Low'] = -99.0
+    bars = aggregate_ohlc(hist, max_bars=2)
+    assert bars.index.tolist() == [index[0], index[7]]
+    assert bars['Open'].tolist() == [0.0, 7.0]
+    assert bars['High'].tolist() == [99.0, 23.0]
+    assert bars['Low'].tolist() == [-10.0, -99.0]
+    assert bars['Close'].tolist() == [6.5, 13.5]
+    assert bars['Volume'].tolist() == [700, 700]
+
+
+def test_aggregate_ohlc_picks_the_finest_period_that_fits():
+    index = pd.date_range("2024-01-02 09:30", periods=390, freq="min")
+    hist = pd.DataFrame({'Open': 1.0, 'High': 2.0, 'Low': 0.5, 'Close': 1.5, 'Volume': 1}, index=index)
+    assert len(aggregate_ohlc(hist, max_bars=50)) == 26  # 15-minute bars; 78 5-minute ones are too many
+    assert len(downsample_ohlc(hist, width=10_000)) == 390
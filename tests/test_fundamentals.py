@@ -0,0 +1,118 @@
+import time
+
+import pytest
+
+from luminafi import fundamentals
+from luminafi.fundamentals import Fundamentals, FundamentalsCache
+from luminafi.kvstore import KVStore
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakeClient:
+    def __init__(self, info=None):
+        self.info_dict = {'marketCap': 1e12, 'trailingPE': 30.0} if info is None else info
+        self.calls = 0
+
+    def info(self, symbol):
+        self.calls += 1
+        return dict(self.info_dict)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(fundamentals, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = FundamentalsCache(ttl=100, max_stale=1000, store=KVStore("fundamentals", path=str(tmp_path / "kv.db")))
+    cache.empty_ttl = 10
+    return cache
+
+
+def wait_for_refresh(cache, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while cache._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not cache._refreshing
+
+
+def test_from_info_keeps_numeric_fields():
+    record = Fundamentals.from_info({'marketCap': 5, 'trailingPE': 'n/a', 'fiftyTwoWeekHigh': True, 'other': 1})
+    assert record == Fundamentals(market_cap=5)
+    assert record.get('marketCap') == 5
+    assert record.get('trailingPE', 'N/A') == 'N/A'
+    assert Fundamentals().empty
+
+
+def test_served_from_cache_within_ttl(cache, clock):
+    client = FakeClient()
+    assert cache.get(client, "AAPL").market_cap == 1e12
+    clock.advance(99)
+    assert cache.get(client, "AAPL").market_cap == 1e12
+    assert client.calls == 1
+
+
+def test_other_instances_share_the_store(cache, tmp_path):
+    cache.get(FakeClient(), "AAPL")
+    client = FakeClient()
+    other = FundamentalsCache(ttl=100, max_stale=1000, store=KVStore("fundamentals", path=str(tmp_path / "kv.db")))
+    assert other.get(client, "AAPL").trailing_pe == 30.0
+    assert client.calls == 0
+
+
+def test_stale_record_is_served_while_refreshing(cache, clock):
+    client = FakeClient()
+    cache.get(client, "AAPL")
+    clock.advance(150)
+    client.info_dict = {'marketCap': 2e12}
+    assert cache.get(client, "AAPL").market_cap == 1e12
+    wait_for_refresh(cache)
+    assert client.calls == 2
+    assert cache.get(client, "AAPL").market_cap == 2e12
+    assert client.calls == 2
+
+
+def test_empty_record_gets_the_short_ttl(cache, clock):
+    client = FakeClient(info={})
+    assert cache.get(client, "AAPL").empty
+    clock.advance(5)
+    cache.get(client, "AAPL")
+    assert client.calls == 1
+    clock.advance(10)
+    cache.get(client, "AAPL")
+    wait_for_refresh(cache)
+    assert client.calls == 2
+
+
+def test_empty_answer_keeps_the_good_record(cache, clock):
+    client = FakeClient()
+    cache.get(client, "AAPL")
+    clock.advance(150)
+    client.info_dict = {}
+    cache.get(client, "AAPL")
+    wait_for_refresh(cache)
+    assert client.calls == 2
+    assert cache.get(client, "AAPL").market_cap == 1e12
+
+
+def test_fetched_again_past_max_stale(cache, clock):
+    client = FakeClient()
+    cache.get(client, "AAPL")
+    clock.advance(1000)
+    client.info_dict = {'marketCap': 3e12}
+    assert cache.get(client, "AAPL").market_cap == 3e12
+    assert client.calls == 2
+    assert not cache._refreshing
@@ -0,0 +1,163 @@
+import time
+
+import pandas as pd
+import pytest
+
+from luminafi.finance_workflow import FinanceWorkflow
+from luminafi.live import LiveHub, Quote, decode_quote, encode_quote
+from luminafi.price_cache import CachedHistory, PriceCache
+from luminafi.standin import StandInQuoteFeed
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+# Trading day of the live quotes; the cached histories end the day before
+TODAY = pd.Timestamp("2024-03-15")
+
+
+def daily_history(days=5):
+    end = TODAY - pd.Timedelta(days=1)
+    close = [100.0 + i for i in range(days)]
+    return pd.DataFrame({'Open': close, 'High': [c + 1 for c in close], 'Low': [c - 1 for c in close],
+                         'Close': close, 'Volume': [1000] * days},
+                        index=pd.DatetimeIndex(pd.date_range(end=end, periods=days), name="Date"))
+
+
+def quote_today(symbol, price, **fields):
+    noon = (TODAY + pd.Timedelta(hours=12)).tz_localize("America/New_York")
+    return Quote(symbol=symbol, time=noon.timestamp(), price=price, **fields)
+
+
+def test_quote_roundtrip():
+    quote = Quote(symbol="AAPL", time=1700000000.5, price=189.25, open=188.0, high=190.0, low=187.5,
+                  volume=12345, previous_close=187.0, change_percent=1.2)
+    decoded = decode_quote(encode_quote(quote))
+    assert decoded.symbol == "AAPL"
+    assert decoded.price == pytest.approx(189.25)
+    assert decoded.volume == 12345
+    assert decode_quote("not json") is None
+
+
+def test_hub_fans_out_one_feed_and_unsubscribes():
+    with StandInQuoteFeed(interval=0.05, seed=1) as feed:
+        hub = LiveHub(url=feed.url)
+        try:
+            first = hub.subscribe(["AAPL", "MSFT"])
+            second = hub.subscribe(["MSFT"])
+            assert wait_for(lambda: hub.metrics()['quotes'] >= 10)
+            assert feed.connections == 1
+            assert hub.metrics()['symbols'] == 2
+            assert {quote.symbol for quote in first.drain()} == {"AAPL", "MSFT"}
+            assert {quote.symbol for quote in second.drain()} == {"MSFT"}
+
+            # A late subscriber gets the latest known quote right away
+            late = hub.subscribe(["AAPL"])
+            assert [quote.symbol for quote in late.drain()][:1] == ["AAPL"]
+            late.close()
+
+            first.close()
+            assert hub.metrics()['symbols'] == 1
+            time.sleep(0.3)  # quotes already on the wire when the feed unsubscribed
+            first.drain()
+            second.drain()
+            time.sleep(0.3)
+            assert first.drain() == []
+            assert {quote.symbol for quote in second.drain()} == {"MSFT"}
+
+            second.close()
+            assert hub.metrics()['symbols'] == 0
+        finally:
+            hub.close()
+
+
+class _NullFeed:
+    connected = False
+    connects = 0
+    failures = 0
+
+    def update(self, symbols):
+        self.symbols = set(symbols)
+
+    def close(self):
+        pass
+
+
+def test_subscription_buffer_keeps_latest():
+    hub = LiveHub(url="ws://unused", feed_factory=lambda url, on_quote: _NullFeed())
+    subscription = hub.subscribe(["AAPL"])
+    subscription._quotes = type(subscription._quotes)(maxlen=3)
+    for price in range(5):
+        hub._on_quote(Quote(symbol="AAPL", time=time.time(), price=float(price)))
+    assert [quote.price for quote in subscription.drain()] == [2.0, 3.0, 4.0]
+    assert subscription.dropped == 2
+
+
+def test_extend_line_chart():
+    history = daily_history()
+    figure = FinanceWorkflow.create_comparison_chart(None, {'AAPL': {'history': history}}, "line")
+    points = len(figure.data[0].x)
+    quotes = [quote_today("AAPL", 110.0), quote_today("MSFT", 50.0),
+              Quote(symbol="AAPL", time=history.index[0].timestamp(), price=1.0)]
+    assert FinanceWorkflow.extend_comparison_chart(figure, quotes) == 1
+    assert len(figure.data[0].x) == points + 1
+    assert figure.data[0].y[-1] == 110.0
+
+
+def test_extend_candlestick_chart_updates_todays_bar():
+    figure = FinanceWorkflow.create_comparison_chart(None, {'AAPL': {'history': daily_history()}}, "candlestick")
+    bars = len(figure.data[0].x)
+    assert FinanceWorkflow.extend_comparison_chart(figure, [quote_today("AAPL", 110.0, open=108.0)]) == 1
+    assert FinanceWorkflow.extend_comparison_chart(figure, [quote_today("AAPL", 120.0),
+                                                            quote_today("AAPL", 105.0)]) == 2
+    trace = figure.data[0]
+    assert len(trace.x) == bars + 1
+    assert (trace.open[-1], trace.high[-1], trace.low[-1], trace.close[-1]) == (108.0, 120.0, 105.0, 105.0)
+
+
+def test_append_quote_persists_todays_bar_and_keeps_fetch_time(tmp_path):
+    cache = PriceCache(directory=str(tmp_path))
+    fetched_at = time.time() - 60
+    cache.write("AAPL", "1d", CachedHistory(daily_history(), None, fetched_at))
+
+    assert cache.append_quote(quote_today("AAPL", 110.0, open=108.0, volume=5000))
+    assert cache.append_quote(quote_today("AAPL", 112.0, volume=6000))
+    entry = PriceCache(directory=str(tmp_path)).read("AAPL")
+    assert len(entry.frame) == 6
+    today = entry.frame.iloc[-1]
+    assert (today['Open'], today['High'], today['Close'], today['Volume']) == (108.0, 112.0, 112.0, 6000)
+    # Live bars do not make the bars before today any fresher
+    assert entry.fetched_at == pytest.approx(fetched_at)
+
+
+def test_append_quote_skips_stale_history(tmp_path):
+    cache = PriceCache(directory=str(tmp_path), refresh_seconds=900)
+    cache.write("AAPL", "1d", CachedHistory(daily_history(), None, time.time() - 3600))
+    assert not cache.append_quote(quote_today("AAPL", 110.0))
+    assert not cache.append_quote(quote_today("MSFT", 50.0))
+    assert len(cache.read("AAPL").frame) == 5
+
+
+def test_hub_flushes_latest_quote_per_symbol_in_batches(tmp_path):
+    cache = PriceCache(directory=str(tmp_path))
+    cache.write("AAPL", "1d", CachedHistory(daily_history(), None, time.time()))
+    hub = LiveHub(url="ws://unused", cache=cache, flush_seconds=3600,
+                  feed_factory=lambda url, on_quote: _NullFeed())
+    writes = []
+    append_quote = cache.append_quote
+    cache.append_quote = lambda quote: writes.append(quote.price) or append_quote(quote)
+    for price in (110.0, 111.0, 112.0):
+        hub._on_quote(quote_today("AAPL", price))
+    assert writes == []  # nothing written on the feed thread
+
+    assert hub.flush() == 1
+    assert writes == [112.0]
+    assert cache.read("AAPL").frame['Close'].iloc[-1] == 112.0
+    assert hub.flush() == 0
+    hub.close()
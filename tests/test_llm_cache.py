@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from luminafi.kvstore import KVStore
+from luminafi.llm_cache import LLMResponseCache, data_fingerprint, make_chunk
+
+
+def record(closes, start="2024-01-01"):
+    history = pd.DataFrame({'Close': closes}, index=pd.date_range(start, periods=len(closes), name="Date"))
+    return {'history': history}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMResponseCache(ttl=3600, max_entries=10, store=KVStore("llm_responses", path=str(tmp_path / "kv.db")))
+
+
+def text_of(stream):
+    return "".join(chunk.choices[0].delta.content for chunk in stream)
+
+
+def test_same_data_gives_the_same_key():
+    first = {'AAPL': record([1.0, 2.0, 3.0]), 'MSFT': record([4.0, 5.0])}
+    second = {'MSFT': record([4.0, 5.0]), 'AAPL': record([1.0, 2.0, 3.0])}
+    assert data_fingerprint(first) == data_fingerprint(second)
+    keys = {LLMResponseCache.key("m", "p", data_fingerprint(data)) for data in (first, second)}
+    assert len(keys) == 1
+
+
+@pytest.mark.parametrize("changed", [
+    {'AAPL': record([1.0, 2.0, 3.5])},
+    {'AAPL': record([1.0, 2.0, 3.0], start="2024-01-02")},
+    {'AAPL': record([1.0, 2.0, 3.0, 4.0])},
+    {'AAPL': None},
+])
+def test_changed_bars_give_another_key(changed):
+    assert data_fingerprint(changed) != data_fingerprint({'AAPL': record([1.0, 2.0, 3.0])})
+
+
+def test_key_depends_on_model_and_prompt():
+    assert len({LLMResponseCache.key(*args) for args in [("a", "p", "f"), ("b", "p", "f"), ("a", "q", "f")]}) == 3
+
+
+def test_replay_matches_the_recorded_text(cache):
+    text = "## Summary\n\nAAPL rose  4.2% while\tMSFT fell.\n"
+    chunks = [make_chunk(piece) for piece in ("## Sum", "mary\n\nAAPL rose  4.2% ", "while\tMSFT fell.\n")]
+    assert text_of(cache.record("k", iter(chunks))) == text
+    assert cache.get("k") == text
+    assert text_of(cache.replay(cache.get("k"))) == text
+
+
+def test_unfinished_stream_is_not_cached(cache):
+    stream = cache.record("k", iter([make_chunk("partial"), make_chunk(" answer")]))
+    next(stream)
+    stream.close()
+    assert cache.get("k") is None
+
+
+def test_expired_answer_misses(cache):
+    cache.put("k", "text")
+    cache.ttl = 0
+    assert cache.get("k") is None
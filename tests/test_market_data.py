@@ -0,0 +1,65 @@
+import pandas as pd
+
+from luminafi.market_data import fetch_market_data, split_download
+
+
+def history(days=5, start=100.0):
+    close = [start + i for i in range(days)]
+    return pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close, 'Volume': [1000] * days},
+                        index=pd.DatetimeIndex(pd.date_range("2024-03-11", periods=days), name="Date"))
+
+
+def bulk(histories):
+    return pd.concat(histories, axis=1)
+
+
+class FakeClient:
+    timeout = 5.0
+
+    def __init__(self, bulk_frame):
+        self.bulk_frame = bulk_frame
+        self.history_calls = []
+
+    def download(self, symbols, **kwargs):
+        return self.bulk_frame
+
+    def history(self, symbol, **kwargs):
+        self.history_calls.append(symbol)
+        return history(start=200.0)
+
+    def info(self, symbol):
+        return {'symbol': symbol}
+
+    def search(self, query, **kwargs):
+        raise NotImplementedError
+
+
+def test_split_download_pads_missing_symbols():
+    histories = split_download(bulk({'AAA': history()}), ["AAA", "BBB"])
+    assert len(histories["AAA"]) == 5
+    assert histories["BBB"].empty
+
+
+def test_empty_bulk_download_falls_back_per_symbol():
+    client = FakeClient(pd.DataFrame())
+    data = fetch_market_data(client, ["AAA", "BBB"])
+    assert sorted(client.history_calls) == ["AAA", "BBB"]
+    for symbol in ("AAA", "BBB"):
+        assert len(data[symbol]['history']) == 5
+        assert data[symbol]['current_price'] == 204.0
+        assert data[symbol]['info'] == {'symbol': symbol}
+
+
+def test_partial_bulk_download_falls_back_for_missing_symbols():
+    client = FakeClient(bulk({'AAA': history()}))
+    data = fetch_market_data(client, ["AAA", "BBB"])
+    assert client.history_calls == ["BBB"]
+    assert data["AAA"]['current_price'] == 104.0
+    assert data["BBB"]['current_price'] == 204.0
+
+
+def test_failed_fallback_maps_to_none():
+    client = FakeClient(pd.DataFrame())
+    client.history = lambda symbol, **kwargs: 1 / 0
+    data = fetch_market_data(client, ["AAA"])
+    assert data == {"AAA": None}
@@ -0,0 +1,91 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from luminafi import news
+from luminafi.kvstore import KVStore
+from luminafi.news import NewsService, merge_articles
+
+
+class Clock:
+    # Starts at the real time: the store expires the URL index by its own clock
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakeClient:
+    def __init__(self, results):
+        self.results = results
+        self.searches = []
+
+    def search(self, query, **kwargs):
+        self.searches.append(query)
+        return SimpleNamespace(**self.results[query])
+
+
+def item(url, title="Headline", published=None):
+    return {'link': url, 'title': title, 'publisher': "Wire", 'providerPublishTime': published}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(news, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def service(tmp_path, clock):
+    path = str(tmp_path / "kv.db")
+    return NewsService(ttl=300, store=KVStore("news", path=path), url_index=KVStore("news_urls", path=path),
+                       index_max_age=86400)
+
+
+def test_results_are_cached_for_the_ttl(service, clock):
+    client = FakeClient({'AAPL': {'news': [item("https://a/1")], 'research': [item("https://a/r")]}})
+    assert [a['url'] for a in service.get(client, "AAPL")] == ["https://a/1", "https://a/r"]
+    clock.advance(299)
+    service.get(client, "AAPL")
+    assert client.searches == ["AAPL"]
+    clock.advance(1)
+    service.get(client, "AAPL")
+    assert client.searches == ["AAPL", "AAPL"]
+
+
+def test_url_index_keeps_the_first_symbol_and_time(service, clock):
+    client = FakeClient({'AAPL': {'news': [item("https://shared")]}, 'MSFT': {'news': [item("https://shared")]}})
+    first = service.get(client, "AAPL")[0]
+    clock.advance(60)
+    second = service.get(client, "MSFT")[0]
+    assert second['symbol'] == "AAPL"
+    assert second['publishedAt'] == first['publishedAt']
+
+
+def test_articles_keep_published_times():
+    published = item("https://a/1", published=1_600_000_000)
+    assert news._article(published, "AAPL", "AAPL News")['publishedAt'] == 1_600_000_000
+    assert news._article({'title': "No link"}, "AAPL", "AAPL News") is None
+
+
+def test_fetch_all_drops_duplicate_urls(service):
+    client = FakeClient({'AAPL': {'news': [item("https://shared"), item("https://a")]},
+                         'MSFT': {'news': [item("https://shared"), item("https://m")]}})
+    urls = [article['url'] for article in service.fetch_all(client, ["AAPL", "MSFT"], timeout=5)]
+    assert urls == ["https://shared", "https://a", "https://m"]
+
+
+def test_failed_search_gives_no_articles(service):
+    assert service.get(FakeClient({}), "AAPL", timeout=5) == []
+
+
+def test_merge_articles_keeps_first_occurrence():
+    merged = merge_articles([[{'url': "u1", 'symbol': "A"}, {'url': None}], None,
+                             [{'url': "u1", 'symbol': "B"}, {'url': "u2", 'symbol': "B"}]])
+    assert merged == [{'url': "u1", 'symbol': "A"}, {'url': "u2", 'symbol': "B"}]
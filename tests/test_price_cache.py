@@ -0,0 +1,110 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from luminafi.price_cache import CachedHistory, PriceCache, fetch_start, stitch
+
+
+def history(days=30, start="2024-01-01", offset=0.0):
+    close = np.linspace(100, 130, days) + offset
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                         'Volume': np.arange(days, dtype=np.int64) * 1000},
+                        index=pd.DatetimeIndex(pd.date_range(start, periods=days), name="Date"))
+
+
+def test_cache_write_and_read(tmp_path):
+    cache = PriceCache(directory=str(tmp_path))
+    fetched_at = time.time()
+    cache.write("AAPL", "1d", CachedHistory(history(), pd.Timestamp("2024-01-01"), fetched_at))
+    entry = PriceCache(directory=str(tmp_path)).read("AAPL")
+    assert len(entry.frame) == 30
+    assert entry.covered_from == pd.Timestamp("2024-01-01")
+    assert entry.fetched_at == pytest.approx(fetched_at)
+    assert cache.read("MSFT") is None
+
+
+def test_cache_sees_rewrites_of_the_same_size(tmp_path):
+    cache = PriceCache(directory=str(tmp_path))
+    cache.write("AAPL", "1d", CachedHistory(history(), None, time.time()))
+    assert cache.read("AAPL").frame['Close'].iloc[0] == pytest.approx(100.0)
+    # Another process rewrites the file with as many bars
+    PriceCache(directory=str(tmp_path)).write("AAPL", "1d", CachedHistory(history(offset=5), None, time.time()))
+    assert cache.read("AAPL").frame['Close'].iloc[0] == pytest.approx(105.0)
+
+
+def test_cache_reads_do_not_change_the_version(tmp_path):
+    cache = PriceCache(directory=str(tmp_path))
+    cache.write("AAPL", "1d", CachedHistory(history(), None, time.time()))
+    mtime = os.stat(cache.path("AAPL", "1d")).st_mtime_ns
+    hits = cache.store.counters['hits']
+    cache.read("AAPL")
+    cache.read("AAPL")
+    assert os.stat(cache.path("AAPL", "1d")).st_mtime_ns == mtime
+    assert cache.store.counters['hits'] == hits + 2
+
+
+def test_cache_evicts_least_recently_read(tmp_path):
+    cache = PriceCache(directory=str(tmp_path))
+    for i, symbol in enumerate(("AAPL", "MSFT", "NVDA")):
+        cache.write(symbol, "1d", CachedHistory(history(), None, time.time()))
+        os.utime(cache.path(symbol, "1d"), (1000 + i, 1000 + i))
+    cache.read("AAPL")
+    cache.max_bytes = 2 * os.path.getsize(cache.path("AAPL", "1d"))
+    cache.evict()
+    assert not os.path.exists(cache.path("MSFT", "1d"))
+    assert os.path.exists(cache.path("AAPL", "1d"))
+
+
+def test_stitch_keeps_last_bar_of_overlapping_windows():
+    first, second = history(10), history(10, start="2024-01-06", offset=1)
+    stitched = stitch([first, None, second])
+    assert len(stitched) == 15
+    assert stitched['Close'].iloc[5] == second['Close'].iloc[0]
+
+
+def test_fetch_start():
+    now = pd.Timestamp("2024-06-30")
+    assert fetch_start("1mo", now=now) == pd.Timestamp("2024-05-30")
+    assert fetch_start("max", now=now) is None
+
+
+class FakeClient:
+    timeout = 5.0
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.downloads = 0
+
+    def download(self, symbols, **kwargs):
+        self.downloads += 1
+        return self.frame
+
+
+def test_failed_tail_refresh_keeps_the_stale_entry(tmp_path):
+    cache = PriceCache(directory=str(tmp_path))
+    cache.write("AAPL", "1d", CachedHistory(history(), None, 1000.0))
+    client = FakeClient(pd.DataFrame())
+    histories = cache.fetch(client, ["AAPL"], period="max")
+    assert client.downloads == 1
+    assert len(histories["AAPL"]) == 30
+    # Still stale, so the next request tries again
+    assert cache.read("AAPL").fetched_at == 1000.0
+
+
+def test_failed_download_is_left_out(tmp_path):
+    cache = PriceCache(directory=str(tmp_path))
+    client = FakeClient(pd.concat({'AAPL': history()}, axis=1))
+    histories = cache.fetch(client, ["AAPL", "MSFT"], period="max")
+    assert list(histories) == ["AAPL"]
+    assert cache.read("MSFT") is None
+
+
+def test_lock_files_are_removed(tmp_path):
+    cache = PriceCache(directory=str(tmp_path))
+    cache.write("AAPL", "1d", CachedHistory(history(), None, time.time()))
+    cache.max_bytes = 0
+    cache.evict()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,100 @@
+import gc
+
+import pandas as pd
+import pytest
+
+from luminafi.price_store import PriceStore, to_series
+
+from test_price_cache import history
+
+
+@pytest.fixture(params=[False, True], ids=["memory", "mmap"])
+def store(request, tmp_path):
+    return PriceStore(directory=str(tmp_path / "store"), max_bytes=1 << 20, mmap=request.param)
+
+
+def test_series_roundtrip(store):
+    frame = history()
+    series = store.put("AAPL_1d", "v1", frame, fetched_at=123.0)
+    assert series.mapped is store.mmap
+    restored = series.frame()
+    pd.testing.assert_frame_equal(restored, frame, check_dtype=False, check_freq=False,
+                                  check_index_type=False)
+    assert list(restored.columns) == list(frame.columns)
+    assert series.fetched_at == 123.0
+
+
+def test_shared_arrays_are_read_only(store):
+    series = store.put("AAPL_1d", "v1", history())
+    with pytest.raises(ValueError):
+        series.values[0, 0] = 0
+    with pytest.raises(ValueError):
+        series.volume[0] = 0
+
+
+def test_writes_to_a_frame_do_not_reach_other_sessions(store):
+    series = store.put("AAPL_1d", "v1", history())
+    mine = series.frame()
+    mine.loc[mine.index[0], 'Close'] = -1.0
+    mine['Volume'] += 1
+    theirs = store.get("AAPL_1d", "v1").frame()
+    assert theirs['Close'].iloc[0] == pytest.approx(100.0)
+    assert theirs['Volume'].iloc[0] == 0
+
+
+def test_frame_stays_writable_after_eviction(tmp_path):
+    store = PriceStore(directory=str(tmp_path), max_bytes=1, mmap=False)
+    frame = store.put("AAPL_1d", "v1", history()).frame()
+    store.put("MSFT_1d", "v1", history())
+    assert store.report()['series'] == 1
+    frame.loc[frame.index[0], 'Close'] = -1.0
+    assert frame['Close'].iloc[0] == -1.0
+
+
+def test_store_version_mismatch_misses(store):
+    store.put("AAPL_1d", "v1", history())
+    assert store.get("AAPL_1d", "v1") is not None
+    assert store.get("AAPL_1d", "v2") is None
+
+
+def test_store_maps_files_written_by_another_process(tmp_path):
+    directory = str(tmp_path)
+    PriceStore(directory=directory, mmap=True).put("AAPL_1d", "v1", history(), fetched_at=5.0)
+    other = PriceStore(directory=directory, mmap=True)
+    series = other.get("AAPL_1d", "v1")
+    assert series is not None and series.mapped and series.fetched_at == 5.0
+    assert other.counters['loads'] == 1
+
+
+def test_store_budget_evicts_least_recently_used(tmp_path):
+    one = to_series(history(), "v").nbytes
+    store = PriceStore(directory=str(tmp_path), max_bytes=2 * one, mmap=False)
+    for key in ("A", "B"):
+        store.put(key, "v", history())
+    store.get("A", "v")
+    store.put("C", "v", history())
+    assert store.get("B", "v") is None
+    assert store.get("A", "v") is not None
+    assert store.counters['evictions'] == 1
+
+
+def test_timezone_survives_the_store(store):
+    frame = history()
+    frame.index = frame.index.tz_localize("America/New_York")
+    restored = store.put("AAPL_1h", "v1", frame).frame()
+    assert str(restored.index.tz) == "America/New_York"
+    assert restored.index[0] == frame.index[0]
+
+
+def test_evicted_series_arrays_are_never_written_through(tmp_path):
+    store = PriceStore(directory=str(tmp_path), max_bytes=1, mmap=False)
+    series = store.put("AAPL_1d", "v1", history())
+    values, close = series.values, series.columns.index('Close')
+    frame = series.frame().iloc[5:]
+    del series
+    store.put("MSFT_1d", "v1", history())
+    gc.collect()
+    # The columns still reference the shared arrays, so the write copies instead of failing
+    frame.loc[frame.index[0], 'Close'] = -1.0
+    assert frame['Close'].iloc[0] == -1.0
+    assert values[close, 5] == pytest.approx(history()['Close'].iloc[5])
@@ -0,0 +1,98 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from luminafi import prompts
+from luminafi.market_data import summarize_history
+from luminafi.metrics import compute_metrics
+from luminafi.prompts import (CONTEXT_MARGIN_TOKENS, DEFAULT_CONTEXT_TOKENS, MIN_OUTPUT_TOKENS,
+                              build_analysis_prompt, choose_max_tokens, count_tokens)
+
+INFO = {'marketCap': 2.5e12, 'trailingPE': 28.4, 'fiftyTwoWeekHigh': 199.6, 'fiftyTwoWeekLow': 164.1}
+
+
+def data(symbols=("AAPL", "MSFT", "NVDA"), days=300):
+    rng = np.random.default_rng(1)
+    index = pd.date_range("2023-01-02", periods=days, freq="B", name="Date")
+    records = {}
+    for symbol in symbols:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, days)))
+        hist = pd.DataFrame({'Close': close, 'Volume': rng.integers(1_000, 2_000, days)}, index=index)
+        records[symbol] = summarize_history(hist, INFO)
+    return records
+
+
+@pytest.fixture(autouse=True)
+def no_tiktoken(monkeypatch):
+    # Count four characters per token whether or not tiktoken is installed
+    monkeypatch.setattr(prompts, "_encoding", lambda: None)
+
+
+def test_four_characters_per_token_without_tiktoken(monkeypatch):
+    monkeypatch.undo()
+    monkeypatch.setitem(sys.modules, "tiktoken", None)
+    prompts._encoding.cache_clear()
+    try:
+        assert prompts._encoding() is None
+        assert count_tokens("") == 0
+        assert count_tokens("abcd") == 1
+        assert count_tokens("abcde") == 2
+    finally:
+        prompts._encoding.cache_clear()
+
+
+def test_tiktoken_counts_when_available(monkeypatch):
+    class Encoding:
+        def encode(self, text):
+            return text.split()
+
+    monkeypatch.setattr(prompts, "_encoding", lambda: Encoding())
+    assert count_tokens("three short words") == 3
+
+
+def test_choose_max_tokens():
+    assert choose_max_tokens("unknown", 1000, 4096) == 4096
+    assert choose_max_tokens("unknown", 6000, 4096) == DEFAULT_CONTEXT_TOKENS - 6000 - CONTEXT_MARGIN_TOKENS
+    assert choose_max_tokens("unknown", 8100, 4096) == MIN_OUTPUT_TOKENS
+    assert choose_max_tokens("meta-llama/Llama-Vision-Free", 100_000, 4096) == 4096
+
+
+def test_everything_fits_a_large_budget():
+    records = data()
+    prompt = build_analysis_prompt(records, "compare", compute_metrics(records), budget=100_000)
+    assert prompt.dropped == [] and not prompt.over_budget
+    assert prompt.tokens == count_tokens(prompt.text)
+    assert "Return correlation" in prompt.text and "Rolling" in prompt.text
+    assert "|".join(["Symbol"] + [column[0] for column in prompts.COLUMNS]) in prompt.text
+
+
+def test_columns_are_dropped_lowest_priority_first():
+    records = data()
+    metrics = compute_metrics(records)
+    full = build_analysis_prompt(records, "compare", metrics, budget=100_000)
+    prompt = build_analysis_prompt(records, "compare", metrics, budget=full.tokens - 1)
+    assert prompt.dropped == ["AvgVol"]
+    assert prompt.tokens <= prompt.budget
+
+    prompt = build_analysis_prompt(records, "compare", metrics, budget=150)
+    assert prompt.dropped[:5] == ["AvgVol", "VolTrend", "52wH", "52wL", "Chg$"]
+    assert prompt.dropped.index("rolling correlation") < prompt.dropped.index("correlation")
+    assert prompt.tokens <= 150
+    header = next(line for line in prompt.text.splitlines() if line.startswith("Symbol|"))
+    assert header.startswith("Symbol|Price|Chg%")
+
+
+def test_price_and_change_are_always_kept():
+    prompt = build_analysis_prompt(data(), "compare", budget=1)
+    assert prompt.over_budget
+    assert "Symbol|Price|Chg%\n" in prompt.text
+    assert "Price" not in prompt.dropped and "Chg%" not in prompt.dropped
+
+
+def test_symbols_without_data_are_listed():
+    records = data(("AAPL",))
+    records["BAD"] = None
+    prompt = build_analysis_prompt(records, "compare", budget=100_000)
+    assert "Unable to fetch data: BAD" in prompt.text
@@ -0,0 +1,180 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from luminafi import price_cache
+from luminafi.finance_workflow import FinanceWorkflow
+from luminafi.llm_cache import make_chunk
+from luminafi.pipeline import run_item
+from luminafi.price_cache import PriceCache
+from luminafi.replay import (Cassette, CassetteMiss, RecordingMarketClient, RecordingTogether, ReplayMarketClient,
+                             ReplayTogether, chat_key)
+from luminafi.resilience import Upstream
+
+# The day the cassettes below pretend to have been recorded
+RECORDED = pd.Timestamp("2024-03-15")
+
+
+@pytest.fixture(autouse=True)
+def unpin_today():
+    yield
+    price_cache.pin_today(None)
+
+
+class FakeMarket:
+    timeout = 5.0
+
+    def __init__(self, end=RECORDED):
+        self.end = end
+
+    def frame(self, symbol, days=400):
+        index = pd.bdate_range(end=self.end, periods=days, name="Date")
+        close = 100 + np.cumsum(np.random.default_rng(len(symbol)).normal(size=days))
+        return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                             'Volume': np.full(days, 1000.0)}, index=index)
+
+    def download(self, symbols, **kwargs):
+        return pd.concat({symbol: self.frame(symbol) for symbol in symbols}, axis=1)
+
+    def history(self, symbol, **kwargs):
+        return self.frame(symbol)
+
+    def info(self, symbol):
+        return {'marketCap': 1e12, 'trailingPE': 25.0}
+
+    def search(self, query, **kwargs):
+        return SimpleNamespace(news=[{'title': f"{query} news", 'link': f"https://news/{query}"}], research=[])
+
+    def close(self):
+        pass
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        usage = SimpleNamespace(prompt_tokens=11, completion_tokens=4)
+        if kwargs.get('stream'):
+            return iter([make_chunk("Analysis "), make_chunk("of **AAPL**"), SimpleNamespace(choices=[], usage=usage)])
+        message = SimpleNamespace(content='["AAPL", "MSFT"]')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def fake_together():
+    return SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions()))
+
+
+def messages(text, image=None):
+    content = [{'type': "text", 'text': text}]
+    if image:
+        content.append({'type': "image_url", 'image_url': {'url': image}})
+    return [{'role': "system", 'content': "You are an analyst."}, {'role': "user", 'content': content}]
+
+
+def test_market_responses_replay_from_disk(tmp_path):
+    path = str(tmp_path / "cassette.json.gz")
+    cassette = Cassette(path)
+    market = FakeMarket()
+    recorder = RecordingMarketClient(market, cassette)
+    recorder.download(["AAPL", "MSFT"], period="1y", interval="1d", group_by='ticker')
+    recorder.history("NVDA", period="1mo")
+    recorder.info("AAPL")
+    recorder.search("AAPL")
+    recorder.close()
+
+    replay = ReplayMarketClient(Cassette(path))
+    bulk = replay.download(["AAPL", "MSFT"], period="1y", interval="1d")
+    pd.testing.assert_frame_equal(bulk["MSFT"], market.frame("MSFT"), check_freq=False, check_names=False,
+                                  check_index_type=False)
+    pd.testing.assert_frame_equal(replay.history("AAPL", period="1y"), market.frame("AAPL"), check_freq=False,
+                                  check_index_type=False)
+    assert len(replay.history("NVDA", period="1mo")) == 400
+    # A range that was not recorded is cut from the longest recording of the symbol
+    assert replay.history("AAPL", start="2024-03-01").index[0] == pd.Timestamp("2024-03-01")
+    assert replay.info("AAPL") == market.info("AAPL")
+    assert replay.search("AAPL").news == market.search("AAPL").news
+
+
+def test_chat_replays_streamed_and_plain_completions(tmp_path):
+    cassette = Cassette(str(tmp_path / "cassette.json.gz"))
+    recorder = RecordingTogether(fake_together(), cassette)
+    plain = recorder.chat.completions.create(model="m", messages=messages("symbols?"))
+    streamed = list(recorder.chat.completions.create(model="m", messages=messages("analyze", "data:a"), stream=True))
+    recorder.close()
+
+    replay = ReplayTogether(Cassette(cassette.path))
+    answer = replay.chat.completions.create(model="m", messages=messages("symbols?"))
+    assert answer.choices[0].message.content == plain.choices[0].message.content
+    assert answer.usage.prompt_tokens == 11
+    # Images are not part of the key, so a re-rendered chart still replays
+    chunks = list(replay.chat.completions.create(model="m", messages=messages("analyze", "data:b"), stream=True))
+    assert [c.choices[0].delta.content for c in chunks if c.choices] == ["Analysis ", "of **AAPL**"]
+    assert chunks[-1].usage.completion_tokens == streamed[-1].usage.completion_tokens
+
+
+def test_chat_key_depends_on_model_stream_and_text():
+    base = {'model': "m", 'messages': messages("analyze")}
+    keys = {chat_key(base), chat_key({**base, 'stream': True}), chat_key({**base, 'model': "n"}),
+            chat_key({**base, 'messages': messages("analyze more")})}
+    assert len(keys) == 4
+    assert chat_key({**base, 'temperature': 0.1}) == chat_key(base)
+
+
+def test_cassette_miss_is_a_404_that_is_not_retried(tmp_path):
+    replay = ReplayMarketClient(Cassette(str(tmp_path / "empty.json.gz")))
+    calls = []
+
+    def info(symbol):
+        calls.append(symbol)
+        return replay.info(symbol)
+
+    upstream = Upstream("replay-test", retries=3, base_delay=0.001)
+    with pytest.raises(CassetteMiss) as error:
+        upstream.call(info, "ZZZZ")
+    assert error.value.status_code == 404
+    assert calls == ["ZZZZ"]
+    with pytest.raises(CassetteMiss):
+        ReplayTogether(Cassette(str(tmp_path / "empty.json.gz"))).chat.completions.create(model="m", messages=[])
+
+
+def test_recording_time_is_kept(tmp_path):
+    cassette = Cassette(str(tmp_path / "cassette.json.gz"))
+    assert cassette.recorded_at is None
+    cassette.put("info", "AAPL", {})
+    recorded_at = cassette.recorded_at
+    assert recorded_at is not None
+    cassette.save()
+    assert Cassette(cassette.path).recorded_at == recorded_at
+
+
+def run_workflow(together_client, market, cache_dir):
+    workflow = FinanceWorkflow(together_client=together_client, market=market)
+    workflow.price_cache = PriceCache(directory=cache_dir)
+    workflow.llm_cache.get = lambda key: None
+    return run_item(workflow, "Compare AAPL and MSFT", period="1mo", news=False)
+
+
+def test_replay_after_the_recording_day_matches(tmp_path):
+    path = str(tmp_path / "cassette.json.gz")
+    cassette = Cassette(path)
+    # Record as if it were the recording day
+    price_cache.pin_today(RECORDED)
+    recorded = run_workflow(RecordingTogether(fake_together(), cassette), RecordingMarketClient(FakeMarket(), cassette),
+                            str(tmp_path / "record"))
+    cassette.recorded_at = RECORDED.timestamp()
+    cassette.save()
+    assert recorded['status'] == 'ok' and recorded['analysis']
+
+    # Replay today, long after the recording day
+    price_cache.pin_today(None)
+    replayed_cassette = Cassette(path)
+    replayed = run_workflow(ReplayTogether(replayed_cassette), ReplayMarketClient(replayed_cassette),
+                            str(tmp_path / "replay"))
+    assert replayed['status'] == 'ok', replayed['error']
+    assert replayed['analysis'] == recorded['analysis']
+    assert replayed['summary'] == recorded['summary']
+    assert price_cache.today() == RECORDED
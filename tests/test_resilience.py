@@ -0,0 +1,147 @@
+import random
+
+import pytest
+
+from luminafi.resilience import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, RateLimitedError,
+                                 TokenBucket, Upstream, backoff_delay, is_retryable)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_is_retryable():
+    assert is_retryable(ConnectionError())
+    assert is_retryable(HTTPError(503))
+    assert is_retryable(HTTPError(429))
+    assert not is_retryable(HTTPError(404))
+    assert not is_retryable(CircuitOpenError())
+
+
+def test_backoff_delay_is_capped_full_jitter():
+    rng = random.Random(0)
+    delays = [backoff_delay(attempt, 0.5, 4.0, rng) for attempt in range(10) for _ in range(20)]
+    assert min(delays) >= 0 and max(delays) <= 4.0
+    assert all(backoff_delay(0, 0.5, 4.0, rng) <= 0.5 for _ in range(20))
+
+
+def test_token_bucket_refills_at_rate():
+    clock = Clock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock, sleep=clock.sleep)
+    assert bucket.try_acquire() == 0.0 and bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == pytest.approx(0.5)
+    assert bucket.acquire() == pytest.approx(0.5)
+    with pytest.raises(RateLimitedError):
+        bucket.acquire(timeout=0.1)
+    assert TokenBucket(rate=0, burst=1).try_acquire(100) == 0.0
+
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    assert breaker.retry_after() == pytest.approx(10)
+
+    clock.now = 10
+    assert breaker.allow()  # the one trial call
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.opens == 2
+
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.failures == 0 and breaker.allow()
+
+
+def upstream(**kwargs):
+    settings = dict(retries=2, base_delay=0.01, max_delay=0.01, failure_threshold=3, reset_timeout=30,
+                    sleep=lambda seconds: None)
+    settings.update(kwargs)
+    return Upstream("test", **settings)
+
+
+def test_retries_transient_errors():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("reset")
+        return "ok"
+
+    guard = upstream()
+    assert guard.call(flaky) == "ok"
+    metrics = guard.metrics()
+    assert (metrics['retries'], metrics['failures'], metrics['successes']) == (2, 2, 1)
+    assert metrics['state'] == CLOSED
+
+
+def test_client_errors_are_not_retried_and_do_not_trip_the_breaker():
+    calls = []
+
+    def not_found():
+        calls.append(1)
+        raise HTTPError(404)
+
+    guard = upstream(failure_threshold=1)
+    for _ in range(3):
+        with pytest.raises(HTTPError):
+            guard.call(not_found)
+    assert len(calls) == 3
+    assert guard.metrics()['state'] == CLOSED and guard.metrics()['errors'] == 3
+
+
+def test_breaker_fails_fast_once_open():
+    calls = []
+
+    def down():
+        calls.append(1)
+        raise ConnectionError("down")
+
+    guard = upstream(retries=1, failure_threshold=2)
+    with pytest.raises(ConnectionError):
+        guard.call(down)
+    assert guard.metrics()['state'] == OPEN
+    with pytest.raises(CircuitOpenError):
+        guard.call(down)
+    assert len(calls) == 2
+    assert guard.metrics()['rejected'] == 1
+
+
+def test_hedged_call_returns_the_faster_copy():
+    import threading
+
+    first = threading.Event()
+    calls = []
+
+    def slow_then_fast():
+        calls.append(1)
+        if len(calls) == 1:
+            first.wait(5)
+            return "slow"
+        return "fast"
+
+    guard = upstream(rate=100, burst=10, hedge_after=0.05)
+    try:
+        assert guard.call(slow_then_fast, hedge=True) == "fast"
+    finally:
+        first.set()
+    assert guard.metrics()['hedges'] == 1 and guard.metrics()['hedge_wins'] == 1
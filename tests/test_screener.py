@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from luminafi import screener
+
+
+def closes(values, start="2024-01-01"):
+    return pd.DataFrame({'Close': values}, index=pd.bdate_range(start, periods=len(values)))
+
+
+def test_parse_universe_csv_column():
+    text = "Name,Symbol,Weight\nApple,AAPL,7\nBerkshire,brk-b,2\n# comment\nApple again,AAPL,1\n"
+    assert screener.parse_universe(text) == ["AAPL", "BRK-B"]
+
+
+def test_parse_universe_plain_lists():
+    assert screener.parse_universe("AAPL, MSFT\n$NVDA SPY\nnot a ticker\n^GSPC") == ["AAPL", "MSFT", "NVDA", "SPY",
+                                                                                    "^GSPC"]
+    assert screener.parse_universe("") == []
+
+
+def test_known_universe():
+    universe = screener.known_universe()
+    assert "AAPL" in universe and len(universe) == len(set(universe))
+
+
+def test_close_matrix_aligns_calendars():
+    matrix, symbols = screener.close_matrix({
+        'A': closes([1.0, 2.0, 3.0]),
+        'B': closes([10.0, 20.0], start="2024-01-02"),
+        'C': pd.DataFrame(),
+    })
+    assert symbols == ["A", "B"]
+    assert matrix.shape == (3, 2)
+    assert np.isnan(matrix[0, 1]) and matrix[2, 1] == 20.0
+
+
+def test_rank_orders_by_metric():
+    days = 300
+    growth = {'UP': 0.002, 'FLAT': 0.0, 'DOWN': -0.002}
+    histories = {symbol: closes(100 * np.exp(rate * np.arange(days))) for symbol, rate in growth.items()}
+    histories['SHORT'] = closes(np.ones(screener.MIN_BARS - 1))
+    table = screener.rank(histories, "total_return")
+    assert list(table.index) == ["UP", "FLAT", "DOWN"]
+    assert list(table['rank']) == [1, 2, 3]
+    assert table.loc['UP', 'total_return'] == pytest.approx(np.exp(0.002 * (days - 1)) - 1)
+    assert table.loc['FLAT', 'max_drawdown'] == 0
+    assert table.loc['DOWN', 'max_drawdown'] < 0
+
+    by_volatility = screener.rank(histories, "ann_volatility")
+    assert by_volatility['ann_volatility'].is_monotonic_increasing
+
+
+def test_rank_momentum_skips_the_last_month():
+    days = 300
+    values = np.r_[np.linspace(100, 200, days - screener.MONTH), np.full(screener.MONTH, 50.0)]
+    table = screener.rank({'X': closes(values)})
+    start = values[-1 - screener.TRADING_DAYS] if days > screener.TRADING_DAYS else values[0]
+    assert table.loc['X', 'momentum'] == pytest.approx(values[-1 - screener.MONTH] / start - 1)
+    assert table.loc['X', 'return_1m'] < 0
+
+
+def test_rank_empty():
+    table = screener.rank({})
+    assert table.empty and "momentum" in table.columns
+
+
+def test_screen_query_names_the_leaders():
+    table = screener.rank({symbol: closes(100 * np.exp(rate * np.arange(100)))
+                           for symbol, rate in {'A': 0.003, 'B': 0.001}.items()})
+    result = screener.ScreenResult(table=table, universe=["A", "B", "C"], missing=["C"], period="1y",
+                                   sort_by="momentum", seconds=0.1)
+    assert result.top(1) == ["A"]
+    assert "top 2 of 2 tickers" in screener.screen_query(result, 2)
+
+
+class ChunkCache:
+    def __init__(self, failing):
+        self.failing = failing
+        self.chunks = []
+
+    def fetch(self, client, symbols, period):
+        self.chunks.append(list(symbols))
+        if self.failing in symbols:
+            raise ConnectionError("bulk download failed")
+        return {symbol: closes([1.0, 2.0]) for symbol in symbols}
+
+
+def test_fetch_universe_in_chunks_leaves_failed_chunks_out():
+    cache, progress = ChunkCache(failing="E"), []
+    histories = screener.fetch_universe(cache, None, list("ABCDE"), chunk_size=2, max_workers=2,
+                                        on_chunk=lambda done, total: progress.append((done, total)))
+    assert sorted(map(sorted, cache.chunks)) == [["A", "B"], ["C", "D"], ["E"]]
+    assert sorted(histories) == ["A", "B", "C", "D"]
+    assert sorted(progress)[-1] == (5, 5) and len(progress) == 3
@@ -0,0 +1,240 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from luminafi.singleflight import FileLock, SharedStream, SingleFlight
+
+pytest.importorskip("fcntl")
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def hold_lock(path, locked, release):
+    lock = FileLock(path, timeout=5)
+    lock.acquire()
+    locked.set()
+    release.wait(5)
+    lock.release()
+
+
+def test_lock_file_is_removed_on_release(tmp_path):
+    path = str(tmp_path / "key.lock")
+    lock = FileLock(path, timeout=1)
+    assert lock.acquire()
+    assert os.path.exists(path)
+    lock.release()
+    assert not os.path.exists(path)
+
+
+def test_lock_is_exclusive_across_processes(tmp_path):
+    path = str(tmp_path / "key.lock")
+    context = multiprocessing.get_context("fork")
+    locked, release = context.Event(), context.Event()
+    holder = context.Process(target=hold_lock, args=(path, locked, release))
+    holder.start()
+    try:
+        assert locked.wait(5)
+        # Gives up after the timeout; the caller then goes ahead unlocked
+        started = time.monotonic()
+        assert not FileLock(path, timeout=0.2).acquire()
+        assert time.monotonic() - started >= 0.2
+        release.set()
+        lock = FileLock(path, timeout=5)
+        assert lock.acquire()
+        lock.release()
+    finally:
+        release.set()
+        holder.join(5)
+
+
+def test_waiter_starts_over_on_a_deleted_lock_file(tmp_path):
+    path = str(tmp_path / "key.lock")
+    first, second, third = FileLock(path, 5), FileLock(path, 5), FileLock(path, 0.1)
+    assert first.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(second.acquire()))
+    waiter.start()
+    time.sleep(0.1)  # the waiter has opened the file the first holder is about to delete
+    first.release()
+    waiter.join(5)
+    assert acquired == [True]
+    # The waiter holds the file now at the path, not the deleted one, so it still excludes others
+    assert os.stat(path).st_ino == os.fstat(second._handle.fileno()).st_ino
+    assert not third.acquire()
+    second.release()
+
+
+def flight(tmp_path, wait=5.0):
+    return SingleFlight("test", cross_process=True, lock_dir=str(tmp_path), wait=wait)
+
+
+def run_concurrently(count, func):
+    results, threads = [None] * count, []
+    for i in range(count):
+        def call(i=i):
+            try:
+                results[i] = func()
+            except Exception as e:
+                results[i] = e
+        threads.append(threading.Thread(target=call))
+        threads[-1].start()
+    return results, threads
+
+
+def test_concurrent_calls_share_one_result(tmp_path):
+    group, release, calls = flight(tmp_path), threading.Event(), []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return {"bars": 1}
+
+    results, threads = run_concurrently(5, lambda: group.do("AAPL", work, recheck=lambda: None))
+    assert wait_for(lambda: group.counters['shared'] == 4)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert group.metrics()['in_flight'] == 0
+
+
+def test_errors_reach_every_waiter(tmp_path):
+    group, release = flight(tmp_path), threading.Event()
+
+    def work():
+        release.wait(5)
+        raise ValueError("upstream down")
+
+    results, threads = run_concurrently(3, lambda: group.do("AAPL", work))
+    assert wait_for(lambda: group.counters['shared'] == 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len({id(result) for result in results}) == 1
+    # The failed call is forgotten, so the next one tries again
+    assert group.do("AAPL", lambda: "ok") == "ok"
+
+
+def test_other_process_result_is_rechecked_under_the_lock(tmp_path):
+    # Two groups on one lock directory stand in for two worker processes
+    first, second = flight(tmp_path), flight(tmp_path)
+    stored, release = {}, threading.Event()
+
+    def work():
+        release.wait(5)
+        stored['AAPL'] = "bars"
+        return "bars"
+
+    leader = threading.Thread(target=first.do, args=("AAPL", work), kwargs={'recheck': lambda: stored.get('AAPL')})
+    leader.start()
+    assert wait_for(lambda: first.counters['leaders'] == 1)
+    results, threads = run_concurrently(1, lambda: second.do("AAPL", lambda: "again",
+                                                             recheck=lambda: stored.get('AAPL')))
+    time.sleep(0.1)
+    release.set()
+    leader.join(5)
+    threads[0].join(5)
+    assert results == ["bars"]
+    assert second.counters == {'leaders': 0, 'shared': 0, 'rechecked': 1}
+
+
+def test_lock_timeout_goes_ahead_alone(tmp_path):
+    first, second = flight(tmp_path), flight(tmp_path, wait=0.1)
+    release = threading.Event()
+    leader = threading.Thread(target=first.do, args=("AAPL", lambda: release.wait(5)), kwargs={'recheck': lambda: None})
+    leader.start()
+    assert wait_for(lambda: first.counters['leaders'] == 1)
+    try:
+        assert second.do("AAPL", lambda: "alone", recheck=lambda: None) == "alone"
+        assert second.counters['leaders'] == 1
+    finally:
+        release.set()
+        leader.join(5)
+
+
+def test_shared_stream_late_reader_starts_from_the_beginning():
+    stream = SharedStream(iter("abc"))
+    first = stream.reader()
+    assert next(first) == "a"
+    assert list(stream.reader()) == ["a", "b", "c"]
+    assert list(first) == ["b", "c"]
+
+
+def test_shared_stream_closes_its_source_once_abandoned():
+    closed = []
+
+    def source():
+        try:
+            yield from range(100)
+        finally:
+            closed.append(True)
+
+    stream = SharedStream(source(), on_close=lambda: closed.append("on_close"))
+    first, second = stream.reader(), stream.reader()
+    assert next(first) == 0 and next(second) == 0
+    first.close()
+    assert closed == []
+    second.close()
+    assert closed == [True, "on_close"]
+    with pytest.raises(RuntimeError):
+        list(stream.reader())
+
+
+def test_shared_stream_errors_reach_every_reader():
+    def source():
+        yield 1
+        raise ConnectionError("stream cut")
+
+    stream = SharedStream(source())
+    readers = [stream.reader(), stream.reader()]
+    for reader in readers:
+        assert next(reader) == 1
+    for reader in readers:
+        with pytest.raises(ConnectionError):
+            next(reader)
+
+
+def test_stream_calls_share_one_source_until_it_ends(tmp_path):
+    group, opened = flight(tmp_path), []
+
+    def open_stream():
+        opened.append(1)
+        return iter(["Analysis ", "of AAPL"])
+
+    first = group.stream("prompt", open_stream, recheck=lambda: None)
+    second = group.stream("prompt", open_stream, recheck=lambda: None)
+    assert "".join(first) == "Analysis of AAPL"
+    assert "".join(second) == "Analysis of AAPL"
+    assert len(opened) == 1
+    # Read to the end, the key and its lock are released
+    assert group.metrics()['in_flight'] == 0
+    assert os.listdir(tmp_path) == []
+    assert "".join(group.stream("prompt", open_stream)) == "Analysis of AAPL"
+    assert len(opened) == 2
+
+
+def test_stream_open_errors_reach_waiters(tmp_path):
+    group, release = flight(tmp_path), threading.Event()
+
+    def open_stream():
+        release.wait(5)
+        raise TimeoutError("no answer")
+
+    results, threads = run_concurrently(2, lambda: group.stream("prompt", open_stream))
+    assert wait_for(lambda: group.counters['shared'] == 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert all(isinstance(result, TimeoutError) for result in results)
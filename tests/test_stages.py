@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from luminafi.stages import StageGraph, StageMemo, on_loop
+
+
+def test_order_and_validation():
+    graph = StageGraph().add("c", lambda a, b: a + b, ("a", "b")).add("a", lambda: 1).add("b", lambda: 2)
+    order = graph.order()
+    assert order.index("c") > order.index("a") and order.index("c") > order.index("b")
+    with pytest.raises(ValueError):
+        graph.add("a", lambda: 0)
+    with pytest.raises(ValueError, match="unknown"):
+        StageGraph().add("x", lambda y: y, ("y",)).order()
+    with pytest.raises(ValueError, match="cycle"):
+        StageGraph().add("x", lambda y: y, ("y",)).add("y", lambda x: x, ("x",)).order()
+
+
+def test_results_flow_along_dependencies():
+    graph = (StageGraph()
+             .add("prices", lambda: [1, 2, 3])
+             .add("news", lambda: ["headline"])
+             .add("prompt", lambda prices, news: f"{sum(prices)} {news[0]}", ("prices", "news")))
+    run = graph.run_sync()
+    assert run.results["prompt"] == "6 headline"
+    assert all(timing.status == "ok" for timing in run.timings.values())
+    assert run.critical_path()[-1] == "prompt"
+
+
+def test_independent_stages_overlap():
+    graph = StageGraph()
+    for name in ("a", "b", "c"):
+        graph.add(name, lambda: time.sleep(0.2))
+    started = time.perf_counter()
+    graph.run_sync()
+    assert time.perf_counter() - started < 0.5
+
+
+def test_failure_skips_dependents_only():
+    def fail():
+        raise RuntimeError("upstream down")
+
+    async def coroutine():
+        return "async"
+
+    graph = (StageGraph()
+             .add("prices", fail)
+             .add("chart", lambda prices: prices, ("prices",))
+             .add("news", coroutine))
+    run = graph.run_sync()
+    assert isinstance(run.errors["prices"], RuntimeError)
+    assert run.timings["chart"].status == "skipped"
+    assert run.results["news"] == "async"
+    rows = {row['stage']: row['status'] for row in run.timing_table()}
+    assert rows == {'prices': 'failed', 'chart': 'skipped', 'news': 'ok'}
+
+
+def test_memo_reuses_keyed_stages_without_their_dependencies():
+    calls = []
+
+    def stage(name, value):
+        def func(*args):
+            calls.append(name)
+            return value
+        return func
+
+    def graph(period):
+        return (StageGraph()
+                .add("fetch", stage("fetch", {"AAPL": period}), key=("AAPL", period))
+                .add("news", stage("news", ["headline"]), key=("AAPL",))
+                .add("empty", stage("empty", None), key=("AAPL",))
+                .add("prompt", stage("prompt", "prompt"), ("fetch", "news")))
+
+    memo = StageMemo()
+    graph("1y").run_sync(memo=memo)
+    run = graph("1y").run_sync(memo=memo)
+    assert run.timings["fetch"].status == "cached" and run.timings["news"].status == "cached"
+    # None results are not memoized
+    assert run.timings["empty"].status == "ok"
+    assert calls.count("fetch") == 1 and calls.count("empty") == 2 and calls.count("prompt") == 2
+
+    run = graph("5y").run_sync(memo=memo)
+    assert run.timings["fetch"].status == "ok" and run.timings["news"].status == "cached"
+    assert run.results["fetch"] == {"AAPL": "5y"}
+
+
+def test_memo_ttl_and_per_stage_limit():
+    memo = StageMemo(per_stage=2, ttl=60)
+    for key in ("a", "b", "c"):
+        memo.put("fetch", key, key)
+    assert memo.get("fetch", "a") is None
+    assert memo.get("fetch", "c") == "c"
+    memo.ttl = 0
+    assert memo.get("fetch", "c") is None
+
+
+def test_memo_keep_predicate():
+    memo = StageMemo()
+    StageGraph().add("fetch", lambda: {}, key="k", keep=bool).run_sync(memo=memo)
+    assert memo.get("fetch", "k") is None
+
+
+def test_on_loop_delivers_progress_on_the_loop_thread():
+    threads = []
+    progress = on_loop(lambda done: threads.append((done, threading.get_ident())))
+
+    def fetch():
+        for done in range(3):
+            progress(done)
+        return "ok"
+
+    async def main():
+        loop_thread = threading.get_ident()
+        await StageGraph().add("fetch", fetch).run()
+        await asyncio.sleep(0)
+        return loop_thread
+
+    loop_thread = asyncio.run(main())
+    assert [done for done, _ in threads] == [0, 1, 2]
+    assert {thread for _, thread in threads} == {loop_thread}
@@ -0,0 +1,95 @@
+import pytest
+
+from luminafi.replay import Cassette, RecordingMarketClient, RecordingTogether
+from luminafi.resilience import Upstream
+from luminafi.standin import StandInHTTPError, StandInMarketClient, StandInServer
+
+from test_replay import FakeMarket, fake_together, messages
+
+together = pytest.importorskip("together")
+
+
+@pytest.fixture(scope="module")
+def cassette(tmp_path_factory):
+    cassette = Cassette(str(tmp_path_factory.mktemp("standin") / "cassette.json.gz"))
+    market = RecordingMarketClient(FakeMarket(), cassette)
+    market.download(["AAPL", "MSFT"], period="1y", interval="1d")
+    market.info("AAPL")
+    market.search("AAPL")
+    llm = RecordingTogether(fake_together(), cassette)
+    llm.chat.completions.create(model="m", messages=messages("symbols?"))
+    list(llm.chat.completions.create(model="m", messages=messages("analyze"), stream=True))
+    return cassette
+
+
+def sdk(server):
+    # The SDK's own retries are off; the resilience layer retries instead
+    return together.Together(api_key="standin", base_url=f"{server.url}/v1", max_retries=0)
+
+
+def upstream(retries=3):
+    return Upstream("standin-test", retries=retries, base_delay=0.001, failure_threshold=100)
+
+
+def test_together_sdk_against_the_stand_in(cassette):
+    with StandInServer(cassette) as server:
+        client = sdk(server)
+        answer = client.chat.completions.create(model="m", messages=messages("symbols?"))
+        assert answer.choices[0].message.content == '["AAPL", "MSFT"]'
+        assert answer.usage.prompt_tokens == 11
+        stream = client.chat.completions.create(model="m", messages=messages("analyze"), stream=True)
+        assert "".join(chunk.choices[0].delta.content for chunk in stream if chunk.choices) == "Analysis of **AAPL**"
+
+
+def test_market_client_against_the_stand_in(cassette):
+    with StandInServer(cassette) as server:
+        market = StandInMarketClient(server.url, upstream=upstream())
+        frame = market.download(["AAPL", "MSFT", "ZZZZ"], period="1y", interval="1d")
+        assert sorted(set(frame.columns.get_level_values(0))) == ["AAPL", "MSFT"]
+        assert len(market.history("AAPL", period="1y")) == 400
+        assert market.info("AAPL")['trailingPE'] == 25.0
+        assert market.search("AAPL").news[0]['link'] == "https://news/AAPL"
+        market.close()
+
+
+def test_cassette_miss_is_not_retried(cassette):
+    with StandInServer(cassette) as server:
+        market = StandInMarketClient(server.url, upstream=upstream())
+        with pytest.raises(StandInHTTPError) as error:
+            market.info("ZZZZ")
+        assert error.value.status_code == 404
+        assert server.stats()['requests'] == 1
+        with pytest.raises(together.APIStatusError) as error:
+            upstream().call(sdk(server).chat.completions.create, model="m", messages=messages("unrecorded"))
+        assert error.value.status_code == 404
+        assert server.stats()['requests'] == 2
+        market.close()
+
+
+def test_injected_errors_are_retried(cassette):
+    with StandInServer(cassette, error_rate=0.5, seed=3) as server:
+        market = StandInMarketClient(server.url, upstream=upstream(retries=10))
+        for _ in range(5):
+            assert market.info("AAPL")['marketCap'] == 1e12
+        llm = upstream(retries=10)
+        for _ in range(5):
+            answer = llm.call(sdk(server).chat.completions.create, model="m", messages=messages("symbols?"))
+            assert answer.choices[0].message.content == '["AAPL", "MSFT"]'
+        stats = server.stats()
+        assert stats['errors'] > 0
+        assert stats['requests'] == 10 + stats['errors']
+        assert market.upstream.counters['retries'] + llm.counters['retries'] == stats['errors']
+        market.close()
+
+
+def test_injected_errors_surface_once_retries_run_out(cassette):
+    with StandInServer(cassette, error_rate=1.0, error_status=503) as server:
+        market = StandInMarketClient(server.url, upstream=upstream(retries=2))
+        with pytest.raises(StandInHTTPError) as error:
+            market.info("AAPL")
+        assert error.value.status_code == 503
+        with pytest.raises(together.APIStatusError) as error:
+            upstream(retries=2).call(sdk(server).chat.completions.create, model="m", messages=messages("symbols?"))
+        assert error.value.status_code == 503
+        assert server.stats()['errors'] == 6
+        market.close()
@@ -0,0 +1,85 @@
+import pytest
+
+from luminafi.llm_cache import make_chunk
+from luminafi.streaming import StreamRenderer, chunk_text, split_complete
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Placeholder:
+    def __init__(self):
+        self.renders = []
+
+    def markdown(self, text):
+        self.renders.append(text)
+
+
+class Container:
+    def __init__(self):
+        self.placeholders = []
+
+    def empty(self):
+        self.placeholders.append(Placeholder())
+        return self.placeholders[-1]
+
+
+@pytest.mark.parametrize("text, complete", [
+    ("one\n\ntwo", "one\n\n"),
+    ("one\n\ntwo\n\n", "one\n\ntwo\n\n"),
+    ("no blank line yet", ""),
+    ("```\ncode\n\nmore", ""),
+    ("```\ncode\n\n```\n\nafter", "```\ncode\n\n```\n\n"),
+    ("<div>\nopen\n\nstill open", ""),
+    ("<div>\nopen\n\n</div>\n\nafter", "<div>\nopen\n\n</div>\n\n"),
+])
+def test_split_complete(text, complete):
+    head, tail = split_complete(text)
+    assert head == complete
+    assert head + tail == text
+
+
+def test_deltas_are_buffered_until_the_interval():
+    clock, container = Clock(), Container()
+    renderer = StreamRenderer(container, interval=0.1, clock=clock)
+    for delta in ("a", "b", "c"):
+        renderer.feed(delta)
+    assert renderer.flushes == 0 and not container.placeholders
+    clock.now = 0.1
+    renderer.feed("d")
+    assert renderer.flushes == 1
+    assert container.placeholders[0].renders == ["abcd"]
+
+
+def test_size_budget_forces_a_flush():
+    renderer = StreamRenderer(Container(), interval=60, max_chars=5, clock=Clock())
+    renderer.feed("abc")
+    assert renderer.flushes == 0
+    renderer.feed("def")
+    assert renderer.flushes == 1
+
+
+def test_finished_blocks_are_written_once():
+    clock, container = Clock(), Container()
+    renderer = StreamRenderer(container, interval=0, clock=clock)
+    for delta in ("# Title\n\nfirst ", "para", "graph\n\nsecond <di", "v>"):
+        renderer.feed(delta)
+    assert container.placeholders[0].renders == ["# Title\n\n"]
+    # The tail's placeholder turns into the block once it is finished
+    assert container.placeholders[1].renders == ["first ", "first para", "first paragraph\n\n"]
+    # The unfinished tail is sanitized before it is shown
+    assert container.placeholders[2].renders == ["second ", "second <div></div>"]
+    assert renderer.close() == "# Title\n\nfirst paragraph\n\nsecond <div>"
+    assert renderer.blocks == 2
+
+
+def test_render_consumes_a_stream():
+    renderer = StreamRenderer(Container(), clock=Clock())
+    chunks = [make_chunk("Hello"), object(), make_chunk(" world")]
+    assert renderer.render(iter(chunks)) == "Hello world"
+    assert chunk_text(object()) is None
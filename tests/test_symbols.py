@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from luminafi.symbols import SymbolExtractor, SymbolResolver, normalize_query
+
+
+@pytest.fixture(scope="module")
+def resolver():
+    return SymbolResolver()
+
+
+@pytest.mark.parametrize("query, symbols", [
+    ("Compare AAPL vs MSFT", ["AAPL", "MSFT"]),
+    ("compare Apple and Microsoft", ["AAPL", "MSFT"]),
+    ("How did Bank of America do against JPM?", ["BAC", "JPM"]),
+    ("Show me $TSLA over 5Y", ["TSLA"]),
+    ("Compare BRK-B and SPY", ["BRK-B", "SPY"]),
+])
+def test_confident(resolver, query, symbols):
+    resolution = resolver.resolve(query)
+    assert resolution.confident
+    assert resolution.symbols == symbols
+
+
+@pytest.mark.parametrize("query", [
+    "Target price for MSFT",  # one-word name at the start of a sentence
+    "should I buy apple or MSFT",  # lower-case name
+    "compare spy and MSFT",  # lower-case ticker
+    "compare brk.b and MSFT",
+    "Compare Gold with SPY",  # capitalized word the index does not know
+    "Compare XYZQ with AAPL",  # ticker-shaped but unknown
+    "What is the weather today",
+])
+def test_left_to_the_llm(resolver, query):
+    assert not resolver.resolve(query).confident
+
+
+def test_stopwords_and_periods_are_not_symbols(resolver):
+    resolution = resolver.resolve("Compare AAPL YTD vs MSFT over 6MO, PE and EPS")
+    assert resolution.symbols == ["AAPL", "MSFT"]
+    assert resolution.confident
+
+
+def test_normalize_query():
+    assert normalize_query("  Compare   AAPL\tvs MSFT ") == "compare aapl vs msft"
+
+
+def test_extractor_uses_local_index_then_memoizes_llm(resolver):
+    calls = []
+
+    def llm(query):
+        calls.append(query)
+        return ["GLD", "SPY"]
+
+    extractor = SymbolExtractor(resolver)
+    assert extractor.extract("Compare AAPL vs MSFT", llm) == ["AAPL", "MSFT"]
+    assert calls == []
+    assert extractor.extract("Compare Gold with SPY", llm) == ["GLD", "SPY"]
+    assert extractor.extract("compare gold  with spy", llm) == ["GLD", "SPY"]
+    assert len(calls) == 1
+    stats = extractor.stats()
+    assert (stats['local_hits'], stats['memo_hits'], stats['llm_calls']) == (1, 1, 1)
+
+
+def test_extractor_falls_back_to_local_symbols_when_llm_fails(resolver):
+    extractor = SymbolExtractor(resolver)
+    assert extractor.extract("Compare Gold with SPY", lambda query: []) == ["SPY"]
+
+
+def test_concurrent_identical_queries_share_one_llm_call(resolver):
+    release = threading.Event()
+    calls = []
+
+    def llm(query):
+        calls.append(query)
+        release.wait(5)
+        return ["GLD"]
+
+    extractor = SymbolExtractor(resolver)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(extractor.extract("Is Gold a hedge?", llm)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while not calls:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == [["GLD"]] * 4
+    assert len(calls) == 1
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from luminafi import config, telemetry
+
+
+@pytest.fixture
+def metrics():
+    telemetry.enable()
+    yield
+    telemetry.disable()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def live_quotes(path):
+    try:
+        text = path.read_text()
+    except FileNotFoundError:
+        return None
+    line = next((line for line in text.splitlines() if line.startswith("luminafi_live_quotes_total ")), None)
+    return float(line.split()[1]) if line else 0.0
+
+
+def test_metrics_file_is_rewritten_periodically(tmp_path, metrics):
+    path = tmp_path / "luminafi.prom"
+    stop = telemetry.export_metrics_file(str(path), 0.02)
+    try:
+        assert wait_for(lambda: live_quotes(path) is not None)
+        before = live_quotes(path)
+        telemetry.LIVE_QUOTES.inc(3)
+        assert wait_for(lambda: live_quotes(path) == before + 3)
+    finally:
+        stop.set()
+    path.unlink()
+    time.sleep(0.1)
+    assert not path.exists()
+
+
+def test_no_periodic_writes_at_interval_zero(tmp_path, metrics):
+    path = tmp_path / "luminafi.prom"
+    stop = telemetry.export_metrics_file(str(path), 0)
+    time.sleep(0.1)
+    stop.set()
+    assert not path.exists()
+
+
+def test_start_exporters_uses_the_configured_interval(tmp_path, monkeypatch):
+    exports = []
+    monkeypatch.setattr(telemetry, "_exporters_started", False)
+    monkeypatch.setattr(config, "METRICS_PORT", 0)
+    monkeypatch.setattr(config, "METRICS_FILE", str(tmp_path / "luminafi.prom"))
+    monkeypatch.setattr(config, "METRICS_FILE_INTERVAL_SECONDS", 7.5)
+    monkeypatch.setattr(telemetry, "export_metrics_file", lambda path, interval: exports.append((path, interval)))
+    telemetry.start_exporters()
+    telemetry.start_exporters()
+    assert exports == [(str(tmp_path / "luminafi.prom"), 7.5)]